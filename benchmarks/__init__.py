@@ -0,0 +1 @@
+"""Benchmarks for player_tech_assignment."""
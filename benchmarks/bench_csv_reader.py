@@ -0,0 +1,92 @@
+"""
+Benchmark of the .csv file reader fast path
+
+Parses a synthetic fleet .csv file with the csv module for every row
+(fast_path=False) and with the chunked fast path, both by streaming records
+with iter_players() and by loading the columns with read(). Also reports the
+memory held by the loaded columns against plain lists of str.
+
+Usage:
+    python -m benchmarks.bench_csv_reader [--devices N]
+"""
+import argparse
+import gc
+import json
+from pathlib import Path
+import tempfile
+import time
+import tracemalloc
+
+from player_tech_assignment.csv_reader import MusicPlayerCsvReader
+
+from .fleet import generate_fleet_csv
+
+
+def time_iter_players(csv_file: Path, fast_path: bool) -> float:
+    """
+    Returns:
+        float: seconds to stream every record
+    """
+    start = time.perf_counter()
+    for _ in MusicPlayerCsvReader(csv_file, preload=False, fast_path=fast_path).iter_players():
+        pass
+    return time.perf_counter() - start
+
+
+def time_read(csv_file: Path, fast_path: bool) -> float:
+    """
+    Returns:
+        float: seconds to load the columns of the file
+    """
+    start = time.perf_counter()
+    MusicPlayerCsvReader(csv_file, fast_path=fast_path)
+    return time.perf_counter() - start
+
+
+def loaded_memory_mb(csv_file: Path) -> dict:
+    """
+    Returns:
+        dict: MiB held by the loaded columns and by the same values in lists of str
+    """
+    gc.collect()
+    tracemalloc.start()
+    reader = MusicPlayerCsvReader(csv_file)
+    gc.collect()
+    columns = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    lists = ([], [], [], [])
+    for chunk in reader._iter_columns():
+        for values, chunk_values in zip(lists, chunk):
+            values.extend(chunk_values)
+    gc.collect()
+    plain = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return {"columns_mb": round(columns / (1 << 20), 1), "lists_mb": round(plain / (1 << 20), 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=1000000, help="number of rows")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_file = generate_fleet_csv(Path(tmp_dir) / "fleet.csv", args.devices)
+        size_mb = csv_file.stat().st_size / (1 << 20)
+        results = {}
+        for name, measure in (("iter_players", time_iter_players), ("read", time_read)):
+            csv_module = min(measure(csv_file, False) for _ in range(3))
+            fast_path = min(measure(csv_file, True) for _ in range(3))
+            results[name] = {
+                "csv_module_s": round(csv_module, 3),
+                "fast_path_s": round(fast_path, 3),
+                "fast_path_mb_per_s": round(size_mb / fast_path, 1),
+                "speedup": round(csv_module / fast_path, 2),
+            }
+        results["memory"] = loaded_memory_mb(csv_file)
+    print(json.dumps(dict(devices=args.devices, file_mb=round(size_mb, 1), **results), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Micro-benchmark of the update request body preparation
+
+Compares the CPU time spent by requests preparing a PUT /profiles/clientId:{macaddress}
+request when the profile dict is serialized for every device (json=) and when
+the pre-serialized profile body is reused (data= with precomputed headers).
+
+Usage:
+    python -m benchmarks.bench_payload [--requests N]
+"""
+import argparse
+import json
+import time
+
+import requests
+
+from player_tech_assignment.profile import MusicPlayerProfile
+
+URL = "http://127.0.0.1:5000/profiles/clientId:8F:1E:C8:64:8C:02?token=token"
+
+
+def prepare_per_request(profile: MusicPlayerProfile, count: int) -> float:
+    """
+    Returns:
+        float: CPU seconds to prepare count requests serializing the profile every time
+    """
+    start = time.process_time()
+    for _ in range(count):
+        requests.Request("PUT", URL, json=profile.to_dict()).prepare()
+    return time.process_time() - start
+
+
+def prepare_preserialized(profile: MusicPlayerProfile, count: int) -> float:
+    """
+    Returns:
+        float: CPU seconds to prepare count requests reusing the serialized profile
+    """
+    start = time.process_time()
+    for _ in range(count):
+        requests.Request("PUT", URL, data=profile.payload, headers=profile.headers).prepare()
+    return time.process_time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100000, help="number of prepared requests")
+    args = parser.parse_args()
+
+    profile = MusicPlayerProfile()
+    per_request = prepare_per_request(profile, args.requests)
+    preserialized = prepare_preserialized(profile, args.requests)
+    print(json.dumps({
+        "requests": args.requests,
+        "per_request_us": round(per_request / args.requests * 1e6, 3),
+        "preserialized_us": round(preserialized / args.requests * 1e6, 3),
+        "saved_us_per_request": round((per_request - preserialized) / args.requests * 1e6, 3),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Throughput benchmark of the update pipeline
+
+Generates a synthetic fleet, starts the simulation server in-process on an
+ephemeral port and updates the whole fleet with every client mode:
+    sync    thread pool, one request per device
+    batch   thread pool, --batch-size devices per request
+    async   asyncio event loop (requires aiohttp)
+
+Reports devices/sec, p50/p95/p99 request latency and peak RSS of the process
+(client and server) after each mode.
+
+Usage:
+    python -m benchmarks.bench_rollout [--devices N] [--workers N] [--batch-size N] [--modes sync,batch,async]
+"""
+import argparse
+import json
+from pathlib import Path
+import resource
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from player_tech_assignment.client import MusicPlayerClient
+from player_tech_assignment.report import MusicPlayerUpdateReport
+
+from .fleet import InProcessServer, generate_fleet_csv
+
+MODES = ["sync", "batch", "async"]
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """
+    Nearest-rank percentile
+
+    Args:
+        sorted_values (list): values in ascending order
+        fraction (float): percentile between 0 and 1
+
+    Returns:
+        float: percentile value, 0 if there is no value
+    """
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))]
+
+
+def peak_rss_mb() -> float:
+    """
+    Returns:
+        float: peak resident set size of the process in MiB
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB on Linux
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / (1 << 10)
+
+
+def run_mode(mode: str, base_url: str, csv_file: Path, workers: int, batch_size: int) -> MusicPlayerUpdateReport:
+    """
+    Update the fleet with one client mode
+
+    Returns:
+        MusicPlayerUpdateReport: update report
+    """
+    if mode == "async":
+        from player_tech_assignment.async_client import AsyncMusicPlayerClient, run_until_complete
+
+        async def update():
+            async with AsyncMusicPlayerClient(base_url, "bench", "password", concurrency=workers) as client:
+                return await client.update_players(csv_file)
+        return run_until_complete(update())
+
+    with MusicPlayerClient(base_url, "bench", "password", pool_size=workers) as client:
+        return client.update_players(csv_file, workers=workers, batch_size=batch_size if mode == "batch" else 1)
+
+
+def measure(mode: str, base_url: str, csv_file: Path, workers: int, batch_size: int) -> Dict:
+    """
+    Returns:
+        dict: throughput, latency percentiles and peak RSS of one client mode
+    """
+    start = time.perf_counter()
+    report = run_mode(mode, base_url, csv_file, workers, batch_size)
+    duration = time.perf_counter() - start
+    latencies = sorted(result.elapsed for result in report)
+    return {
+        "mode": mode,
+        "devices": len(report),
+        "failed": len(report.failed),
+        "seconds": round(duration, 3),
+        "devices_per_sec": round(len(report) / duration, 1),
+        "latency_ms": {name: round(percentile(latencies, fraction) * 1000, 3)
+                       for name, fraction in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))},
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=1000, help="number of music players (1k to 1M)")
+    parser.add_argument("--workers", type=int, default=8, help="number of concurrent requests")
+    parser.add_argument("--batch-size", type=int, default=100, help="number of devices per request in batch mode")
+    parser.add_argument("--modes", type=str, default=",".join(MODES), help="comma separated client modes")
+    parser.add_argument("--seed", type=int, default=0, help="fleet random seed")
+    args = parser.parse_args()
+
+    modes = [mode for mode in args.modes.split(",") if mode]
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        parser.error("unknown modes: {0}".format(", ".join(sorted(unknown))))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_file = generate_fleet_csv(Path(tmp_dir) / "fleet.csv", args.devices, args.seed)
+        with InProcessServer(csv_file) as server:
+            results = [measure(mode, server.base_url, csv_file, args.workers, args.batch_size) for mode in modes]
+    print(json.dumps({
+        "devices": args.devices,
+        "workers": args.workers,
+        "batch_size": args.batch_size,
+        "modes": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
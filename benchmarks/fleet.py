@@ -0,0 +1,68 @@
+"""
+Synthetic music player fleets for benchmarks
+
+Writes .csv files in the MusicPlayerCsvReader format with distinct,
+deterministic MAC addresses, and runs the simulation server in-process on an
+ephemeral port.
+"""
+import logging
+from pathlib import Path
+import random
+import threading
+
+from werkzeug.serving import make_server
+
+from player_tech_assignment.server.server import MusicPlayerUpdateServer
+
+CSV_HEADER = "mac_addresses, id1, id2, id3\n"
+
+
+def generate_fleet_csv(csv_file, devices: int, seed: int = 0) -> Path:
+    """
+    Write a fleet .csv file of distinct MAC addresses
+
+    Args:
+        csv_file (str): .csv file to write
+        devices (int): number of music players
+        seed (int): random seed, the same seed gives the same fleet
+
+    Returns:
+        Path: written .csv file
+    """
+    csv_file = Path(csv_file)
+    rng = random.Random(seed)
+    with csv_file.open("w", encoding="utf-8") as stream:
+        stream.write(CSV_HEADER)
+        for value in rng.sample(range(1 << 48), devices):
+            digits = "{0:012X}".format(value)
+            mac_address = ":".join(digits[i:i + 2] for i in range(0, 12, 2))
+            stream.write("{0}, {1}, {2}, {3}\n".format(mac_address, rng.randint(1, 9), rng.randint(1, 9),
+                                                       rng.randint(1, 9)))
+    return csv_file
+
+
+class InProcessServer:
+    def __init__(self, csv_file, host: str = "127.0.0.1"):
+        """
+        Simulation server of a fleet running in a background thread, on an ephemeral port
+
+        Args:
+            csv_file (str): .csv file of valid clients
+            host (str): server ip address
+        """
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+        self._server = make_server(host, 0, MusicPlayerUpdateServer(csv_file, log_requests=False).app,
+                                   threaded=True)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return "http://{0}:{1}".format(self._server.host, self._server.port)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._server.shutdown()
+        self._thread.join()
@@ -4,9 +4,32 @@ __author__ = """Simon Ho"""
 __email__ = 'simon.dk.ho@gmail.com'
 __version__ = '0.1.0'
 
-try:
-    from .client import *
-    from .csv_reader import *
-except ImportError: # pragma: no cover
-    # Workaround to avoid ImporError in setup.py
-    pass # pragma: no cover
+# Public name -> module, imported on first access so that importing a submodule (e.g. the CLI)
+# doesn't load requests through the client
+_EXPORTS = {
+    'MusicPlayerClient': 'client',
+    'MusicPlayerClientError': 'client',
+    'MusicPlayerCsvReader': 'csv_reader',
+    'MusicPlayerCsvReaderError': 'csv_reader',
+    'MusicPlayerRecord': 'csv_reader',
+    'MusicPlayerProfile': 'profile',
+    'MusicPlayerProfileError': 'profile',
+    'PlayerUpdateResult': 'report',
+    'MusicPlayerUpdateReport': 'report',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError("module {0!r} has no attribute {1!r}".format(__name__, name))
+    from importlib import import_module
+
+    value = getattr(import_module("." + _EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
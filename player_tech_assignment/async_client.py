@@ -0,0 +1,354 @@
+"""
+Asyncio music player client to the update server
+
+Same requests as the synchronous client, made from a single event loop with
+non-blocking sockets (aiohttp) so very large fleets can be updated without
+one thread per in-flight request:
+    1) POST /login request to get authentification token ID
+    2) PUT /profiles/clientId:{macaddress} request to update the software version
+"""
+import asyncio
+import json
+import time
+from typing import Tuple
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+from .client import MusicPlayerClient, MusicPlayerClientError, filter_shard, read_mac_addresses
+from .defaults import DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT
+from .journal import MusicPlayerUpdateJournal
+from .profile import MusicPlayerProfile
+from .rate_limiter import AdaptiveConcurrencyLimiter, TokenBucket
+from .report import MusicPlayerUpdateReport, PlayerUpdateResult
+from .retry import RetryPolicy
+from .token_manager import AsyncMusicPlayerTokenManager
+
+__all__ = ['AsyncMusicPlayerClient', 'run_until_complete']
+
+DEFAULT_CONCURRENCY = 100
+
+
+def run_until_complete(coroutine):
+    """
+    Run a coroutine in a new event loop, like asyncio.run() which requires Python 3.7
+
+    Args:
+        coroutine (coroutine): coroutine to run
+
+    Returns:
+        object: return value of the coroutine
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        # Locks and sessions created outside of the coroutine attach to the current loop before Python 3.10
+        asyncio.set_event_loop(loop)
+        return loop.run_until_complete(coroutine)
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+class AsyncMusicPlayerClient:
+    def __init__(self, base_url: str, username: str, password: str, concurrency: int = DEFAULT_CONCURRENCY,
+                 retry_policy: RetryPolicy = None, rate_limiter: TokenBucket = None,
+                 concurrency_limiter: AdaptiveConcurrencyLimiter = None, profile: MusicPlayerProfile = None,
+                 connect_timeout: float = DEFAULT_CONNECT_TIMEOUT, read_timeout: float = DEFAULT_READ_TIMEOUT):
+        """
+        Asyncio music player client to make requests to the update server
+
+        Must be used as an async context manager, which opens the HTTP session
+        and validates the base url home page is accessible.
+
+        Args:
+            base_url (str): client base URL
+            username (str): login username
+            password (str): login password
+            concurrency (int): maximum number of in-flight update requests
+            retry_policy (RetryPolicy): retries of transient login and update failures
+            rate_limiter (TokenBucket): cap on the update request rate
+            concurrency_limiter (AdaptiveConcurrencyLimiter): adaptive cap on the in-flight update requests,
+                within the concurrency
+            profile (MusicPlayerProfile): software versions sent to the music players
+            connect_timeout (float): seconds to wait for a connection
+            read_timeout (float): seconds to wait for a response
+
+        Raises:
+            MusicPlayerClientError: aiohttp is not installed or invalid concurrency
+        """
+        if aiohttp is None:
+            raise MusicPlayerClientError("aiohttp is required to use the asyncio music player client")
+        if concurrency < 1:
+            raise MusicPlayerClientError("concurrency must be at least 1")
+
+        self._base_url = base_url
+        self._username = username
+        self._password = password
+        self._concurrency = concurrency
+        self._retry_policy = retry_policy or RetryPolicy()
+        self._rate_limiter = rate_limiter
+        self._concurrency_limiter = concurrency_limiter
+        self._profile = profile or MusicPlayerProfile()
+        # Same timeouts as the synchronous client instead of aiohttp's 5 minutes per request; waiting for a
+        # free connection of the pool isn't timed
+        self._timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        self._session = None
+        self._token_manager = AsyncMusicPlayerTokenManager(self.get_authentification_token_id)
+
+    async def __aenter__(self):
+        self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self._concurrency),
+                                              timeout=self._timeout)
+        try:
+            async with self._session.get(self._base_url):
+                pass
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            await self._session.close()
+            raise MusicPlayerClientError("Music player server is not accessible")
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._session.close()
+
+    @property
+    def login_count(self) -> int:
+        """
+        Returns:
+            int: number of logins made to get authentification tokens
+        """
+        return self._token_manager.login_count
+
+    async def _login(self) -> Tuple[int, str]:
+        """
+        Login to Music Player Server
+        POST /login request
+
+        Returns:
+            tuple: /login POST request status code and body
+        """
+        url = '{0}/login'.format(self._base_url)
+        form_data = {
+            "username": self._username,
+            "password": self._password
+        }
+        async with self._session.post(url, data=form_data) as res:
+            return res.status, await res.text()
+
+    async def _update_player(self, mac_address, token) -> Tuple[int, str]:
+        """
+        Update the software version of a device with MAC address
+        PUT /profiles/clientId:{macaddress} request
+
+        Args:
+            mac_address (str): music player MAC address
+            token (str): authentification token
+
+        Returns:
+            tuple: /profiles/clientId:{macaddress} PUT request status code and body
+        """
+        url = '{0}/profiles/clientId:{1}'.format(self._base_url, mac_address)
+        async with self._session.put(url, params={"token": token}, data=self._profile.payload,
+                                     headers=self._profile.headers) as res:
+            return res.status, await res.text()
+
+    async def _login_with_retry(self) -> Tuple[int, str]:
+        """
+        Login, retrying transient failures
+
+        Raises:
+            MusicPlayerClientError: server not reachable
+
+        Returns:
+            tuple: /login POST request status code and body
+        """
+        attempt = 1
+        while True:
+            try:
+                status, text = await self._login()
+                if not self._retry_policy.should_retry(status, attempt):
+                    return status, text
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as err:
+                if not self._retry_policy.should_retry(None, attempt):
+                    raise MusicPlayerClientError("Could not get token: {0}".format(err))
+            await asyncio.sleep(self._retry_policy.delay(attempt))
+            attempt += 1
+
+    async def get_authentification_token_id(self) -> str:
+        """
+        Get authentification ID
+
+        Raises:
+            MusicPlayerClientError: invalid credentials or server not reachable
+
+        Returns:
+            str: token id
+        """
+        status, text = await self._login_with_retry()
+        if status == 200:
+            return json.loads(text)["token"]
+        else:
+            raise MusicPlayerClientError("Could not get token because of invalid credentials")
+
+    async def _update_one(self, mac_address) -> PlayerUpdateResult:
+        """
+        Update one device, refreshing the token once if the server reports it expired
+
+        Args:
+            mac_address (str): music player MAC address
+
+        Raises:
+            MusicPlayerClientError: authentification failed
+
+        Returns:
+            PlayerUpdateResult: device update result, with no status code on connection errors
+        """
+        if self._rate_limiter is not None:
+            delay = self._rate_limiter.try_acquire()
+            while delay:
+                await asyncio.sleep(delay)
+                delay = self._rate_limiter.try_acquire()
+        start = time.perf_counter()
+        try:
+            token = await self._token_manager.get_token()
+            status, text = await self._update_player(mac_address, token)
+            if status == 403 and "Token expired" in text:
+                await self._token_manager.invalidate(token)
+                status, text = await self._update_player(mac_address, await self._token_manager.get_token())
+        except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+            result = PlayerUpdateResult(mac_address, None, str(err) or type(err).__name__,
+                                        elapsed=time.perf_counter() - start)
+        else:
+            result = PlayerUpdateResult(mac_address, status, "" if status == 200 else text.strip(),
+                                        elapsed=time.perf_counter() - start)
+        if self._concurrency_limiter is not None:
+            self._concurrency_limiter.on_response(result.status_code, result.elapsed)
+        return result
+
+    async def _update_all(self, mac_addresses, journal: MusicPlayerUpdateJournal = None,
+                          resume: bool = False) -> MusicPlayerUpdateReport:
+        """
+        Update devices with one task per device
+
+        At most two devices per request slot are in progress at once, so the
+        source is only read as fast as updates complete. Request slots are the
+        concurrency, or the adaptive concurrency limit if one is set. A task
+        waiting to retry a transient failure gives its request slot back during
+        the backoff.
+
+        Args:
+            mac_addresses (iterable): music player MAC addresses
+            journal (MusicPlayerUpdateJournal): journal recording each device outcome
+            resume (bool): skip the devices already updated according to the journal
+
+        Raises:
+            MusicPlayerClientError: authentification failed
+
+        Returns:
+            MusicPlayerUpdateReport: per device results in input order
+        """
+        slots_released = asyncio.Condition()
+        in_flight = 0
+        device_slots = asyncio.Semaphore(self._concurrency * 2)
+        results = {}
+        tasks = set()
+        errors = []
+
+        def finish(index, result):
+            results[index] = result
+            if journal is not None:
+                journal.record(result)
+
+        def request_slot_available():
+            if self._concurrency_limiter is not None:
+                return in_flight < min(self._concurrency, self._concurrency_limiter.limit)
+            return in_flight < self._concurrency
+
+        async def request(mac_address):
+            nonlocal in_flight
+            async with slots_released:
+                await slots_released.wait_for(request_slot_available)
+                in_flight += 1
+            try:
+                return await self._update_one(mac_address)
+            finally:
+                async with slots_released:
+                    in_flight -= 1
+                    slots_released.notify_all()
+
+        async def update(index, mac_address):
+            try:
+                attempt = 1
+                while True:
+                    result = await request(mac_address)
+                    if result.success or not self._retry_policy.should_retry(result.status_code, attempt):
+                        break
+                    await asyncio.sleep(self._retry_policy.delay(attempt))
+                    attempt += 1
+                finish(index, result._replace(attempts=attempt))
+            except BaseException as err:
+                errors.append(err)
+                raise
+            finally:
+                device_slots.release()
+
+        try:
+            for index, mac_address in enumerate(mac_addresses):
+                if resume and journal.is_updated(mac_address):
+                    results[index] = PlayerUpdateResult(mac_address, None, "already updated", skipped=True)
+                    continue
+                invalid = MusicPlayerClient._invalid_mac_address_result(mac_address)
+                if invalid is not None:
+                    finish(index, invalid)
+                    continue
+                await device_slots.acquire()
+                if errors:
+                    break
+                task = asyncio.ensure_future(update(index, mac_address))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks)
+            if errors:
+                raise errors[0]
+        finally:
+            for task in tasks:
+                task.cancel()
+        return MusicPlayerUpdateReport(results[index] for index in sorted(results))
+
+    async def update_players(self, csv_file: str, journal_file: str = None, resume: bool = False,
+                             preflight: bool = True, shard: Tuple[int, int] = None,
+                             inventory_cache: bool = False) -> MusicPlayerUpdateReport:
+        """
+        Update music players from .csv configuration
+
+        A failed device does not stop the update of the others.
+
+        Args:
+           csv_file (str): music player update file
+           journal_file (str): checkpoint journal recording each device outcome
+           resume (bool): skip the devices already updated according to the journal
+           preflight (bool): validate and normalize all MAC addresses before the first request
+           shard (tuple): (index, count) shard of the devices to update, None for all devices
+           inventory_cache (bool): with preflight, load the validated rows from the sidecar inventory file of
+               csv_file
+
+        Raises:
+            MusicPlayerClientError: invalid MAC addresses, authentification failed or update player request not successful
+
+        Returns:
+            MusicPlayerUpdateReport: per device results in .csv file order
+        """
+        if resume and journal_file is None:
+            raise MusicPlayerClientError("A journal file is required to resume an update")
+        if shard is not None and not 0 <= shard[0] < shard[1]:
+            raise MusicPlayerClientError("shard index must be between 0 and the shard count")
+
+        mac_addresses = filter_shard(read_mac_addresses(csv_file, preflight, inventory_cache=inventory_cache), shard)
+        if journal_file is None:
+            report = await self._update_all(mac_addresses)
+        else:
+            with MusicPlayerUpdateJournal(journal_file) as journal:
+                report = await self._update_all(mac_addresses, journal, resume)
+        if report.failed:
+            raise MusicPlayerClientError(report.errors(), report)
+        return report
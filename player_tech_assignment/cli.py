@@ -1,14 +1,21 @@
 """
 Console script for player_tech_assignment.
+
+The CLI is started once per shard by orchestration scripts, so only the
+standard library and click are imported at startup. Each command imports
+what it runs: requests with the client, Flask and PyJWT with the server.
 """
 import click
-import os
+import functools
 
-from .csv_reader import MusicPlayerCsvReader, MusicPlayerCsvReaderError
-from .server.server import MusicPlayerUpdateServer
-from .client import MusicPlayerClient, MusicPlayerClientError
+from .defaults import (DEFAULT_CONNECT_TIMEOUT, DEFAULT_GROWTH, DEFAULT_MAX_ERROR_RATE, DEFAULT_READ_TIMEOUT,
+                       DEFAULT_SERVER_THREADS, DEFAULT_SERVER_WORKERS, MAX_BATCH_SIZE)
+from .metrics import DEFAULT_EXPORT_INTERVAL, METRICS_FORMATS
+from .retry import DEFAULT_ATTEMPTS, DEFAULT_BACKOFF, DEFAULT_MAX_BACKOFF
 
 DEFAULT_BASE_URL = "http://127.0.0.1:5000"
+CLIENT_BACKENDS = ["sync", "async"]
+SERVER_BACKENDS = ["flask", "gunicorn"]
 
 
 @click.group()
@@ -22,29 +29,353 @@ def cli_pta():
 @cli_pta.command()
 @click.option("--ipaddr", "-ip", type=str, default="0.0.0.0", help="Specify server ip address", required=False)
 @click.option("--port", "-p", type=int, default=5000, help="Specify server port", required=False)
-def run_simulation_server(ipaddr, port):
+@click.option("--server", "-s", "server_backend", type=click.Choice(SERVER_BACKENDS), default="flask",
+              help="Specify server: Flask development server (flask) or multi-process gunicorn (gunicorn), "
+                   "whose workers each keep their own device profiles and metrics",
+              required=False)
+@click.option("--workers", "-w", type=click.IntRange(min=1), default=DEFAULT_SERVER_WORKERS,
+              help="Specify number of gunicorn worker processes", required=False)
+@click.option("--threads", type=click.IntRange(min=1), default=DEFAULT_SERVER_THREADS,
+              help="Specify number of threads per gunicorn worker process", required=False)
+@click.option("--log-requests/--no-log-requests", default=None,
+              help="Print a line for every request (default: on with flask, off with gunicorn)", required=False)
+@click.option("--chaos-file", type=str, default=None,
+              help="Specify JSON file of latency and failure injection settings", required=False)
+@click.option("--latency", type=str, default=None,
+              help="Specify injected latency in seconds: fixed:s, uniform:low:high, exponential:mean or "
+                   "lognormal:median:sigma", required=False)
+@click.option("--error-rate", type=click.FloatRange(0, 1), default=None,
+              help="Specify fraction of requests answered with a 5xx error", required=False)
+@click.option("--throttle-rate", type=click.FloatRange(0, 1), default=None,
+              help="Specify fraction of requests answered with 429", required=False)
+@click.option("--token-ttl", type=click.FloatRange(min=0, min_open=True), default=None,
+              help="Specify seconds before an authentification token expires", required=False)
+@click.option("--client-rate", type=click.FloatRange(min=0, min_open=True), default=None,
+              help="Specify requests per second allowed per client address, above which 429 is returned",
+              required=False)
+@click.option("--client-burst", type=click.IntRange(min=1), default=None,
+              help="Specify requests a client can send at once above --client-rate", required=False)
+@click.option("--chaos-seed", type=int, default=None, help="Specify random seed of the injected failures",
+              required=False)
+@click.option("--inventory-cache", is_flag=True, default=False,
+              help="Load the valid clients from a sidecar inventory file next to the .csv file, written on first use",
+              required=False)
+def run_simulation_server(ipaddr, port, server_backend, workers, threads, log_requests, chaos_file, latency,
+                          error_rate, throttle_rate, token_ttl, client_rate, client_burst, chaos_seed, inventory_cache):
     """
     Run music player update simulation server
     """
-    server = MusicPlayerUpdateServer().app
-    server.run(host=ipaddr, debug=False, port=port)
+    from .server.chaos import ChaosProfileError
+    from .server.server import MusicPlayerUpdateServer
+    from .server.wsgi import MusicPlayerWsgiServerError, run_wsgi_server
+
+    if log_requests is None:
+        log_requests = server_backend == "flask"
+    try:
+        chaos = _chaos_profile(chaos_file, {"latency": latency, "error_rate": error_rate,
+                                            "throttle_rate": throttle_rate, "token_ttl": token_ttl,
+                                            "client_rate": client_rate, "client_burst": client_burst,
+                                            "seed": chaos_seed})
+    except ChaosProfileError as err:
+        raise click.UsageError(str(err))
+    server = MusicPlayerUpdateServer(log_requests=log_requests, chaos=chaos, inventory_cache=inventory_cache).app
+    if server_backend == "gunicorn":
+        try:
+            run_wsgi_server(server, ipaddr, port, workers=workers, threads=threads)
+        except MusicPlayerWsgiServerError as err:
+            raise click.UsageError(str(err))
+    else:
+        server.run(host=ipaddr, debug=False, port=port, threaded=True)
+
+
+def _chaos_profile(chaos_file, options):
+    """
+    Args:
+        chaos_file (str): JSON file of chaos settings, None for none
+        options (dict): chaos settings given on the command line, None when not given
+
+    Raises:
+        ChaosProfileError: invalid settings
+
+    Returns:
+        ChaosProfile: chaos profile, None if no setting is given
+    """
+    from .server.chaos import ChaosProfile
+
+    settings = ChaosProfile.read_file(chaos_file) if chaos_file is not None else {}
+    settings.update((name, value) for name, value in options.items() if value is not None)
+    return ChaosProfile.from_dict(settings) if settings else None
 
 
 @cli_pta.command()
 @click.option("--username", "-u", type=str, help="Specify authentification username", required=True)
 @click.option("--password", "-p", type=str, help="Specify authentification password", required=True)
 @click.option("--input", "-i", type=str, help="Specify input csv file", required=True)
-def update_software(input, username, password):
+@click.option("--workers", "-w", type=click.IntRange(min=1), default=1, help="Specify number of concurrent updates",
+              required=False)
+@click.option("--backend", "-b", type=click.Choice(CLIENT_BACKENDS), default="sync",
+              help="Specify client backend: thread pool (sync) or asyncio (async)", required=False)
+@click.option("--pool-size", type=click.IntRange(min=1), default=None,
+              help="Specify number of kept-alive connections (default: number of workers)", required=False)
+@click.option("--keep-alive/--no-keep-alive", default=True, help="Reuse connections between requests", required=False)
+@click.option("--connect-timeout", type=float, default=DEFAULT_CONNECT_TIMEOUT, help="Specify connect timeout in seconds",
+              required=False)
+@click.option("--read-timeout", type=float, default=DEFAULT_READ_TIMEOUT, help="Specify read timeout in seconds",
+              required=False)
+@click.option("--journal", "-j", type=str, default=None, help="Specify checkpoint journal file recording each device outcome",
+              required=False)
+@click.option("--resume", is_flag=True, default=False, help="Skip the devices already updated according to the journal",
+              required=False)
+@click.option("--retries", type=click.IntRange(min=0), default=DEFAULT_ATTEMPTS - 1,
+              help="Specify number of retries of transient failures", required=False)
+@click.option("--backoff", type=click.FloatRange(min=0), default=DEFAULT_BACKOFF,
+              help="Specify base retry delay in seconds, doubled at every attempt", required=False)
+@click.option("--max-backoff", type=click.FloatRange(min=0), default=DEFAULT_MAX_BACKOFF,
+              help="Specify maximum retry delay in seconds", required=False)
+@click.option("--rate", type=click.FloatRange(min=0, min_open=True), default=None,
+              help="Specify maximum number of update requests per second", required=False)
+@click.option("--burst", type=click.IntRange(min=1), default=None,
+              help="Specify number of update requests allowed in a burst above the rate", required=False)
+@click.option("--adaptive", is_flag=True, default=False,
+              help="Adapt the number of in-flight requests (up to --workers) to server latency and errors",
+              required=False)
+@click.option("--latency-target", type=click.FloatRange(min=0, min_open=True), default=None,
+              help="Specify latency in seconds above which --adaptive lowers concurrency", required=False)
+@click.option("--preflight/--no-preflight", default=True,
+              help="Validate all MAC addresses before sending the first update request", required=False)
+@click.option("--profile", type=str, default=None, help="Specify JSON file of the application versions to install",
+              required=False)
+@click.option("--app", "apps", type=str, multiple=True,
+              help="Specify an application version to install as applicationId=version (repeatable)", required=False)
+@click.option("--batch-size", type=click.IntRange(min=1, max=MAX_BATCH_SIZE), default=1,
+              help="Specify number of devices per update request (sync backend only)", required=False)
+@click.option("--metrics-file", type=str, default=None,
+              help="Specify file receiving the client metrics during and after the update (sync backend only)",
+              required=False)
+@click.option("--metrics-format", type=click.Choice(METRICS_FORMATS), default="prometheus",
+              help="Specify metrics file format", required=False)
+@click.option("--metrics-interval", type=click.FloatRange(min=0), default=DEFAULT_EXPORT_INTERVAL,
+              help="Specify seconds between metrics file exports, 0 to export only at the end", required=False)
+@click.option("--shard", type=str, default=None,
+              help="Specify i/N to update only the devices of shard i out of N, e.g. one shard per host", required=False)
+@click.option("--processes", type=click.IntRange(min=1), default=1,
+              help="Specify number of processes, each updating its own shard of the devices", required=False)
+@click.option("--canary", type=click.FloatRange(min=0, max=1, min_open=True), default=None,
+              help="Roll out in waves, starting with this fraction of the devices (sync backend only)", required=False)
+@click.option("--growth", type=click.FloatRange(min=1, min_open=True), default=DEFAULT_GROWTH,
+              help="Specify size ratio between a rollout wave and the previous one", required=False)
+@click.option("--max-error-rate", type=click.FloatRange(min=0, max=1), default=DEFAULT_MAX_ERROR_RATE,
+              help="Specify fraction of failed devices of a wave above which the rollout halts", required=False)
+@click.option("--target-duration", type=click.FloatRange(min=0, min_open=True), default=None,
+              help="Specify seconds to complete the rollout in, pacing the request rate of every wave",
+              required=False)
+@click.option("--state-cache", type=str, default=None,
+              help="Specify file of the last profile confirmed on each device, to skip the devices already up to date "
+                   "(sync backend only)", required=False)
+@click.option("--refresh-state", is_flag=True, default=False,
+              help="Ask the server for the profile of the devices not up to date in the state cache", required=False)
+@click.option("--inventory-cache", is_flag=True, default=False,
+              help="Load the validated rows from a sidecar inventory file next to the .csv file, only parsing the "
+                   "rows appended since it was written", required=False)
+def update_software(input, username, password, workers, backend, pool_size, keep_alive, connect_timeout, read_timeout,
+                    journal, resume, retries, backoff, max_backoff, rate, burst, adaptive, latency_target, preflight,
+                    profile, apps, batch_size, metrics_file, metrics_format, metrics_interval, shard, processes,
+                    canary, growth, max_error_rate, target_duration, state_cache, refresh_state, inventory_cache):
     """
     Update software
     """
+    from .client import MusicPlayerClientError, read_mac_addresses
+    from .csv_reader import MusicPlayerCsvReaderError
+    from .profile import MusicPlayerProfile, MusicPlayerProfileError
+    from .sharding import merge_shard_reports, parse_shard, run_shards
+    from .state_cache import MusicPlayerStateCacheError
+
+    if resume and journal is None:
+        raise click.UsageError("--resume requires --journal")
+    if profile is not None and apps:
+        raise click.UsageError("--profile and --app are mutually exclusive")
+    if batch_size > 1 and backend == "async":
+        raise click.UsageError("--batch-size is only supported by the sync backend")
+    if metrics_file is not None and backend == "async":
+        raise click.UsageError("--metrics-file is only supported by the sync backend")
+    if canary is not None and backend == "async":
+        raise click.UsageError("--canary is only supported by the sync backend")
+    if state_cache is not None and backend == "async":
+        raise click.UsageError("--state-cache is only supported by the sync backend")
+    if refresh_state and state_cache is None:
+        raise click.UsageError("--refresh-state requires --state-cache")
+    if inventory_cache and not preflight:
+        raise click.UsageError("--inventory-cache requires --preflight")
+    if target_duration is not None and canary is None:
+        raise click.UsageError("--target-duration requires --canary")
+    if shard is not None and processes > 1:
+        raise click.UsageError("--shard and --processes are mutually exclusive")
+    if shard is not None:
+        try:
+            shard = parse_shard(shard)
+        except ValueError as err:
+            raise click.BadParameter(str(err), param_hint="--shard")
+    try:
+        if profile is not None:
+            profile = MusicPlayerProfile.from_file(profile)
+        elif apps:
+            profile = MusicPlayerProfile.from_options(apps)
+    except MusicPlayerProfileError as err:
+        raise click.UsageError(str(err))
+    options = {
+        "input": input, "username": username, "password": password, "workers": workers, "backend": backend,
+        "pool_size": pool_size, "keep_alive": keep_alive, "connect_timeout": connect_timeout,
+        "read_timeout": read_timeout, "journal": journal, "resume": resume, "retries": retries, "backoff": backoff,
+        "max_backoff": max_backoff, "rate": rate, "burst": burst, "adaptive": adaptive,
+        "latency_target": latency_target, "preflight": preflight, "profile": profile, "batch_size": batch_size,
+        "metrics_file": metrics_file, "metrics_format": metrics_format, "metrics_interval": metrics_interval,
+        "canary": canary, "growth": growth, "max_error_rate": max_error_rate, "target_duration": target_duration,
+        "state_cache": state_cache, "refresh_state": refresh_state, "inventory_cache": inventory_cache,
+    }
     try:
-        client = MusicPlayerClient(DEFAULT_BASE_URL, username, password)
-        client.update_players(input)
+        if processes > 1:
+            # The rate cap and its burst are shared by the shards
+            options["rate"] = rate / processes if rate else rate
+            options["burst"] = max(1, burst // processes) if burst else burst
+            # Validated, and the inventory file written, once before the shards read it
+            mac_addresses = read_mac_addresses(input, preflight, inventory_cache=inventory_cache)
+            if not inventory_cache:
+                # The shards stream the file validated above instead of each validating it again
+                options["preflight"] = False
+            outcomes = run_shards(functools.partial(_update_shard, options), processes)
+            report = merge_shard_reports(mac_addresses, processes, [outcome[0] for outcome in outcomes])
+            login_count = sum(outcome[1] for outcome in outcomes)
+            connections = None if backend == "async" else sum(outcome[2] for outcome in outcomes)
+        else:
+            report, login_count, connections = _update_shard(options, shard)
+        if report.failed:
+            click.echo(report.errors())
+            click.echo(report.summary())
+            return
         click.echo("Music players software update successful!")
-    except (MusicPlayerClientError, MusicPlayerCsvReaderError) as err:
+        click.echo(report.summary())
+        click.echo("Authentification logins: {0}".format(login_count))
+        if connections is not None:
+            click.echo("Connections opened: {0}".format(connections))
+    except (MusicPlayerClientError, MusicPlayerCsvReaderError, MusicPlayerStateCacheError) as err:
         click.echo("{0}".format(err))
 
 
+def _update_shard(options, shard=None):
+    """
+    Update the devices of a shard with their own client, token and connection pool
+
+    Args:
+        options (dict): update-software options
+        shard (tuple): (index, count) shard to update, None for all devices
+
+    Raises:
+        MusicPlayerClientError: invalid MAC addresses or authentification failed
+        MusicPlayerCsvReaderError: invalid csv file
+        MusicPlayerStateCacheError: invalid state cache file
+
+    Returns:
+        tuple: update report, number of logins and number of opened connections (None for the async backend)
+    """
+    from .client import MusicPlayerClient, MusicPlayerClientError
+    from .metrics import ClientMetrics, MetricsExporter
+    from .rate_limiter import AdaptiveConcurrencyLimiter, TokenBucket
+    from .retry import RetryPolicy
+    from .rollout import WaveRollout
+    from .sharding import shard_file
+    from .state_cache import MusicPlayerStateCache
+
+    journal = options["journal"]
+    metrics_file = options["metrics_file"]
+    state_cache_file = options["state_cache"]
+    if shard is not None and shard[1] > 1:
+        # Shards running side by side must not share their journal, metrics or state cache file
+        journal = shard_file(journal, shard)
+        metrics_file = shard_file(metrics_file, shard)
+        state_cache_file = shard_file(state_cache_file, shard)
+    policies = {
+        "retry_policy": RetryPolicy(attempts=options["retries"] + 1, backoff=options["backoff"],
+                                    max_backoff=options["max_backoff"]),
+        "rate_limiter": TokenBucket(options["rate"], options["burst"]) if options["rate"] else None,
+        "concurrency_limiter": AdaptiveConcurrencyLimiter(options["workers"], latency_target=options["latency_target"])
+        if options["adaptive"] else None,
+        "profile": options["profile"],
+    }
+    if options["backend"] == "async":
+        from .async_client import run_until_complete
+
+        report, login_count = run_until_complete(_update_software_async(
+            options["input"], options["username"], options["password"], options["workers"], journal,
+            options["resume"], options["preflight"], policies, shard, options["inventory_cache"],
+            options["connect_timeout"], options["read_timeout"]))
+        return report, login_count, None
+    metrics = ClientMetrics() if metrics_file is not None else None
+    state_cache = MusicPlayerStateCache(state_cache_file) if state_cache_file is not None else None
+    with MusicPlayerClient(DEFAULT_BASE_URL, options["username"], options["password"],
+                           pool_size=options["pool_size"] or options["workers"], keep_alive=options["keep_alive"],
+                           connect_timeout=options["connect_timeout"], read_timeout=options["read_timeout"],
+                           metrics=metrics, **policies) as client:
+        exporter = None
+        if metrics is not None:
+            exporter = MetricsExporter(metrics, metrics_file, options["metrics_format"], options["metrics_interval"])
+            exporter.start()
+        update_players = client.update_players
+        if options["canary"] is not None:
+            update_players = WaveRollout(client, options["canary"], options["growth"], options["max_error_rate"],
+                                         options["target_duration"],
+                                         on_wave=functools.partial(_echo_wave, shard)).run
+        try:
+            report = update_players(options["input"], workers=options["workers"], journal_file=journal,
+                                    resume=options["resume"], preflight=options["preflight"],
+                                    batch_size=options["batch_size"], shard=shard, state_cache=state_cache,
+                                    refresh_state=options["refresh_state"], inventory_cache=options["inventory_cache"])
+        except MusicPlayerClientError as err:
+            if err.report is None:
+                raise
+            report = err.report
+        finally:
+            if exporter is not None:
+                exporter.stop()
+            if state_cache is not None:
+                state_cache.save()
+        return report, client.login_count, client.connections_opened
+
+
+def _echo_wave(shard, number, wave_count, report):
+    """
+    Print the outcome of a rollout wave
+    """
+    from .rollout import WaveRollout
+
+    prefix = "Shard {0}/{1} wave".format(*shard) if shard is not None else "Wave"
+    click.echo("{0} {1}/{2}: {3} music players, {4} failed ({5:.1%})".format(
+        prefix, number, wave_count, len(report), len(report.failed), WaveRollout.error_rate(report)))
+
+
+async def _update_software_async(input, username, password, concurrency, journal, resume, preflight, policies,
+                                 shard=None, inventory_cache=False, connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                                 read_timeout=DEFAULT_READ_TIMEOUT):
+    """
+    Update software with the asyncio client
+
+    Returns:
+        tuple: update report and number of logins
+    """
+    from .async_client import AsyncMusicPlayerClient
+    from .client import MusicPlayerClientError
+
+    async with AsyncMusicPlayerClient(DEFAULT_BASE_URL, username, password, concurrency=concurrency,
+                                      connect_timeout=connect_timeout, read_timeout=read_timeout,
+                                      **policies) as client:
+        try:
+            report = await client.update_players(input, journal_file=journal, resume=resume, preflight=preflight,
+                                                 shard=shard, inventory_cache=inventory_cache)
+        except MusicPlayerClientError as err:
+            if err.report is None:
+                raise
+            report = err.report
+        return report, client.login_count
+
+
 if __name__ == '__main__':
     cli_pta()
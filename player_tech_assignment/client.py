@@ -5,24 +5,169 @@ Functionalities:
     1) GET /login request to get authentification token ID
     2) PUT /profiles/clientId:{macaddress} request to update the software version
 """
-import os
-import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import heapq
+import time
+from typing import List, Optional, Tuple
 import requests
 
+from .columns import MacAddressColumn
 from .csv_reader import MusicPlayerCsvReader
+from .defaults import DEFAULT_CONNECT_TIMEOUT, DEFAULT_POOL_SIZE, DEFAULT_READ_TIMEOUT
+from .inventory import MusicPlayerInventoryCache, MusicPlayerInventoryError
+from .journal import MusicPlayerUpdateJournal
+from .metrics import ClientMetrics
+from .profile import MusicPlayerProfile, MusicPlayerProfileError
+from .rate_limiter import AdaptiveConcurrencyLimiter, TokenBucket
+from .report import MusicPlayerUpdateReport, PlayerUpdateResult
+from .retry import RetryPolicy
+from .sharding import shard_of
+from .session import MusicPlayerSession
+from .state_cache import MusicPlayerStateCache
+from .token_manager import MusicPlayerTokenManager
+from .validation import MAC_ADDRESS_PATTERN, normalize_mac_address, validate_players
 
 __all__ = ['MusicPlayerClient', 'MusicPlayerClientError']
 
+# Responses of a server without the PUT /profiles/batch endpoint; a 404 only without an API message body,
+# as the server also answers an invalid token with 404
+BATCH_UNSUPPORTED_STATUS_CODES = frozenset({404, 405, 501})
+# Response of a server rejecting a batch larger than its limit
+BATCH_TOO_LARGE_STATUS_CODE = 413
+# Rows of MAC addresses packed at once while validating the .csv file
+COLLECT_CHUNK_ROWS = 65536
+_DONE = object()
+
 
 class MusicPlayerClientError(Exception):
     """
     Music Player Client Error
     """
-    pass
+
+    def __init__(self, message, report: MusicPlayerUpdateReport = None):
+        super().__init__(message)
+        self.report = report
+
+
+def _timed(iterable, metrics: ClientMetrics, phase: str, total: List[float] = None):
+    """
+    Yield the items of an iterable, adding the time spent producing them to a client phase
+
+    Args:
+        iterable (iterable): items to yield
+        metrics (ClientMetrics): client metrics
+        phase (str): client phase
+        total (list): single-item list the time spent is also added to, e.g. to leave it out of an
+            enclosing phase
+
+    Returns:
+        iterator: items of the iterable
+    """
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        item = next(iterator, _DONE)
+        elapsed = time.perf_counter() - start
+        metrics.add_duration(phase, elapsed)
+        if total is not None:
+            total[0] += elapsed
+        if item is _DONE:
+            return
+        yield item
+
+
+def read_mac_addresses(csv_file: str, preflight: bool = True, metrics: ClientMetrics = None,
+                       inventory_cache: bool = False):
+    """
+    Stream the MAC addresses of the music players to update
+
+    Without preflight, the MAC addresses are read lazily from the file, so
+    the first device is updated while the rest of the file is still being
+    read. With preflight, the file is read once to validate every row, and
+    the MAC addresses are kept packed in memory (6 bytes per device).
+
+    Args:
+        csv_file (str): music player update file
+        preflight (bool): validate every row before returning, and normalize the MAC addresses
+        metrics (ClientMetrics): client metrics timing the .csv file read and validation
+        inventory_cache (bool): with preflight, load the validated rows from the sidecar inventory file of
+            csv_file, only parsing the rows appended since it was written
+
+    Raises:
+        MusicPlayerCsvReaderError: invalid csv file
+        MusicPlayerClientError: invalid or duplicated MAC addresses, one line per row
+
+    Returns:
+        iterator: music player MAC addresses
+    """
+    if preflight and inventory_cache:
+        start = time.perf_counter()
+        try:
+            inventory = MusicPlayerInventoryCache(csv_file).load()
+        except MusicPlayerInventoryError as err:
+            raise MusicPlayerClientError(str(err))
+        if metrics is not None:
+            metrics.add_duration("csv_read", time.perf_counter() - start)
+        return iter(inventory.mac_addresses)
+
+    reader = MusicPlayerCsvReader(csv_file, preload=False)
+    # Time spent reading the file while it is validated, which is not validation time
+    read_time = [0.0]
+    records = reader.iter_players() if metrics is None else \
+        _timed(reader.iter_players(), metrics, "csv_read", read_time)
+    if not preflight:
+        return (record.mac_address for record in records)
+
+    start = time.perf_counter()
+    mac_addresses = MacAddressColumn()
+    errors = validate_players(_collect_mac_addresses(records, mac_addresses))
+    if metrics is not None:
+        metrics.add_duration("validation", time.perf_counter() - start - read_time[0])
+    if errors:
+        raise MusicPlayerClientError("{0} invalid MAC addresses:\n{1}".format(len(errors), "\n".join(errors)))
+    return map(normalize_mac_address, mac_addresses)
+
+
+def _collect_mac_addresses(records, mac_addresses: MacAddressColumn):
+    """
+    Args:
+        records (iterable): music player rows
+        mac_addresses (MacAddressColumn): column receiving the MAC address of every row, in chunks of rows
+
+    Yields:
+        MusicPlayerRecord: music player row
+    """
+    chunk = []
+    for record in records:
+        chunk.append(record.mac_address)
+        if len(chunk) == COLLECT_CHUNK_ROWS:
+            mac_addresses.extend(chunk)
+            chunk = []
+        yield record
+    mac_addresses.extend(chunk)
+
+
+def filter_shard(mac_addresses, shard: Tuple[int, int] = None):
+    """
+    Args:
+        mac_addresses (iterable): music player MAC addresses
+        shard (tuple): (index, count) shard to keep, None to keep every device
+
+    Returns:
+        iterator: MAC addresses of the shard
+    """
+    if shard is None:
+        return mac_addresses
+    index, count = shard
+    return (mac_address for mac_address in mac_addresses if shard_of(mac_address, count) == index)
 
 
 class MusicPlayerClient():
-    def __init__(self, base_url: str, username: str, password: str):
+    def __init__(self, base_url: str, username: str, password: str, pool_size: int = DEFAULT_POOL_SIZE,
+                 keep_alive: bool = True, connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout: float = DEFAULT_READ_TIMEOUT, retry_policy: RetryPolicy = None,
+                 rate_limiter: TokenBucket = None, concurrency_limiter: AdaptiveConcurrencyLimiter = None,
+                 profile: MusicPlayerProfile = None, metrics: ClientMetrics = None):
         """
         Music player client to make requests to the update server
 
@@ -30,17 +175,106 @@ class MusicPlayerClient():
             base_url (str): client base URL
             username (str): login username
             password (str): login password
+            pool_size (int): maximum number of kept-alive connections, should be at least the number of workers
+            keep_alive (bool): reuse connections between requests
+            connect_timeout (float): seconds to wait for a connection
+            read_timeout (float): seconds to wait for a response
+            retry_policy (RetryPolicy): retries of transient login and update failures
+            rate_limiter (TokenBucket): cap on the update request rate
+            concurrency_limiter (AdaptiveConcurrencyLimiter): adaptive cap on the in-flight update requests,
+                within the number of workers
+            profile (MusicPlayerProfile): software versions sent to the music players
+            metrics (ClientMetrics): request latency, status code, retry and in-flight metrics
         """
         self._base_url = base_url
+        self._metrics = metrics
+        self._profile = profile or MusicPlayerProfile()
+        self._batch_supported = True
+        # Largest batch accepted by the server, learned from 413 responses, None while unknown
+        self._batch_limit = None
+        self._retry_policy = retry_policy or RetryPolicy()
+        self._rate_limiter = rate_limiter
+        self._concurrency_limiter = concurrency_limiter
         self._username = username
         self._password = password
+        self._token_manager = MusicPlayerTokenManager(self.get_authentification_token_id)
+        self._session = MusicPlayerSession(pool_size=pool_size, keep_alive=keep_alive,
+                                           connect_timeout=connect_timeout, read_timeout=read_timeout)
 
         # Validate base url home page is accessible
         try:
-            requests.get(self._base_url)
-        except requests.exceptions.ConnectionError:
+            self._session.get(self._base_url)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            self._session.close()
             raise MusicPlayerClientError("Music player server is not accessible")
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Close the connections of the client
+        """
+        self._session.close()
+
+    @property
+    def connections_opened(self) -> int:
+        """
+        Returns:
+            int: number of TCP connections opened by the client
+        """
+        return self._session.connections_opened
+
+    @property
+    def login_count(self) -> int:
+        """
+        Returns:
+            int: number of logins made to get authentification tokens
+        """
+        return self._token_manager.login_count
+
+    @property
+    def rate_limiter(self) -> TokenBucket:
+        """
+        Returns:
+            TokenBucket: cap on the update request rate, None for no cap
+        """
+        return self._rate_limiter
+
+    @rate_limiter.setter
+    def rate_limiter(self, rate_limiter: TokenBucket):
+        """
+        Args:
+            rate_limiter (TokenBucket): cap on the update request rate, None for no cap, set between updates
+        """
+        self._rate_limiter = rate_limiter
+
+    @property
+    def metrics(self) -> ClientMetrics:
+        """
+        Returns:
+            ClientMetrics: client metrics, None if the client is not instrumented
+        """
+        return self._metrics
+
+    def _send(self, kind: str, send):
+        """
+        Send a request, recording it in the client metrics if any
+
+        Args:
+            kind (str): request kind
+            send (callable): function sending the request
+
+        Returns:
+            Response: request response
+        """
+        if self._metrics is None:
+            return send()
+        return self._metrics.track_request(kind, send)
+
     @staticmethod
     def _validate_mac_address(mac_address: str) -> bool:
         """
@@ -55,7 +289,7 @@ class MusicPlayerClient():
         if not isinstance(mac_address, str):
             raise MusicPlayerClientError("mac_address is of type {0} instead of {1}".format(type(mac_address), str))
 
-        return re.match("[0-9a-f]{2}([-:]?)[0-9a-f]{2}(\\1[0-9a-f]{2}){4}$", mac_address.lower())
+        return MAC_ADDRESS_PATTERN.fullmatch(mac_address)
 
     def _login(self):
         """ 
@@ -70,7 +304,7 @@ class MusicPlayerClient():
             "username": self._username,
             "password": self._password
         }
-        res = requests.post(url, data=json_data)
+        res = self._send("login", lambda: self._session.post(url, data=json_data))
         return res
 
     def _update_player(self, mac_address, token):
@@ -86,62 +320,499 @@ class MusicPlayerClient():
             Response: /profiles/clientId:{macaddress} PUT request response
         """
         url = '{0}/profiles/clientId:{1}?token={2}'.format(self._base_url, mac_address, token)
-        json_data = {
-            "profile": {
-                "applications": [
-                    {
-                        "applicationId": "music_app",
-                        "version": "v1.4.10"
-                    },
-                    {
-                        "applicationId": "diagnostic_app",
-                        "version": "v1.2.6"
-                    },
-                    {
-                        "applicationId": "settings_app",
-                        "version": "v1.1.5"
-                    }
-                ]
-            }
-        }
-        res = requests.put(url, json=json_data)
+        res = self._send("update", lambda: self._session.put(url, data=self._profile.payload,
+                                                             headers=self._profile.headers))
+        return res
+
+    def _get_player_profile(self, mac_address, token):
+        """
+        Get the last profile applied to a device with MAC address
+        GET /profiles/clientId:{macaddress} request
+
+        Args:
+            mac_address (str): music player MAC address
+            token (str): authentification token
+
+        Returns:
+            Response: /profiles/clientId:{macaddress} GET request response
+        """
+        url = '{0}/profiles/clientId:{1}?token={2}'.format(self._base_url, mac_address, token)
+        return self._send("profile", lambda: self._session.get(url))
+
+    @staticmethod
+    def _is_token_expired(res) -> bool:
+        """
+        Check if a request was rejected because of an expired token
+
+        Args:
+            res (Response): request response
+
+        Returns:
+            bool: True if the server reported an expired token
+        """
+        if res.status_code != 403:
+            return False
+        try:
+            return res.json().get("message") == "Token expired"
+        except ValueError:
+            return False
+
+    @staticmethod
+    def _is_batch_unsupported(res) -> bool:
+        """
+        Check if a batch request was rejected because the server has no batch endpoint
+
+        Args:
+            res (Response): /profiles/batch PUT request response
+
+        Returns:
+            bool: True if the server doesn't support batches
+        """
+        if res.status_code not in BATCH_UNSUPPORTED_STATUS_CODES:
+            return False
+        if res.status_code != 404:
+            return True
+        # Invalid token errors of the update API are JSON messages, a missing route isn't
+        try:
+            return "message" not in res.json()
+        except (ValueError, TypeError):
+            return True
+
+    def _update_players_batch(self, mac_addresses, token):
+        """
+        Update the software version of several devices with one request
+        PUT /profiles/batch request
+
+        Args:
+            mac_addresses (list): music player MAC addresses
+            token (str): authentification token
+
+        Returns:
+            Response: /profiles/batch PUT request response
+        """
+        url = '{0}/profiles/batch?token={1}'.format(self._base_url, token)
+        payload = self._profile.batch_payload(mac_addresses)
+        res = self._send("batch", lambda: self._session.put(url, data=payload,
+                                                            headers={"Content-Type": "application/json"}))
+        return res
+
+    def _send_with_token(self, send):
+        """
+        Send a request with the cached token, refreshing it once if the server reports it expired
+
+        Args:
+            send (callable): function sending the request with the given token
+
+        Returns:
+            Response: request response
+        """
+        token = self._token_manager.get_token()
+        res = send(token)
+        if self._is_token_expired(res):
+            self._token_manager.invalidate(token)
+            res = send(self._token_manager.get_token())
         return res
 
+    def _update_player_with_token(self, mac_address):
+        """
+        Update a device with the cached token, refreshing it once if the server reports it expired
+
+        Args:
+            mac_address (str): music player MAC address
+
+        Returns:
+            Response: /profiles/clientId:{macaddress} PUT request response
+        """
+        return self._send_with_token(lambda token: self._update_player(mac_address, token))
+
+    def _login_with_retry(self):
+        """
+        Login, retrying transient failures inline since every worker waits for the token anyway
+
+        Raises:
+            MusicPlayerClientError: server not reachable
+
+        Returns:
+            Response: /login POST request response
+        """
+        attempt = 1
+        while True:
+            try:
+                res = self._login()
+                if not self._retry_policy.should_retry(res.status_code, attempt):
+                    return res
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as err:
+                if not self._retry_policy.should_retry(None, attempt):
+                    raise MusicPlayerClientError("Could not get token: {0}".format(err))
+            if self._metrics is not None:
+                self._metrics.add_retry()
+            time.sleep(self._retry_policy.delay(attempt))
+            attempt += 1
+
     def get_authentification_token_id(self) -> str:
         """
         Get authentification ID
 
         Raises:
-            MusicPlayerClientError: [description]
+            MusicPlayerClientError: invalid credentials or server not reachable
 
         Returns:
             str: token id
         """
-        res = self._login()
+        res = self._login_with_retry()
         if res.status_code == 200:
             return res.json()["token"]
         else:
             raise MusicPlayerClientError("Could not get token because of invalid credentials")
 
-    def update_players(self, csv_file: str):
+    @staticmethod
+    def _invalid_mac_address_result(mac_address):
         """
-        Update music players from .csv configuration
+        Args:
+            mac_address (str): music player MAC address
+
+        Returns:
+            PlayerUpdateResult: failed result if the MAC address format is not valid, None otherwise
+        """
+        if not MusicPlayerClient._validate_mac_address(mac_address):
+            return PlayerUpdateResult(mac_address, None, "MAC address {0} format is not valid".format(mac_address))
+        return None
+
+    def _update_one(self, mac_address) -> PlayerUpdateResult:
+        """
+        Update one device, turning per-device failures into a result
 
         Args:
-           csv_file (str): music player update file
+            mac_address (str): music player MAC address
+
+        Raises:
+            MusicPlayerClientError: authentification failed
+
+        Returns:
+            PlayerUpdateResult: device update result, with no status code on connection errors
+        """
+        if self._rate_limiter is not None:
+            self._rate_limiter.acquire()
+        start = time.perf_counter()
+        try:
+            res = self._update_player_with_token(mac_address)
+        except requests.exceptions.RequestException as err:
+            result = PlayerUpdateResult(mac_address, None, str(err), elapsed=time.perf_counter() - start)
+        else:
+            result = PlayerUpdateResult(mac_address, res.status_code, "" if res.status_code == 200 else res.text.strip(),
+                                        elapsed=time.perf_counter() - start)
+        if self._concurrency_limiter is not None:
+            self._concurrency_limiter.on_response(result.status_code, result.elapsed)
+        return result
+
+    def _update_batch(self, mac_addresses) -> List[PlayerUpdateResult]:
+        """
+        Update several devices with one batch request, or one request per device
+        if there is a single device or the server doesn't support batches. A
+        batch rejected as too large is split in halves, and later batches are
+        sent within the size the server accepted.
+
+        Args:
+            mac_addresses (list): music player MAC addresses
+
+        Raises:
+            MusicPlayerClientError: authentification failed
+
+        Returns:
+            list: device update results, in the order of mac_addresses
+        """
+        if len(mac_addresses) == 1 or not self._batch_supported:
+            return [self._update_one(mac_address) for mac_address in mac_addresses]
+        limit = self._batch_limit
+        if limit is not None and len(mac_addresses) > limit:
+            return [result for start in range(0, len(mac_addresses), limit)
+                    for result in self._update_batch(mac_addresses[start:start + limit])]
+
+        if self._rate_limiter is not None:
+            self._rate_limiter.acquire()
+        start = time.perf_counter()
+        try:
+            res = self._send_with_token(lambda token: self._update_players_batch(mac_addresses, token))
+        except requests.exceptions.RequestException as err:
+            elapsed = time.perf_counter() - start
+            status_code = None
+            results = [PlayerUpdateResult(mac_address, None, str(err), elapsed=elapsed) for mac_address in mac_addresses]
+        else:
+            elapsed = time.perf_counter() - start
+            if self._is_batch_unsupported(res):
+                self._batch_supported = False
+                return [self._update_one(mac_address) for mac_address in mac_addresses]
+            if res.status_code == BATCH_TOO_LARGE_STATUS_CODE:
+                half = (len(mac_addresses) + 1) // 2
+                self._batch_limit = min(self._batch_limit or half, half)
+                return self._update_batch(mac_addresses[:half]) + self._update_batch(mac_addresses[half:])
+            status_code = res.status_code
+            results = self._batch_results(mac_addresses, res, elapsed)
+        if self._concurrency_limiter is not None:
+            self._concurrency_limiter.on_response(status_code, elapsed)
+        return results
+
+    @staticmethod
+    def _batch_results(mac_addresses, res, elapsed: float) -> List[PlayerUpdateResult]:
+        """
+        Split a batch response into device results
+
+        Args:
+            mac_addresses (list): music player MAC addresses of the batch
+            res (Response): /profiles/batch PUT request response
+            elapsed (float): request latency in seconds
+
+        Returns:
+            list: device update results, in the order of mac_addresses
+        """
+        if res.status_code != 200:
+            return [PlayerUpdateResult(mac_address, res.status_code, res.text.strip(), elapsed=elapsed)
+                    for mac_address in mac_addresses]
+        try:
+            statuses = res.json()["results"]
+            if len(statuses) != len(mac_addresses):
+                raise ValueError("batch response doesn't match the request")
+            return [PlayerUpdateResult(mac_address, status["status"], status.get("message", ""), elapsed=elapsed)
+                    for mac_address, status in zip(mac_addresses, statuses)]
+        except (ValueError, KeyError, TypeError) as err:
+            return [PlayerUpdateResult(mac_address, None, "Invalid batch response: {0}".format(err), elapsed=elapsed)
+                    for mac_address in mac_addresses]
+
+    def _update_all(self, mac_addresses, workers: int, journal: MusicPlayerUpdateJournal = None,
+                    resume: bool = False, batch_size: int = 1,
+                    state_cache: MusicPlayerStateCache = None) -> MusicPlayerUpdateReport:
+        """
+        Update devices on a bounded thread pool
+
+        Devices are sent in batches of batch_size. At most two batches per
+        worker are queued at once, or the adaptive concurrency limit if one is
+        set, and results are gathered by position so the report does not
+        depend on completion order. Transient failures go to a retry queue
+        ordered by due time instead of sleeping in a worker; due retries are
+        sent before new devices.
+
+        Args:
+            mac_addresses (iterable): music player MAC addresses
+            workers (int): number of concurrent requests
+            journal (MusicPlayerUpdateJournal): journal recording each device outcome
+            resume (bool): skip the devices already updated according to the journal
+            batch_size (int): number of devices per request
+            state_cache (MusicPlayerStateCache): skip the devices already running the profile, and record
+                the updated ones
 
         Raises:
-            MusicPlayerClientError: Update player request not successful
+            MusicPlayerClientError: authentification failed
+
+        Returns:
+            MusicPlayerUpdateReport: per device results in input order
         """
-        reader = MusicPlayerCsvReader(csv_file)
-        mac_address_list = reader.get_mac_address_list()
+        def finish(index, result):
+            results[index] = result
+            if journal is not None:
+                journal.record(result)
+            if state_cache is not None and result.status_code == 200:
+                state_cache.record(result.mac_address, self._profile.digest)
+
+        def new_devices():
+            for index, mac_address in enumerate(mac_addresses):
+                if resume and journal.is_updated(mac_address):
+                    results[index] = PlayerUpdateResult(mac_address, None, "already updated", skipped=True)
+                    continue
+                if state_cache is not None and state_cache.is_current(mac_address, self._profile.digest):
+                    results[index] = PlayerUpdateResult(mac_address, None, "already up to date", skipped=True)
+                    continue
+                invalid = self._invalid_mac_address_result(mac_address)
+                if invalid is not None:
+                    finish(index, invalid)
+                    continue
+                yield index, mac_address, 1
+
+        def next_batch():
+            batch = []
+            while len(batch) < batch_size:
+                if retries and retries[0][0] <= time.monotonic():
+                    batch.append(heapq.heappop(retries)[1:])
+                else:
+                    item = next(devices, None)
+                    if item is None:
+                        break
+                    batch.append(item)
+            return batch
 
-        for mac_address in mac_address_list:
-            if not self._validate_mac_address(mac_address):
-                raise MusicPlayerClientError("MAC address {0} format is not valid".format(mac_address))
+        devices = new_devices()
+        results = {}
+        retries = []  # heap of (due time, index, mac address, attempt)
+        pending = {}  # future -> batch of (index, mac address, attempt)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            try:
+                while True:
+                    in_flight = workers * 2
+                    if self._concurrency_limiter is not None:
+                        in_flight = min(workers, self._concurrency_limiter.limit)
+                    while len(pending) < in_flight:
+                        batch = next_batch()
+                        if not batch:
+                            break
+                        future = executor.submit(self._update_batch, [mac_address for _, mac_address, _ in batch])
+                        pending[future] = batch
 
-            token = self.get_authentification_token_id()
+                    if not pending:
+                        if not retries:
+                            break
+                        time.sleep(max(0, retries[0][0] - time.monotonic()))
+                        continue
 
-            res = self._update_player(mac_address, token)
+                    timeout = max(0, retries[0][0] - time.monotonic()) if retries else None
+                    done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        batch = pending.pop(future)
+                        for (index, mac_address, attempt), result in zip(batch, future.result()):
+                            result = result._replace(attempts=attempt)
+                            if not result.success and self._retry_policy.should_retry(result.status_code, attempt):
+                                due = time.monotonic() + self._retry_policy.delay(attempt)
+                                heapq.heappush(retries, (due, index, mac_address, attempt + 1))
+                                if self._metrics is not None:
+                                    self._metrics.add_retry()
+                            else:
+                                finish(index, result)
+            except BaseException:
+                for future in pending:
+                    future.cancel()
+                raise
+        return MusicPlayerUpdateReport(results[index] for index in sorted(results))
+
+    def _fetch_profile_digest(self, mac_address) -> Optional[int]:
+        """
+        Args:
+            mac_address (str): music player MAC address
+
+        Returns:
+            int: digest of the last profile applied to the device, None if unknown or the request failed
+        """
+        if self._rate_limiter is not None:
+            self._rate_limiter.acquire()
+        try:
+            res = self._send_with_token(lambda token: self._get_player_profile(mac_address, token))
             if res.status_code != 200:
-                raise MusicPlayerClientError("Error: {0}".format(res.text))
+                return None
+            return MusicPlayerProfile.from_dict(res.json()).digest
+        except (requests.exceptions.RequestException, ValueError, MusicPlayerProfileError):
+            return None
+
+    def refresh_state(self, mac_addresses, state_cache: MusicPlayerStateCache, workers: int = 1) -> int:
+        """
+        Record in the state cache the devices the server reports already running the profile
+
+        Only a confirmed target profile is recorded: a missing or other profile
+        leaves the device unknown, as a multi-process server may answer from
+        a worker that didn't apply the last update.
+
+        Args:
+            mac_addresses (iterable): music player MAC addresses
+            state_cache (MusicPlayerStateCache): state cache to refresh
+            workers (int): number of concurrent requests
+
+        Raises:
+            MusicPlayerClientError: authentification failed
+
+        Returns:
+            int: number of devices found already running the profile
+        """
+        digest = self._profile.digest
+        stale = [mac_address for mac_address in mac_addresses
+                 if self._validate_mac_address(mac_address) and not state_cache.is_current(mac_address, digest)]
+        up_to_date = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for mac_address, device_digest in zip(stale, executor.map(self._fetch_profile_digest, stale)):
+                if device_digest == digest:
+                    state_cache.record(mac_address, device_digest)
+                    up_to_date += 1
+        return up_to_date
+
+    def update_devices(self, mac_addresses, workers: int = 1, journal: MusicPlayerUpdateJournal = None,
+                       resume: bool = False, batch_size: int = 1,
+                       state_cache: MusicPlayerStateCache = None) -> MusicPlayerUpdateReport:
+        """
+        Update a list of music players, e.g. one wave of a staged rollout
+
+        Unlike update_players, failed devices are returned in the report
+        instead of raising.
+
+        Args:
+           mac_addresses (iterable): music player MAC addresses
+           workers (int): number of devices updated concurrently
+           journal (MusicPlayerUpdateJournal): open journal recording each device outcome
+           resume (bool): skip the devices already updated according to the journal
+           batch_size (int): number of devices per request
+           state_cache (MusicPlayerStateCache): skip the devices already running the profile, and record
+               the updated ones
+
+        Raises:
+            MusicPlayerClientError: invalid arguments or authentification failed
+
+        Returns:
+            MusicPlayerUpdateReport: per device results in mac_addresses order
+        """
+        if workers < 1:
+            raise MusicPlayerClientError("workers must be at least 1")
+        if batch_size < 1:
+            raise MusicPlayerClientError("batch_size must be at least 1")
+        if resume and journal is None:
+            raise MusicPlayerClientError("A journal file is required to resume an update")
+        return self._update_all(mac_addresses, workers, journal, resume, batch_size, state_cache)
+
+    def update_players(self, csv_file: str, workers: int = 1, journal_file: str = None,
+                       resume: bool = False, preflight: bool = True, batch_size: int = 1,
+                       shard: Tuple[int, int] = None, state_cache: MusicPlayerStateCache = None,
+                       refresh_state: bool = False, inventory_cache: bool = False) -> MusicPlayerUpdateReport:
+        """
+        Update music players from .csv configuration
+
+        A failed device does not stop the update of the others.
+
+        Args:
+           csv_file (str): music player update file
+           workers (int): number of devices updated concurrently
+           journal_file (str): checkpoint journal recording each device outcome
+           resume (bool): skip the devices already updated according to the journal
+           preflight (bool): validate and normalize all MAC addresses before the first request
+           batch_size (int): number of devices per request, falling back to one request per device if the
+               server doesn't support batches
+           shard (tuple): (index, count) shard of the devices to update, None for all devices
+           state_cache (MusicPlayerStateCache): skip the devices already running the profile, and record
+               the updated ones
+           refresh_state (bool): ask the server for the profile of the devices not up to date in the state cache
+               before updating them
+           inventory_cache (bool): with preflight, load the validated rows from the sidecar inventory file of
+               csv_file
+
+        Raises:
+            MusicPlayerClientError: invalid MAC addresses, authentification failed or update player request not successful
+
+        Returns:
+            MusicPlayerUpdateReport: per device results in .csv file order
+        """
+        if workers < 1:
+            raise MusicPlayerClientError("workers must be at least 1")
+        if batch_size < 1:
+            raise MusicPlayerClientError("batch_size must be at least 1")
+        if resume and journal_file is None:
+            raise MusicPlayerClientError("A journal file is required to resume an update")
+        if shard is not None and not 0 <= shard[0] < shard[1]:
+            raise MusicPlayerClientError("shard index must be between 0 and the shard count")
+
+        if refresh_state and state_cache is None:
+            raise MusicPlayerClientError("A state cache is required to refresh the device state")
+
+        mac_addresses = filter_shard(read_mac_addresses(csv_file, preflight, self._metrics, inventory_cache), shard)
+        if refresh_state:
+            mac_addresses = list(mac_addresses)
+            self.refresh_state(mac_addresses, state_cache, workers)
+        if journal_file is None:
+            report = self._update_all(mac_addresses, workers, batch_size=batch_size, state_cache=state_cache)
+        else:
+            with MusicPlayerUpdateJournal(journal_file) as journal:
+                report = self._update_all(mac_addresses, workers, journal, resume, batch_size, state_cache)
+        if report.failed:
+            raise MusicPlayerClientError(report.errors(), report)
+        return report
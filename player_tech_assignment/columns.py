@@ -0,0 +1,290 @@
+"""
+Compact column storage of the parsed .csv file
+
+A list of str costs about 60 bytes per MAC address and per id once object
+overhead is counted. The reader stores its columns as:
+    1) MacAddressColumn: canonical MAC addresses packed as 48-bit big-endian
+       integers in a bytearray (6 bytes each), other values kept verbatim
+    2) StringTableColumn: each distinct value stored once, rows hold a 4-byte
+       index into the table
+
+Both are read-only sequences returning the original strings.
+"""
+from array import array
+import binascii
+from collections.abc import Sequence
+from typing import Iterable, Iterator, List
+
+from .validation import CANONICAL_MAC_ADDRESS_PATTERN
+
+__all__ = ['MacAddressColumn', 'StringTableColumn']
+
+MAC_ADDRESS_SIZE = 6
+# Rows decoded at once when iterating a MAC address column
+DECODE_CHUNK_ROWS = 65536
+CANONICAL_MAC_ADDRESS_LENGTH = 17
+# Canonical MAC address line, its hexadecimal digits filled in by _format_mac_addresses()
+MAC_ADDRESS_LINE = b"00:00:00:00:00:00\n"
+
+
+def _format_mac_addresses(packed) -> str:
+    """
+    Format packed MAC addresses with one extended slice assignment per hexadecimal digit,
+    as bytes.hex() only takes a separator from Python 3.8
+
+    Args:
+        packed (bytes-like): MAC addresses packed as 48-bit big-endian integers
+
+    Returns:
+        str: canonical MAC addresses, each followed by a newline
+    """
+    digits = binascii.hexlify(packed).upper()
+    lines = bytearray(MAC_ADDRESS_LINE * (len(packed) // MAC_ADDRESS_SIZE))
+    step = len(MAC_ADDRESS_LINE)
+    for digit in range(2 * MAC_ADDRESS_SIZE):
+        # Digit pairs are separated by one ":"
+        lines[digit + digit // 2::step] = digits[digit::2 * MAC_ADDRESS_SIZE]
+    return lines.decode("ascii")
+
+
+class _Column(Sequence):
+    """
+    Read-only sequence comparing equal to any sequence of the same values
+    """
+
+    __hash__ = None
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence) or isinstance(other, str):
+            return NotImplemented
+        return len(self) == len(other) and all(value == other_value for value, other_value in zip(self, other))
+
+    def __repr__(self):
+        return "{0}({1!r})".format(type(self).__name__, list(self))
+
+    def _row(self, index: int) -> int:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("column index out of range")
+        return index
+
+
+class MacAddressColumn(_Column):
+    def __init__(self, mac_addresses: Iterable[str] = ()):
+        """
+        MAC addresses packed as 48-bit integers
+
+        Args:
+            mac_addresses (iterable): initial MAC addresses
+        """
+        self._buffer = bytearray()
+        # Row -> MAC address not in upper case, colon separated form, stored as is
+        self._verbatim = {}
+        self.extend(mac_addresses)
+
+    @classmethod
+    def from_bytes(cls, packed) -> "MacAddressColumn":
+        """
+        Args:
+            packed (bytes-like): canonical MAC addresses packed as 48-bit big-endian integers, e.g. from to_bytes()
+
+        Returns:
+            MacAddressColumn: column of the packed addresses
+        """
+        column = cls()
+        column._buffer = bytearray(packed)
+        return column
+
+    def to_bytes(self) -> bytes:
+        """
+        Raises:
+            ValueError: the column holds MAC addresses stored verbatim
+
+        Returns:
+            bytes: MAC addresses packed as 48-bit big-endian integers
+        """
+        if self._verbatim:
+            raise ValueError("column holds MAC addresses that are not in canonical form")
+        return bytes(self._buffer)
+
+    def __len__(self) -> int:
+        return len(self._buffer) // MAC_ADDRESS_SIZE
+
+    def append(self, mac_address: str):
+        """
+        Args:
+            mac_address (str): MAC address, in any format
+        """
+        if CANONICAL_MAC_ADDRESS_PATTERN.fullmatch(mac_address):
+            self._buffer += bytes.fromhex(mac_address.replace(":", ""))
+        else:
+            self._verbatim[len(self)] = mac_address
+            self._buffer += bytes(MAC_ADDRESS_SIZE)
+
+    def extend(self, mac_addresses: Iterable[str]):
+        """
+        Args:
+            mac_addresses (iterable): MAC addresses, in any format
+        """
+        mac_addresses = mac_addresses if isinstance(mac_addresses, list) else list(mac_addresses)
+        if not mac_addresses:
+            return
+        packed = self._pack_canonical(mac_addresses)
+        if packed is not None:
+            self._buffer += packed
+        else:
+            for mac_address in mac_addresses:
+                self.append(mac_address)
+
+    @staticmethod
+    def _pack_canonical(mac_addresses: List[str]):
+        """
+        Pack a list of MAC addresses with a few whole-list string operations
+
+        Args:
+            mac_addresses (list): MAC addresses
+
+        Returns:
+            bytes: packed addresses, None if any address is not in upper case, colon separated form
+        """
+        count = len(mac_addresses)
+        lines = "\n".join(mac_addresses)
+        step = CANONICAL_MAC_ADDRESS_LENGTH + 1
+        if len(lines) != step * count - 1 or lines[CANONICAL_MAC_ADDRESS_LENGTH::step] != "\n" * (count - 1):
+            return None
+        try:
+            # fromhex skips the newlines
+            packed = bytes.fromhex(lines.replace(":", ""))
+        except ValueError:
+            return None
+        # Every line is 17 characters long, so the round trip only matches canonical addresses
+        if _format_mac_addresses(packed)[:-1] != lines:
+            return None
+        return packed
+
+    def value(self, index: int) -> int:
+        """
+        Args:
+            index (int): row
+
+        Returns:
+            int: MAC address as a 48-bit integer, -1 if it is stored verbatim
+        """
+        index = self._row(index)
+        if index in self._verbatim:
+            return -1
+        return int.from_bytes(self._buffer[index * MAC_ADDRESS_SIZE:(index + 1) * MAC_ADDRESS_SIZE], "big")
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[row] for row in range(*index.indices(len(self)))]
+        index = self._row(index)
+        mac_address = self._verbatim.get(index)
+        if mac_address is not None:
+            return mac_address
+        return _format_mac_addresses(self._buffer[index * MAC_ADDRESS_SIZE:(index + 1) * MAC_ADDRESS_SIZE])[:-1]
+
+    def __iter__(self) -> Iterator[str]:
+        size = DECODE_CHUNK_ROWS * MAC_ADDRESS_SIZE
+        for start in range(0, len(self._buffer), size):
+            mac_addresses = _format_mac_addresses(self._buffer[start:start + size]).split("\n")
+            mac_addresses.pop()
+            if self._verbatim:
+                first_row = start // MAC_ADDRESS_SIZE
+                for row in range(first_row, first_row + len(mac_addresses)):
+                    if row in self._verbatim:
+                        mac_addresses[row - first_row] = self._verbatim[row]
+            yield from mac_addresses
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Returns:
+            int: size of the packed addresses in bytes, without the verbatim ones
+        """
+        return len(self._buffer)
+
+
+class StringTableColumn(_Column):
+    def __init__(self, values: Iterable[str] = ()):
+        """
+        Strings stored once in a table and referenced by a 4-byte index per row
+
+        Args:
+            values (iterable): initial values
+        """
+        self._table = []
+        self._indexes = {}
+        self._rows = array("I")
+        self.extend(values)
+
+    @classmethod
+    def from_table(cls, table: List[str], rows: array) -> "StringTableColumn":
+        """
+        Args:
+            table (list): distinct values, e.g. from distinct_values
+            rows (array): 4-byte index into the table of every row, e.g. from rows
+
+        Returns:
+            StringTableColumn: column of the rows
+        """
+        column = cls()
+        column._table = list(table)
+        column._indexes = {value: index for index, value in enumerate(column._table)}
+        column._rows = rows
+        return column
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def append(self, value: str):
+        """
+        Args:
+            value (str): row value
+        """
+        self.extend([value])
+
+    def extend(self, values: Iterable[str]):
+        """
+        Args:
+            values (iterable): row values
+        """
+        values = values if isinstance(values, list) else list(values)
+        for value in dict.fromkeys(values):
+            if value not in self._indexes:
+                self._indexes[value] = len(self._table)
+                self._table.append(value)
+        self._rows.extend(map(self._indexes.__getitem__, values))
+
+    @property
+    def distinct_values(self) -> List[str]:
+        """
+        Returns:
+            list: distinct values, in order of first appearance
+        """
+        return list(self._table)
+
+    @property
+    def rows(self) -> array:
+        """
+        Returns:
+            array: 4-byte index into distinct_values of every row
+        """
+        return self._rows
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._table[row] for row in self._rows[index]]
+        return self._table[self._rows[self._row(index)]]
+
+    def __iter__(self) -> Iterator[str]:
+        return map(self._table.__getitem__, self._rows)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Returns:
+            int: size of the row indexes in bytes, without the table
+        """
+        return self._rows.itemsize * len(self._rows)
@@ -1,11 +1,21 @@
 """
 Music Player .csv file reader
+
+Rows are parsed in large chunks: a chunk of plain "mac, id1, id2, id3" lines
+is split into columns with a few string operations on the whole chunk
+instead of one csv module call per row. From the first chunk that needs the
+csv dialect (quotes, carriage returns, missing or extra fields), the rest of
+the file is read with the csv module, giving the same values and errors.
 """
 import csv
+import io
+from itertools import chain
 from pathlib import Path
-from typing import List
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from .columns import MacAddressColumn, StringTableColumn
 
-__all__ = ['MusicPlayerCsvReader', 'MusicPlayerCsvReaderError']
+__all__ = ['MusicPlayerCsvReader', 'MusicPlayerCsvReaderError', 'MusicPlayerRecord']
 
 
 CSV_FILE_SUFFIX = ".csv"
@@ -13,6 +23,11 @@ CSV_FILE_MAC_ADDRESS_COLUMN_NAME = "mac_addresses"
 CSV_FILE_ID1_COLUMN_NAME = "id1"
 CSV_FILE_ID2_COLUMN_NAME = "id2"
 CSV_FILE_ID3_COLUMN_NAME = "id3"
+CSV_DELIMITER = ' '
+CSV_QUOTE_CHAR = '|'
+# Characters per chunk of the fast path, and rows per chunk of the csv module path
+FAST_PATH_CHUNK_SIZE = 1 << 22
+CSV_CHUNK_ROWS = 10000
 
 
 class MusicPlayerCsvReaderError(Exception):
@@ -22,28 +37,197 @@ class MusicPlayerCsvReaderError(Exception):
     pass
 
 
+class MusicPlayerRecord(NamedTuple):
+    """
+    One music player row of the .csv file
+    """
+    mac_address: str
+    id1: str
+    id2: str
+    id3: str
+    line_number: int
+
+
 class MusicPlayerCsvReader:
-    def __init__(self, csv_file):
+    def __init__(self, csv_file, preload: bool = True, fast_path: bool = True):
         """
         Music Player .csv file reader
 
         Args:
             csv_file (str): music player update file
+            preload (bool): read the whole file in memory, otherwise only the header
+                is validated and rows are read on demand with iter_players()
+            fast_path (bool): split plain chunks of rows without the csv module
 
         Raises:
             MusicPlayerCsvReaderError: csv file not found or wrong extension
         """
-        self._csv_file_dict = {}
-        self._csv_file_dict["mac_addresses"] = []
-        self._csv_file_dict["id1"] = []
-        self._csv_file_dict["id2"] = []
-        self._csv_file_dict["id3"] = []
+        self._mac_addresses = MacAddressColumn()
+        self._ids = (StringTableColumn(), StringTableColumn(), StringTableColumn())
         self._csv_file = Path(csv_file)
+        self._fast_path = fast_path
         if not self._csv_file.is_file():
             raise MusicPlayerCsvReaderError("{0} file not found".format(csv_file))
         if self._csv_file.suffix != CSV_FILE_SUFFIX:
             raise MusicPlayerCsvReaderError("{0} file doesn't contain a {1} extension".format(csv_file, CSV_FILE_SUFFIX))
-        self.read()
+        if preload:
+            self.read()
+        else:
+            with open(self._csv_file, newline='') as csvfile:
+                self._validate_header(next(csv.reader(csvfile, delimiter=CSV_DELIMITER, quotechar=CSV_QUOTE_CHAR), None))
+
+    def _validate_header(self, rows):
+        """
+        Verify column names
+
+        Args:
+            rows (list): first row of the csv file, None if the file is empty
+
+        Raises:
+            MusicPlayerCsvReaderError: wrong column name
+        """
+        if rows is None:
+            return
+        rows = rows + [""] * (4 - len(rows))
+        if CSV_FILE_MAC_ADDRESS_COLUMN_NAME not in rows[0]:
+            raise MusicPlayerCsvReaderError("{0} file wrong mac address column name".format(self._csv_file))
+        elif CSV_FILE_ID1_COLUMN_NAME not in rows[1]:
+            raise MusicPlayerCsvReaderError("{0} file wrong id1 column name".format(self._csv_file))
+        elif CSV_FILE_ID2_COLUMN_NAME not in rows[2]:
+            raise MusicPlayerCsvReaderError("{0} file wrong id2 column name".format(self._csv_file))
+        elif CSV_FILE_ID3_COLUMN_NAME not in rows[3]:
+            raise MusicPlayerCsvReaderError("{0} file wrong id3 column name".format(self._csv_file))
+
+    @staticmethod
+    def _split_chunk(chunk: str) -> Optional[Tuple[List[str], List[str], List[str], List[str]]]:
+        """
+        Split a chunk of complete lines into columns, if every line is exactly four non-empty fields
+
+        Args:
+            chunk (str): lines of the file, ending with a newline
+
+        Returns:
+            tuple: MAC address, id1, id2 and id3 columns, None if the chunk needs the csv module
+        """
+        if CSV_QUOTE_CHAR in chunk or '\x00' in chunk:
+            return None
+        if '\r' in chunk:
+            if chunk.count('\r') != chunk.count('\r\n'):
+                return None
+            chunk = chunk.replace('\r\n', '\n')
+        # Every line split into its four fields followed by a newline token, so the line structure is
+        # checked on the whole chunk at once instead of counting the delimiters of every line
+        line_count = chunk.count('\n')
+        fields = chunk.replace('\n', CSV_DELIMITER + '\n' + CSV_DELIMITER).split(CSV_DELIMITER)
+        fields.pop()
+        if len(fields) != 5 * line_count or fields[4::5] != ['\n'] * line_count or '' in fields:
+            return None
+        mac_addresses = fields[0::5]
+        if ',' in chunk:
+            mac_addresses = '\n'.join(mac_addresses).replace(',', '').split('\n')
+        return mac_addresses, fields[1::5], fields[2::5], fields[3::5]
+
+    def _iter_csv_columns(self, lines: Iterable[str], first_line_number: int) -> Iterator[Tuple]:
+        """
+        Parse rows with the csv module
+
+        Args:
+            lines (iterable): lines of the file after the rows already parsed
+            first_line_number (int): line number of the first line
+
+        Raises:
+            MusicPlayerCsvReaderError: invalid csv file content
+
+        Yields:
+            tuple: MAC address, id1, id2, id3 and line number columns of up to CSV_CHUNK_ROWS rows
+        """
+        reader = csv.reader(lines, delimiter=CSV_DELIMITER, quotechar=CSV_QUOTE_CHAR)
+        columns = ([], [], [], [], [])
+        for rows in reader:
+            if len(rows) < 4 or not rows[0] or not rows[1] or not rows[2] or not rows[3]:
+                raise MusicPlayerCsvReaderError("{0} has empty elements".format(self._csv_file))
+            columns[0].append(rows[0].replace(",", ""))
+            columns[1].append(rows[1])
+            columns[2].append(rows[2])
+            columns[3].append(rows[3])
+            columns[4].append(first_line_number - 1 + reader.line_num)
+            if len(columns[0]) == CSV_CHUNK_ROWS:
+                yield columns
+                columns = ([], [], [], [], [])
+        if columns[0]:
+            yield columns
+
+    def _iter_columns(self, offset: int = 0, line_number: int = 2) -> Iterator[Tuple]:
+        """
+        Parse the rows of the CSV file in chunks
+
+        Args:
+            offset (int): byte offset of the first row to parse, at the start of a line; 0 to validate
+                the header and parse every row
+            line_number (int): line number of the row at offset
+
+        Raises:
+            MusicPlayerCsvReaderError: invalid csv file content
+
+        Yields:
+            tuple: MAC address, id1, id2, id3 and line number columns of a chunk of rows
+        """
+        with open(self._csv_file, newline='') as csvfile:
+            if offset:
+                csvfile.seek(offset)
+            else:
+                header = csvfile.readline()
+                self._validate_header(next(csv.reader([header], delimiter=CSV_DELIMITER, quotechar=CSV_QUOTE_CHAR),
+                                           None))
+            if not self._fast_path:
+                yield from self._iter_csv_columns(csvfile, line_number)
+                return
+
+            rest = ""
+            while True:
+                data = csvfile.read(FAST_PATH_CHUNK_SIZE)
+                chunk = rest + data
+                if not data:
+                    if not chunk:
+                        return
+                    # Last line without newline
+                    columns = self._split_chunk(chunk + '\n')
+                    if columns is None:
+                        yield from self._iter_csv_columns(io.StringIO(chunk, newline=''), line_number)
+                    else:
+                        yield columns + (range(line_number, line_number + len(columns[0])),)
+                    return
+
+                cut = chunk.rfind('\n') + 1
+                chunk, rest = chunk[:cut], chunk[cut:]
+                if not chunk:
+                    continue
+                columns = self._split_chunk(chunk)
+                if columns is None:
+                    # Complete the current line, the csv module ends a row at the end of every line it is given
+                    lines = io.StringIO(chunk + rest + csvfile.readline(), newline='')
+                    yield from self._iter_csv_columns(chain(lines, csvfile), line_number)
+                    return
+                yield columns + (range(line_number, line_number + len(columns[0])),)
+                line_number += len(columns[0])
+
+    def iter_players(self, offset: int = 0, line_number: int = 2) -> Iterator[MusicPlayerRecord]:
+        """
+        Stream the music players of the CSV file, one chunk of rows at a time
+
+        Args:
+            offset (int): byte offset of the first row to read, at the start of a line, e.g. the previous
+                size of a file appended to; 0 to validate the header and read every row
+            line_number (int): line number of the row at offset
+
+        Raises:
+            MusicPlayerCsvReaderError: invalid csv file content
+
+        Yields:
+            MusicPlayerRecord: music player row
+        """
+        for columns in self._iter_columns(offset, line_number):
+            yield from map(MusicPlayerRecord, *columns)
 
     def read(self):
         """
@@ -52,29 +236,37 @@ class MusicPlayerCsvReader:
         Raises:
             MusicPlayerCsvReaderError: invalid csv file content 
         """
-        with open(self._csv_file, newline='') as csvfile:
-            reader = csv.reader(csvfile, delimiter=' ', quotechar='|')
-            line_count = 0
-            for rows in reader:
-                # Verify column name
-                if line_count == 0:
-                    if CSV_FILE_MAC_ADDRESS_COLUMN_NAME not in rows[0]:
-                        raise MusicPlayerCsvReaderError("{0} file wrong mac address column name".format(self._csv_file))
-                    elif CSV_FILE_ID1_COLUMN_NAME not in rows[1]:
-                        raise MusicPlayerCsvReaderError("{0} file wrong id1 column name".format(self._csv_file))
-                    elif CSV_FILE_ID2_COLUMN_NAME not in rows[2]:
-                        raise MusicPlayerCsvReaderError("{0} file wrong id2 column name".format(self._csv_file))
-                    elif CSV_FILE_ID3_COLUMN_NAME not in rows[3]:
-                        raise MusicPlayerCsvReaderError("{0} file wrong id3 column name".format(self._csv_file))
-
-                if line_count != 0:
-                    if not rows[0] or not rows[1] or not rows[2] or not rows[3]:
-                        raise MusicPlayerCsvReaderError("{0} has empty elements".format(self._csv_file))
-                    self._csv_file_dict["mac_addresses"].append(rows[0].replace(",", ""))
-                    self._csv_file_dict["id1"].append(rows[1])
-                    self._csv_file_dict["id2"].append(rows[2])
-                    self._csv_file_dict["id3"].append(rows[3])
-                line_count += 1
-
-    def get_mac_address_list(self) -> List:
-        return self._csv_file_dict["mac_addresses"]
+        mac_addresses = MacAddressColumn()
+        ids = (StringTableColumn(), StringTableColumn(), StringTableColumn())
+        for chunk_mac_addresses, id1, id2, id3, _ in self._iter_columns():
+            mac_addresses.extend(chunk_mac_addresses)
+            ids[0].extend(id1)
+            ids[1].extend(id2)
+            ids[2].extend(id3)
+        self._mac_addresses = mac_addresses
+        self._ids = ids
+
+    def __len__(self) -> int:
+        return len(self._mac_addresses)
+
+    def get_mac_address_list(self) -> Sequence:
+        """
+        Returns:
+            MacAddressColumn: lazy, read-only view of the MAC addresses read, comparing equal to a list
+        """
+        return self._mac_addresses
+
+    def get_id_list(self, column: int) -> Sequence:
+        """
+        Args:
+            column (int): id column, 1 to 3
+
+        Raises:
+            MusicPlayerCsvReaderError: unknown id column
+
+        Returns:
+            StringTableColumn: lazy, read-only view of the ids read in the column
+        """
+        if not 1 <= column <= len(self._ids):
+            raise MusicPlayerCsvReaderError("id column {0} doesn't exist".format(column))
+        return self._ids[column - 1]
@@ -0,0 +1,25 @@
+"""
+Default settings shared by the modules and the command line options
+
+Kept free of third-party imports, so the CLI options can be declared
+without loading requests, Flask or gunicorn.
+"""
+
+__all__ = []
+
+# Largest PUT /profiles/batch request accepted by the simulation server
+MAX_BATCH_SIZE = 1000
+
+# HTTP session of the client
+DEFAULT_POOL_SIZE = 10
+DEFAULT_CONNECT_TIMEOUT = 3.05
+DEFAULT_READ_TIMEOUT = 30
+
+# Staged canary rollout
+DEFAULT_CANARY = 0.01
+DEFAULT_GROWTH = 2.0
+DEFAULT_MAX_ERROR_RATE = 0.05
+
+# Multi-process simulation server
+DEFAULT_SERVER_WORKERS = 4
+DEFAULT_SERVER_THREADS = 4
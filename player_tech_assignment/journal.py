@@ -0,0 +1,110 @@
+"""
+Music player software update checkpoint journal
+
+Append-only text file with one line per device update outcome:
+    <status code or '-'>\t<mac address>\n
+The latest line of a MAC address wins when the journal is replayed, so an
+interrupted rollout can be resumed without updating the same devices again.
+"""
+import os
+import threading
+from pathlib import Path
+
+from .report import PlayerUpdateResult
+
+__all__ = ['MusicPlayerUpdateJournal']
+
+DEFAULT_FSYNC_BATCH_SIZE = 100
+
+
+class MusicPlayerUpdateJournal:
+    def __init__(self, journal_file, fsync_batch_size: int = DEFAULT_FSYNC_BATCH_SIZE):
+        """
+        Checkpoint journal of device update outcomes
+
+        Existing entries are replayed into an index by MAC address when the
+        journal is opened, then new outcomes are appended.
+
+        Args:
+            journal_file (str): journal file path, created if missing
+            fsync_batch_size (int): number of records written between two fsync
+        """
+        self._journal_file = Path(journal_file)
+        self._fsync_batch_size = fsync_batch_size
+        self._lock = threading.Lock()
+        self._unsynced = 0
+        self._outcomes = {}
+
+        truncated = self._replay()
+        self._file = open(self._journal_file, "a", encoding="utf-8", newline="\n")
+        if truncated:
+            # Terminate the line partially written by an interrupted run
+            self._file.write("\n")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._outcomes)
+
+    def _replay(self) -> bool:
+        """
+        Index the outcomes of previous runs by MAC address
+
+        Returns:
+            bool: True if the journal ends with a partially written line, which is ignored
+        """
+        if not self._journal_file.is_file():
+            return False
+        data = self._journal_file.read_text(encoding="utf-8", errors="replace")
+        end = data.rfind("\n") + 1
+        # Anything after the last newline was partially written
+        truncated = end != len(data)
+        outcomes = self._outcomes
+        for line in data[:end].split("\n"):
+            status, _, mac_address = line.partition("\t")
+            if mac_address:
+                outcomes[mac_address] = status
+        return truncated
+
+    def is_updated(self, mac_address: str) -> bool:
+        """
+        Args:
+            mac_address (str): music player MAC address
+
+        Returns:
+            bool: True if the last recorded update of the device was successful
+        """
+        return self._outcomes.get(mac_address) == "200"
+
+    def record(self, result: PlayerUpdateResult):
+        """
+        Append a device update outcome, fsyncing every fsync_batch_size records
+
+        Args:
+            result (PlayerUpdateResult): device update result
+        """
+        status = "-" if result.status_code is None else str(result.status_code)
+        with self._lock:
+            self._file.write("{0}\t{1}\n".format(status, result.mac_address))
+            self._outcomes[result.mac_address] = status
+            self._unsynced += 1
+            if self._unsynced >= self._fsync_batch_size:
+                self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def close(self):
+        """
+        Flush pending records to disk and close the journal
+        """
+        with self._lock:
+            if not self._file.closed:
+                self._sync()
+                self._file.close()
@@ -0,0 +1,403 @@
+"""
+Metrics of the music player client
+
+    1) Histogram counts observations in fixed buckets, so recording a latency
+       is a bisect and two additions whatever the number of requests
+    2) ClientMetrics holds the request latency histograms, status code counts,
+       retries, bytes sent, in-flight requests and .csv file phase durations
+    3) MetricsExporter writes them as Prometheus text or a JSON snapshot,
+       periodically during an update and once at the end
+"""
+from bisect import bisect_left
+from collections import Counter
+import json
+import os
+from pathlib import Path
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Tuple
+
+__all__ = ['Histogram', 'LocalHistogram', 'ClientMetrics', 'MetricsExporter', 'METRICS_FORMATS']
+
+# Seconds, from 1 ms to 10 s
+DEFAULT_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRICS_FORMATS = ["prometheus", "json"]
+DEFAULT_EXPORT_INTERVAL = 10.0
+
+
+class Histogram:
+    def __init__(self, buckets: Iterable[float] = DEFAULT_LATENCY_BUCKETS):
+        """
+        Thread-safe histogram of fixed buckets
+
+        Args:
+            buckets (iterable): bucket upper bounds, an observation equal to a bound falls in its bucket
+        """
+        self._bounds = tuple(sorted(buckets))
+        self._counts = [0] * (len(self._bounds) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        """
+        Args:
+            value (float): observed value
+        """
+        index = bisect_left(self._bounds, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def merge(self, other: "Histogram"):
+        """
+        Add the observations of a histogram with the same buckets
+
+        Args:
+            other (Histogram): histogram to add
+
+        Raises:
+            ValueError: different buckets
+        """
+        if other._bounds != self._bounds:
+            raise ValueError("histograms have different buckets")
+        with other._lock:
+            counts = list(other._counts)
+            total = other._sum
+        with self._lock:
+            self._counts = [count + added for count, added in zip(self._counts, counts)]
+            self._sum += total
+
+    @property
+    def count(self) -> int:
+        return sum(self._counts)
+
+    @property
+    def sum(self) -> float:
+        return self._sum
+
+    def cumulative_counts(self) -> List[Tuple[float, int]]:
+        """
+        Returns:
+            list: (upper bound, number of observations <= upper bound) pairs, ending with infinity
+        """
+        with self._lock:
+            counts = list(self._counts)
+        cumulative = []
+        total = 0
+        for bound, count in zip(self._bounds + (float("inf"),), counts):
+            total += count
+            cumulative.append((bound, total))
+        return cumulative
+
+    def quantile(self, fraction: float) -> float:
+        """
+        Args:
+            fraction (float): quantile between 0 and 1
+
+        Returns:
+            float: upper bound of the bucket holding the quantile, 0 if there is no observation
+        """
+        cumulative = self.cumulative_counts()
+        rank = fraction * cumulative[-1][1]
+        for bound, total in cumulative:
+            if total and total >= rank:
+                return bound
+        return 0.0
+
+    def to_dict(self) -> Dict:
+        """
+        Returns:
+            dict: count, sum, p50/p95/p99 and cumulative bucket counts
+        """
+        return {
+            "count": self.count,
+            "sum": self._sum,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": {format_bound(bound): total for bound, total in self.cumulative_counts()},
+        }
+
+
+class LocalHistogram(Histogram):
+    """
+    Histogram updated by a single thread, without locking
+
+    Other threads may read or merge it at any time; a read racing an
+    observation can miss that observation but never corrupts the counts.
+    """
+
+    def observe(self, value: float):
+        """
+        Args:
+            value (float): observed value
+        """
+        self._counts[bisect_left(self._bounds, value)] += 1
+        self._sum += value
+
+
+def format_bound(bound: float) -> str:
+    """
+    Args:
+        bound (float): bucket upper bound
+
+    Returns:
+        str: Prometheus "le" label value
+    """
+    return "+Inf" if bound == float("inf") else repr(bound)
+
+
+def format_labels(labels: Dict[str, str]) -> str:
+    """
+    Args:
+        labels (dict): label names and values
+
+    Returns:
+        str: Prometheus label set, empty if there is no label
+    """
+    if not labels:
+        return ""
+    return "{" + ",".join('{0}="{1}"'.format(name, value) for name, value in labels.items()) + "}"
+
+
+def format_prometheus_histogram(name: str, histogram: Histogram, labels: Dict[str, str] = None) -> List[str]:
+    """
+    Args:
+        name (str): metric name
+        histogram (Histogram): histogram to export
+        labels (dict): label names and values
+
+    Returns:
+        list: Prometheus text lines of the histogram buckets, sum and count
+    """
+    labels = labels or {}
+    lines = ["{0}_bucket{1} {2}".format(name, format_labels(dict(labels, le=format_bound(bound))), total)
+             for bound, total in histogram.cumulative_counts()]
+    lines.append("{0}_sum{1} {2}".format(name, format_labels(labels), histogram.sum))
+    lines.append("{0}_count{1} {2}".format(name, format_labels(labels), histogram.count))
+    return lines
+
+
+class ClientMetrics:
+    def __init__(self, buckets: Iterable[float] = DEFAULT_LATENCY_BUCKETS):
+        """
+        Thread-safe request metrics of a music player client
+
+        Args:
+            buckets (iterable): latency histogram bucket upper bounds in seconds
+        """
+        self._buckets = tuple(buckets)
+        self._latencies = {}
+        self._responses = Counter()
+        self._retries = 0
+        self._bytes_sent = 0
+        self._in_flight = 0
+        self._max_in_flight = 0
+        self._durations = Counter()
+        self._lock = threading.Lock()
+
+    def _histogram(self, kind: str) -> Histogram:
+        histogram = self._latencies.get(kind)
+        if histogram is None:
+            with self._lock:
+                histogram = self._latencies.setdefault(kind, Histogram(self._buckets))
+        return histogram
+
+    def track_request(self, kind: str, send: Callable):
+        """
+        Send a request, recording its latency, status code, body size and in-flight count
+
+        Args:
+            kind (str): request kind, e.g. "login" or "update"
+            send (callable): function sending the request and returning its response
+
+        Returns:
+            Response: request response
+        """
+        with self._lock:
+            self._in_flight += 1
+            if self._in_flight > self._max_in_flight:
+                self._max_in_flight = self._in_flight
+        status = "error"
+        body_size = 0
+        start = time.perf_counter()
+        try:
+            res = send()
+            status = str(res.status_code)
+            body = res.request.body if res.request is not None else None
+            body_size = len(body) if body else 0
+            return res
+        finally:
+            self._histogram(kind).observe(time.perf_counter() - start)
+            with self._lock:
+                self._in_flight -= 1
+                self._responses[(kind, status)] += 1
+                self._bytes_sent += body_size
+
+    def add_retry(self):
+        """
+        Count a request scheduled again after a transient failure
+        """
+        with self._lock:
+            self._retries += 1
+
+    def add_duration(self, phase: str, seconds: float):
+        """
+        Args:
+            phase (str): client phase, e.g. "csv_read" or "validation"
+            seconds (float): time spent in the phase
+        """
+        with self._lock:
+            self._durations[phase] += seconds
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def retries(self) -> int:
+        return self._retries
+
+    @property
+    def bytes_sent(self) -> int:
+        return self._bytes_sent
+
+    def latency(self, kind: str) -> Histogram:
+        """
+        Args:
+            kind (str): request kind
+
+        Returns:
+            Histogram: latency histogram of the request kind in seconds
+        """
+        return self._histogram(kind)
+
+    def snapshot(self) -> Dict:
+        """
+        Returns:
+            dict: JSON serializable copy of every metric
+        """
+        with self._lock:
+            responses = dict(self._responses)
+            durations = dict(self._durations)
+            latencies = dict(self._latencies)
+            counters = {
+                "retries": self._retries,
+                "bytes_sent": self._bytes_sent,
+                "in_flight": self._in_flight,
+                "max_in_flight": self._max_in_flight,
+            }
+        statuses = {}
+        for (kind, status), count in sorted(responses.items()):
+            statuses.setdefault(kind, {})[status] = count
+        return dict(counters, **{
+            "timestamp": time.time(),
+            "responses": statuses,
+            "latency_seconds": {kind: histogram.to_dict() for kind, histogram in sorted(latencies.items())},
+            "phase_seconds": durations,
+        })
+
+    def to_prometheus(self) -> str:
+        """
+        Returns:
+            str: every metric in the Prometheus text exposition format
+        """
+        snapshot = self.snapshot()
+        lines = ["# HELP music_player_client_request_duration_seconds Request latency",
+                 "# TYPE music_player_client_request_duration_seconds histogram"]
+        for kind in snapshot["latency_seconds"]:
+            lines.extend(format_prometheus_histogram("music_player_client_request_duration_seconds",
+                                                     self._histogram(kind), {"kind": kind}))
+        lines.extend(["# HELP music_player_client_responses_total Responses by status code, error for no response",
+                      "# TYPE music_player_client_responses_total counter"])
+        for kind, statuses in snapshot["responses"].items():
+            for status, count in statuses.items():
+                lines.append("music_player_client_responses_total{0} {1}".format(
+                    format_labels({"kind": kind, "status": status}), count))
+        lines.extend(["# HELP music_player_client_phase_seconds_total Time spent reading and validating the .csv file",
+                      "# TYPE music_player_client_phase_seconds_total counter"])
+        for phase, seconds in sorted(snapshot["phase_seconds"].items()):
+            lines.append("music_player_client_phase_seconds_total{0} {1}".format(
+                format_labels({"phase": phase}), seconds))
+        for name, metric_type, help_text, key in (
+                ("retries_total", "counter", "Requests scheduled again after a transient failure", "retries"),
+                ("request_bytes_total", "counter", "Request body bytes sent", "bytes_sent"),
+                ("in_flight_requests", "gauge", "Requests waiting for a response", "in_flight"),
+                ("max_in_flight_requests", "gauge", "Highest number of requests waiting for a response",
+                 "max_in_flight")):
+            lines.extend(["# HELP music_player_client_{0} {1}".format(name, help_text),
+                          "# TYPE music_player_client_{0} {1}".format(name, metric_type),
+                          "music_player_client_{0} {1}".format(name, snapshot[key])])
+        return "\n".join(lines) + "\n"
+
+    def write(self, metrics_file, metrics_format: str = "prometheus"):
+        """
+        Write the metrics to a file, atomically replacing the previous export
+
+        Args:
+            metrics_file (str): output file
+            metrics_format (str): "prometheus" text or "json" snapshot
+
+        Raises:
+            ValueError: unknown format
+        """
+        if metrics_format == "prometheus":
+            content = self.to_prometheus()
+        elif metrics_format == "json":
+            content = json.dumps(self.snapshot(), indent=2) + "\n"
+        else:
+            raise ValueError("metrics format must be one of {0}".format(", ".join(METRICS_FORMATS)))
+        metrics_file = Path(metrics_file)
+        tmp_file = metrics_file.with_name(metrics_file.name + ".tmp")
+        tmp_file.write_text(content, encoding="utf-8")
+        os.replace(tmp_file, metrics_file)
+
+
+class MetricsExporter:
+    def __init__(self, metrics: ClientMetrics, metrics_file, metrics_format: str = "prometheus",
+                 interval: float = DEFAULT_EXPORT_INTERVAL):
+        """
+        Background thread writing the client metrics every interval, and once more when stopped
+
+        Args:
+            metrics (ClientMetrics): metrics to export
+            metrics_file (str): output file
+            metrics_format (str): "prometheus" text or "json" snapshot
+            interval (float): seconds between exports, 0 to export only when stopped
+
+        Raises:
+            ValueError: unknown format
+        """
+        if metrics_format not in METRICS_FORMATS:
+            raise ValueError("metrics format must be one of {0}".format(", ".join(METRICS_FORMATS)))
+        self._metrics = metrics
+        self._metrics_file = metrics_file
+        self._metrics_format = metrics_format
+        self._interval = interval
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stopped.wait(self._interval):
+            self._metrics.write(self._metrics_file, self._metrics_format)
+
+    def start(self):
+        if self._interval > 0:
+            self._thread = threading.Thread(target=self._run, name="metrics-exporter", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """
+        Stop the periodic exports and write the final metrics
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._metrics.write(self._metrics_file, self._metrics_format)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,186 @@
+"""
+Music player software profile
+
+Target application versions sent to every music player. The request body is
+serialized once and reused for every PUT /profiles/clientId:{macaddress}.
+"""
+import hashlib
+import json
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+__all__ = ['MusicPlayerProfile', 'MusicPlayerProfileError']
+
+DEFAULT_APPLICATIONS = (
+    ("music_app", "v1.4.10"),
+    ("diagnostic_app", "v1.2.6"),
+    ("settings_app", "v1.1.5"),
+)
+
+
+class MusicPlayerProfileError(Exception):
+    """
+    Music Player Profile Error
+    """
+    pass
+
+
+class MusicPlayerProfile:
+    def __init__(self, applications: Iterable[Tuple[str, str]] = DEFAULT_APPLICATIONS):
+        """
+        Music player software profile
+
+        Args:
+            applications (iterable): (applicationId, version) pairs
+
+        Raises:
+            MusicPlayerProfileError: no application or empty application ID or version
+        """
+        self._applications = tuple((str(application_id), str(version)) for application_id, version in applications)
+        if not self._applications:
+            raise MusicPlayerProfileError("Profile doesn't contain any application")
+        for application_id, version in self._applications:
+            if not application_id or not version:
+                raise MusicPlayerProfileError("Profile application {0} has an empty ID or version".format(
+                    (application_id, version)))
+
+        self._payload = json.dumps(self.to_dict(), separators=(",", ":")).encode("utf-8")
+        self._digest = int.from_bytes(hashlib.blake2b(self._payload, digest_size=8).digest(), "big")
+        self._headers = {
+            "Content-Type": "application/json",
+            "Content-Length": str(len(self._payload)),
+        }
+
+    def __eq__(self, other):
+        return isinstance(other, MusicPlayerProfile) and self._applications == other._applications
+
+    def __hash__(self):
+        return hash(self._applications)
+
+    @classmethod
+    def from_file(cls, profile_file) -> "MusicPlayerProfile":
+        """
+        Load a profile from a JSON file, with or without the top-level "profile" key:
+            {"profile": {"applications": [{"applicationId": "music_app", "version": "v1.4.10"}]}}
+
+        Args:
+            profile_file (str): JSON profile file
+
+        Raises:
+            MusicPlayerProfileError: file not found or invalid content
+
+        Returns:
+            MusicPlayerProfile: music player profile
+        """
+        profile_file = Path(profile_file)
+        if not profile_file.is_file():
+            raise MusicPlayerProfileError("{0} file not found".format(profile_file))
+        try:
+            content = json.loads(profile_file.read_text(encoding="utf-8"))
+        except ValueError:
+            raise MusicPlayerProfileError("{0} file is not a valid profile".format(profile_file))
+        try:
+            return cls.from_dict(content)
+        except MusicPlayerProfileError:
+            raise MusicPlayerProfileError("{0} file is not a valid profile".format(profile_file))
+
+    @classmethod
+    def from_dict(cls, content: Dict) -> "MusicPlayerProfile":
+        """
+        Create a profile from a PUT request body, with or without the top-level "profile" key
+
+        Args:
+            content (dict): {"profile": {"applications": [{"applicationId": ..., "version": ...}]}}
+
+        Raises:
+            MusicPlayerProfileError: invalid content
+
+        Returns:
+            MusicPlayerProfile: music player profile
+        """
+        try:
+            content = content.get("profile", content)
+            applications = [(application["applicationId"], application["version"])
+                            for application in content["applications"]]
+        except (KeyError, TypeError, AttributeError):
+            raise MusicPlayerProfileError("Profile {0} is not valid".format(content))
+        return cls(applications)
+
+    @classmethod
+    def from_options(cls, options: Iterable[str]) -> "MusicPlayerProfile":
+        """
+        Create a profile from "applicationId=version" options
+
+        Args:
+            options (iterable): "applicationId=version" strings
+
+        Raises:
+            MusicPlayerProfileError: option without "="
+
+        Returns:
+            MusicPlayerProfile: music player profile
+        """
+        applications = []
+        for option in options:
+            application_id, separator, version = option.partition("=")
+            if not separator:
+                raise MusicPlayerProfileError("Application {0} is not of the form applicationId=version".format(option))
+            applications.append((application_id.strip(), version.strip()))
+        return cls(applications)
+
+    @property
+    def applications(self) -> Tuple[Tuple[str, str], ...]:
+        return self._applications
+
+    @property
+    def payload(self) -> bytes:
+        """
+        Returns:
+            bytes: serialized PUT request body
+        """
+        return self._payload
+
+    @property
+    def digest(self) -> int:
+        """
+        Returns:
+            int: 64-bit hash of the serialized request body, equal for profiles with the same applications
+        """
+        return self._digest
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        """
+        Returns:
+            dict: PUT request headers, including the precomputed Content-Length
+        """
+        return self._headers
+
+    def batch_payload(self, mac_addresses: List[str]) -> bytes:
+        """
+        Serialize a PUT /profiles/batch request body, reusing the serialized profile
+
+        Args:
+            mac_addresses (list): music player MAC addresses
+
+        Returns:
+            bytes: {"clientIds": [...], "profile": {...}} request body
+        """
+        client_ids = json.dumps(mac_addresses, separators=(",", ":")).encode("utf-8")
+        return b'{"clientIds":' + client_ids + b',' + self._payload[1:]
+
+    def to_dict(self) -> Dict:
+        """
+        Returns:
+            dict: PUT request body
+        """
+        return {
+            "profile": {
+                "applications": [
+                    {
+                        "applicationId": application_id,
+                        "version": version
+                    } for application_id, version in self._applications
+                ]
+            }
+        }
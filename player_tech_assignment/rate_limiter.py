@@ -0,0 +1,135 @@
+"""
+Client-side request rate and concurrency control
+
+    1) TokenBucket caps the request rate
+    2) AdaptiveConcurrencyLimiter raises or lowers the number of in-flight
+       requests (AIMD) from observed latency and overload responses
+"""
+import threading
+import time
+from typing import Callable, Optional
+
+__all__ = ['TokenBucket', 'AdaptiveConcurrencyLimiter']
+
+# Responses telling the client the server is overloaded
+OVERLOAD_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int = None, clock: Callable[[], float] = time.monotonic):
+        """
+        Thread-safe token bucket rate limiter
+
+        Args:
+            rate (float): tokens added per second
+            burst (int): bucket capacity, defaults to one second of tokens
+            clock (callable): monotonic time in seconds
+
+        Raises:
+            ValueError: invalid rate
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self._rate = rate
+        self._capacity = max(1, burst if burst is not None else int(rate))
+        self._clock = clock
+        self._tokens = float(self._capacity)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    def try_acquire(self) -> float:
+        """
+        Take a token if one is available
+
+        Returns:
+            float: 0 if a token was taken, otherwise seconds until the next token
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+            # Tolerate float rounding so a sleep of exactly the returned delay is enough
+            if self._tokens >= 1 - 1e-9:
+                self._tokens = max(0.0, self._tokens - 1)
+                return 0
+            return (1 - self._tokens) / self._rate
+
+    def acquire(self, sleep: Callable[[float], None] = time.sleep):
+        """
+        Block until a token is taken
+
+        Args:
+            sleep (callable): function waiting a number of seconds
+        """
+        delay = self.try_acquire()
+        while delay:
+            sleep(delay)
+            delay = self.try_acquire()
+
+
+class AdaptiveConcurrencyLimiter:
+    def __init__(self, maximum: int, minimum: int = 1, initial: int = None, latency_target: float = None,
+                 decrease_factor: float = 0.5):
+        """
+        Thread-safe AIMD concurrency limit
+
+        The limit grows by one after a full window of successful responses and
+        is multiplied by decrease_factor on an overload response, a connection
+        error or a response slower than latency_target. Overload signals are
+        ignored for one window after a decrease, so a burst of errors caused by
+        the previous limit only lowers it once.
+
+        Args:
+            maximum (int): highest concurrency limit
+            minimum (int): lowest concurrency limit
+            initial (int): starting limit, defaults to half the maximum
+            latency_target (float): seconds above which a response counts as overload, None to ignore latency
+            decrease_factor (float): multiplicative decrease between 0 and 1
+
+        Raises:
+            ValueError: invalid bounds or decrease factor
+        """
+        if not 1 <= minimum <= maximum:
+            raise ValueError("concurrency limits must satisfy 1 <= minimum <= maximum")
+        if not 0 < decrease_factor < 1:
+            raise ValueError("decrease_factor must be between 0 and 1")
+        self._maximum = maximum
+        self._minimum = minimum
+        self._window = float(min(maximum, max(minimum, initial if initial is not None else maximum // 2)))
+        self._latency_target = latency_target
+        self._decrease_factor = decrease_factor
+        self._recovering = 0
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self) -> int:
+        """
+        Returns:
+            int: current number of allowed in-flight requests
+        """
+        return int(self._window)
+
+    def on_response(self, status_code: Optional[int], latency: float):
+        """
+        Adjust the limit from a completed request
+
+        Args:
+            status_code (int): response status code, None for a connection error
+            latency (float): request latency in seconds
+        """
+        overloaded = (status_code is None or status_code in OVERLOAD_STATUS_CODES or
+                      (self._latency_target is not None and latency > self._latency_target))
+        with self._lock:
+            if self._recovering > 0:
+                self._recovering -= 1
+                if overloaded:
+                    return
+            if overloaded:
+                self._window = max(self._minimum, self._window * self._decrease_factor)
+                self._recovering = self.limit
+            else:
+                self._window = min(self._maximum, self._window + 1 / self._window)
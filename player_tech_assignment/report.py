@@ -0,0 +1,71 @@
+"""
+Music player software update report
+"""
+from typing import Iterable, List, NamedTuple, Optional
+
+__all__ = ['PlayerUpdateResult', 'MusicPlayerUpdateReport']
+
+
+class PlayerUpdateResult(NamedTuple):
+    """
+    Outcome of the software update of one music player
+    """
+    mac_address: str
+    status_code: Optional[int]
+    message: str = ""
+    skipped: bool = False
+    attempts: int = 1
+    elapsed: float = 0.0
+
+    @property
+    def success(self) -> bool:
+        return self.status_code == 200 or self.skipped
+
+
+class MusicPlayerUpdateReport:
+    def __init__(self, results: Iterable[PlayerUpdateResult] = ()):
+        """
+        Per device results of a software update run, in .csv file order
+
+        Args:
+            results (iterable): device update results
+        """
+        self._results = list(results)
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def __iter__(self):
+        return iter(self._results)
+
+    @property
+    def results(self) -> List[PlayerUpdateResult]:
+        return self._results
+
+    @property
+    def succeeded(self) -> List[PlayerUpdateResult]:
+        return [result for result in self._results if result.success]
+
+    @property
+    def skipped(self) -> List[PlayerUpdateResult]:
+        return [result for result in self._results if result.skipped]
+
+    @property
+    def failed(self) -> List[PlayerUpdateResult]:
+        return [result for result in self._results if not result.success]
+
+    def summary(self) -> str:
+        """
+        Returns:
+            str: one line summary of the run
+        """
+        skipped = len(self.skipped)
+        return "{0} music players: {1} updated, {2} skipped, {3} failed".format(
+            len(self), len(self.succeeded) - skipped, skipped, len(self.failed))
+
+    def errors(self) -> str:
+        """
+        Returns:
+            str: one line per failed device, in .csv file order
+        """
+        return "\n".join("Error: {0}: {1}".format(result.mac_address, result.message) for result in self.failed)
@@ -0,0 +1,72 @@
+"""
+Retry policy of the music player client
+
+Transient failures (connection errors and retryable status codes) are
+retried with exponential backoff and full jitter:
+    delay = uniform(0, min(max_backoff, backoff * 2 ** (attempt - 1)))
+"""
+import random
+from typing import Callable, Iterable, Optional
+
+__all__ = ['RetryPolicy', 'RETRYABLE_STATUS_CODES']
+
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+DEFAULT_ATTEMPTS = 3
+DEFAULT_BACKOFF = 0.5
+DEFAULT_MAX_BACKOFF = 30
+
+
+class RetryPolicy:
+    def __init__(self, attempts: int = DEFAULT_ATTEMPTS, backoff: float = DEFAULT_BACKOFF,
+                 max_backoff: float = DEFAULT_MAX_BACKOFF,
+                 retryable_status_codes: Iterable[int] = RETRYABLE_STATUS_CODES,
+                 uniform: Callable[[float, float], float] = random.uniform):
+        """
+        Retry policy for transient request failures
+
+        Args:
+            attempts (int): maximum number of attempts per request, 1 to disable retries
+            backoff (float): base delay in seconds, doubled at every attempt
+            max_backoff (float): maximum delay in seconds
+            retryable_status_codes (iterable): HTTP status codes worth retrying
+            uniform (callable): random number generator used for jitter
+
+        Raises:
+            ValueError: invalid attempts or backoff
+        """
+        if attempts < 1:
+            raise ValueError("attempts must be at least 1")
+        if backoff < 0 or max_backoff < 0:
+            raise ValueError("backoff must be positive")
+        self._attempts = attempts
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._retryable_status_codes = frozenset(retryable_status_codes)
+        self._uniform = uniform
+
+    @property
+    def attempts(self) -> int:
+        return self._attempts
+
+    def should_retry(self, status_code: Optional[int], attempt: int) -> bool:
+        """
+        Args:
+            status_code (int): response status code, None for a connection error
+            attempt (int): number of the attempt that failed, starting at 1
+
+        Returns:
+            bool: True if the request should be sent again
+        """
+        if attempt >= self._attempts:
+            return False
+        return status_code is None or status_code in self._retryable_status_codes
+
+    def delay(self, attempt: int) -> float:
+        """
+        Args:
+            attempt (int): number of the attempt that failed, starting at 1
+
+        Returns:
+            float: seconds to wait before the next attempt
+        """
+        return self._uniform(0, min(self._max_backoff, self._backoff * 2 ** (attempt - 1)))
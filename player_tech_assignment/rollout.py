@@ -0,0 +1,220 @@
+"""
+Staged canary rollout of the music player software update
+
+The devices are updated in waves instead of all at once:
+    1) a canary wave of a small fraction of the fleet
+    2) waves growing geometrically, each one starting as soon as the previous
+       wave finished with an error rate under the threshold
+    3) the rollout halts at the first wave above the threshold, and the
+       devices of the next waves are reported as not sent
+
+Waves are drawn from a stable hash of the normalized MAC addresses, so a
+rerun on the same .csv file picks the same devices for each wave. With a
+target duration, the request rate of every wave is set so the remaining
+devices are updated in the remaining time.
+"""
+import math
+import time
+from typing import Callable, List, Tuple
+
+from .client import MusicPlayerClient, MusicPlayerClientError, filter_shard, read_mac_addresses
+from .defaults import DEFAULT_CANARY, DEFAULT_GROWTH, DEFAULT_MAX_ERROR_RATE
+from .journal import MusicPlayerUpdateJournal
+from .rate_limiter import TokenBucket
+from .report import MusicPlayerUpdateReport, PlayerUpdateResult
+from .sharding import device_hash
+from .state_cache import MusicPlayerStateCache
+
+__all__ = ['WaveRollout', 'MusicPlayerRolloutError', 'wave_sizes', 'plan_waves']
+
+# Keeps the wave order independent of the shard assignment
+WAVE_HASH_SALT = "wave:"
+
+
+class MusicPlayerRolloutError(MusicPlayerClientError):
+    """
+    Music Player Rollout Error
+    """
+    pass
+
+
+def wave_sizes(device_count: int, canary: float = DEFAULT_CANARY, growth: float = DEFAULT_GROWTH) -> List[int]:
+    """
+    Args:
+        device_count (int): number of devices to update
+        canary (float): fraction of the devices in the canary wave, at least one device
+        growth (float): size ratio between a wave and the previous one, above 1
+
+    Returns:
+        list: number of devices of each wave, adding up to device_count
+    """
+    sizes = []
+    size = max(1, math.ceil(device_count * canary))
+    remaining = device_count
+    while remaining > 0:
+        sizes.append(min(size, remaining))
+        remaining -= sizes[-1]
+        size = max(size + 1, math.ceil(size * growth))
+    return sizes
+
+
+def plan_waves(mac_addresses: List[str], canary: float = DEFAULT_CANARY,
+               growth: float = DEFAULT_GROWTH) -> List[List[int]]:
+    """
+    Args:
+        mac_addresses (list): music player MAC addresses
+        canary (float): fraction of the devices in the canary wave
+        growth (float): size ratio between a wave and the previous one
+
+    Returns:
+        list: positions in mac_addresses of the devices of each wave, in mac_addresses order within a wave
+    """
+    order = sorted(range(len(mac_addresses)),
+                   key=lambda index: (device_hash(mac_addresses[index], WAVE_HASH_SALT), mac_addresses[index]))
+    waves = []
+    start = 0
+    for size in wave_sizes(len(mac_addresses), canary, growth):
+        waves.append(sorted(order[start:start + size]))
+        start += size
+    return waves
+
+
+class WaveRollout:
+    def __init__(self, client: MusicPlayerClient, canary: float = DEFAULT_CANARY, growth: float = DEFAULT_GROWTH,
+                 max_error_rate: float = DEFAULT_MAX_ERROR_RATE, target_duration: float = None,
+                 on_wave: Callable[[int, int, MusicPlayerUpdateReport], None] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Staged canary rollout driving a music player client
+
+        Args:
+            client (MusicPlayerClient): client updating the devices; its rate limiter, if any, caps the pacing
+            canary (float): fraction of the devices in the canary wave, at least one device
+            growth (float): size ratio between a wave and the previous one, above 1
+            max_error_rate (float): fraction of failed devices of a wave above which the rollout halts
+            target_duration (float): seconds to complete the rollout in, None to update every wave at full speed
+            on_wave (callable): called with the wave number, the number of waves and the wave report after each wave
+            clock (callable): monotonic time in seconds
+
+        Raises:
+            MusicPlayerRolloutError: invalid settings
+        """
+        if not 0 < canary <= 1:
+            raise MusicPlayerRolloutError("canary must be between 0 and 1")
+        if growth <= 1:
+            raise MusicPlayerRolloutError("growth must be above 1")
+        if not 0 <= max_error_rate <= 1:
+            raise MusicPlayerRolloutError("max_error_rate must be between 0 and 1")
+        if target_duration is not None and target_duration <= 0:
+            raise MusicPlayerRolloutError("target_duration must be positive")
+        self._client = client
+        self._canary = canary
+        self._growth = growth
+        self._max_error_rate = max_error_rate
+        self._target_duration = target_duration
+        self._on_wave = on_wave
+        self._clock = clock
+
+    @staticmethod
+    def error_rate(report: MusicPlayerUpdateReport) -> float:
+        """
+        Args:
+            report (MusicPlayerUpdateReport): wave report
+
+        Returns:
+            float: fraction of the devices sent an update that failed, 0 if every device was skipped
+        """
+        sent = len(report) - len(report.skipped)
+        return len(report.failed) / sent if sent else 0.0
+
+    def _pace(self, rate_limiter: TokenBucket, remaining: int, start: float, batch_size: int) -> TokenBucket:
+        """
+        Args:
+            rate_limiter (TokenBucket): rate limiter of the client before the rollout, None for no cap
+            remaining (int): number of devices left to update
+            start (float): clock time of the rollout start
+            batch_size (int): number of devices per request
+
+        Returns:
+            TokenBucket: rate limiter of the next wave, None for no cap
+        """
+        remaining_time = self._target_duration - (self._clock() - start) if self._target_duration else 0
+        if remaining_time <= 0:
+            # No target, or behind schedule: as fast as the client cap allows
+            return rate_limiter
+        rate = remaining / batch_size / remaining_time
+        if rate_limiter is not None and rate >= rate_limiter.rate:
+            return rate_limiter
+        return TokenBucket(rate)
+
+    def run(self, csv_file: str, workers: int = 1, journal_file: str = None, resume: bool = False,
+            preflight: bool = True, batch_size: int = 1, shard: Tuple[int, int] = None,
+            state_cache: MusicPlayerStateCache = None, refresh_state: bool = False,
+            inventory_cache: bool = False) -> MusicPlayerUpdateReport:
+        """
+        Update music players from .csv configuration, wave by wave
+
+        Args:
+           csv_file (str): music player update file
+           workers (int): number of devices updated concurrently
+           journal_file (str): checkpoint journal recording each device outcome
+           resume (bool): skip the devices already updated according to the journal
+           preflight (bool): validate and normalize all MAC addresses before the first request
+           batch_size (int): number of devices per request
+           shard (tuple): (index, count) shard of the devices to update, None for all devices
+           state_cache (MusicPlayerStateCache): skip the devices already running the profile, and record
+               the updated ones
+           refresh_state (bool): ask the server for the profile of the devices not up to date in the state cache
+               before the first wave
+           inventory_cache (bool): with preflight, load the validated rows from the sidecar inventory file of
+               csv_file
+
+        Raises:
+            MusicPlayerRolloutError: rollout halted or update player request not successful
+            MusicPlayerClientError: invalid MAC addresses or authentification failed
+
+        Returns:
+            MusicPlayerUpdateReport: per device results in .csv file order
+        """
+        if resume and journal_file is None:
+            raise MusicPlayerClientError("A journal file is required to resume an update")
+        if shard is not None and not 0 <= shard[0] < shard[1]:
+            raise MusicPlayerClientError("shard index must be between 0 and the shard count")
+        if refresh_state and state_cache is None:
+            raise MusicPlayerClientError("A state cache is required to refresh the device state")
+
+        mac_addresses = list(filter_shard(read_mac_addresses(csv_file, preflight, self._client.metrics,
+                                                             inventory_cache), shard))
+        if refresh_state:
+            self._client.refresh_state(mac_addresses, state_cache, workers)
+        waves = plan_waves(mac_addresses, self._canary, self._growth)
+        journal = MusicPlayerUpdateJournal(journal_file) if journal_file is not None else None
+        rate_limiter = self._client.rate_limiter
+        results = {}
+        start = self._clock()
+        try:
+            for number, wave in enumerate(waves, start=1):
+                self._client.rate_limiter = self._pace(rate_limiter, len(mac_addresses) - len(results), start,
+                                                       batch_size)
+                report = self._client.update_devices([mac_addresses[index] for index in wave], workers, journal,
+                                                     resume, batch_size, state_cache)
+                results.update(zip(wave, report))
+                if self._on_wave is not None:
+                    self._on_wave(number, len(waves), report)
+                error_rate = self.error_rate(report)
+                if error_rate > self._max_error_rate:
+                    message = "not sent: rollout halted after wave {0}/{1} with {2:.1%} errors".format(
+                        number, len(waves), error_rate)
+                    for index in range(len(mac_addresses)):
+                        if index not in results:
+                            results[index] = PlayerUpdateResult(mac_addresses[index], None, message, attempts=0)
+                    break
+        finally:
+            self._client.rate_limiter = rate_limiter
+            if journal is not None:
+                journal.close()
+
+        report = MusicPlayerUpdateReport(results[index] for index in range(len(mac_addresses)))
+        if report.failed:
+            raise MusicPlayerRolloutError(report.errors(), report)
+        return report
@@ -0,0 +1,234 @@
+"""
+Latency and failure injection of the simulation server
+
+A chaos profile makes the simulator behave like the real API under stress:
+    1) latency drawn from a fixed, uniform, exponential or log-normal distribution
+    2) random 5xx and 429 responses at set rates
+    3) short-lived authentification tokens
+    4) a per-client request rate cap answered with 429
+
+Injected latency only sleeps in the thread handling the request, so other
+requests keep being served by the threaded server.
+"""
+import json
+import math
+from pathlib import Path
+import random
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from ..rate_limiter import TokenBucket
+
+__all__ = ['ChaosProfile', 'ChaosProfileError', 'LatencyDistribution']
+
+LATENCY_DISTRIBUTIONS = {
+    # name: number of parameters
+    "fixed": 1,        # fixed:seconds
+    "uniform": 2,      # uniform:low:high
+    "exponential": 1,  # exponential:mean
+    "lognormal": 2,    # lognormal:median:sigma
+}
+DEFAULT_ERROR_STATUS_CODES = (500, 502, 503)
+
+
+class ChaosProfileError(Exception):
+    """
+    Chaos Profile Error
+    """
+    pass
+
+
+class LatencyDistribution:
+    def __init__(self, name: str, parameters: Tuple[float, ...]):
+        """
+        Injected latency distribution, in seconds
+
+        Args:
+            name (str): fixed, uniform, exponential or lognormal
+            parameters (tuple): distribution parameters
+
+        Raises:
+            ChaosProfileError: unknown distribution or invalid parameters
+        """
+        if name not in LATENCY_DISTRIBUTIONS:
+            raise ChaosProfileError("Latency distribution {0} is not one of {1}".format(
+                name, ", ".join(LATENCY_DISTRIBUTIONS)))
+        if len(parameters) != LATENCY_DISTRIBUTIONS[name]:
+            raise ChaosProfileError("Latency distribution {0} takes {1} parameters".format(
+                name, LATENCY_DISTRIBUTIONS[name]))
+        if any(parameter < 0 for parameter in parameters):
+            raise ChaosProfileError("Latency distribution parameters must be positive")
+        if name == "uniform" and parameters[0] > parameters[1]:
+            raise ChaosProfileError("Uniform latency low bound is above its high bound")
+        self._name = name
+        self._parameters = tuple(parameters)
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyDistribution":
+        """
+        Parse a "name:parameter[:parameter]" latency specification, e.g. "uniform:0.01:0.05"
+
+        Args:
+            spec (str): latency specification
+
+        Raises:
+            ChaosProfileError: invalid specification
+
+        Returns:
+            LatencyDistribution: latency distribution
+        """
+        name, _, parameters = spec.partition(":")
+        try:
+            return cls(name.strip(), tuple(float(parameter) for parameter in parameters.split(":") if parameter))
+        except ValueError:
+            raise ChaosProfileError("Latency {0} parameters are not numbers".format(spec))
+
+    def __str__(self):
+        return ":".join([self._name] + ["{0:g}".format(parameter) for parameter in self._parameters])
+
+    def sample(self, rng: random.Random) -> float:
+        """
+        Args:
+            rng (Random): random number generator
+
+        Returns:
+            float: latency in seconds
+        """
+        if self._name == "fixed":
+            return self._parameters[0]
+        if self._name == "uniform":
+            return rng.uniform(*self._parameters)
+        if self._name == "exponential":
+            return rng.expovariate(1 / self._parameters[0]) if self._parameters[0] else 0.0
+        median, sigma = self._parameters
+        return rng.lognormvariate(math.log(median), sigma) if median else 0.0
+
+
+class ChaosProfile:
+    def __init__(self, latency: LatencyDistribution = None, error_rate: float = 0.0,
+                 error_status_codes: Iterable[int] = DEFAULT_ERROR_STATUS_CODES, throttle_rate: float = 0.0,
+                 token_ttl: float = None, client_rate: float = None, client_burst: int = None, seed: int = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Latency and failure injection settings
+
+        Args:
+            latency (LatencyDistribution): latency added to every request, None for no latency
+            error_rate (float): fraction of requests answered with one of error_status_codes
+            error_status_codes (iterable): injected 5xx status codes
+            throttle_rate (float): fraction of requests answered with 429
+            token_ttl (float): seconds before a new authentification token expires, None for the default
+            client_rate (float): requests per second allowed per client address, None for no cap
+            client_burst (int): requests a client can send at once above client_rate
+            seed (int): random seed, for reproducible runs
+            clock (callable): monotonic time in seconds, used by the client rate cap
+
+        Raises:
+            ChaosProfileError: invalid rates or status codes
+        """
+        if not 0 <= error_rate <= 1 or not 0 <= throttle_rate <= 1 or error_rate + throttle_rate > 1:
+            raise ChaosProfileError("error_rate and throttle_rate must be between 0 and 1, and add up to 1 at most")
+        self._error_status_codes = tuple(error_status_codes)
+        if error_rate and not self._error_status_codes:
+            raise ChaosProfileError("error_rate requires at least one error status code")
+        if token_ttl is not None and token_ttl <= 0:
+            raise ChaosProfileError("token_ttl must be positive")
+        if client_rate is not None and client_rate <= 0:
+            raise ChaosProfileError("client_rate must be positive")
+        self._latency = latency
+        self._error_rate = error_rate
+        self._throttle_rate = throttle_rate
+        self._token_ttl = token_ttl
+        self._client_rate = client_rate
+        self._client_burst = client_burst
+        self._rng = random.Random(seed)
+        self._clock = clock
+        self._client_buckets = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_dict(cls, settings: Dict) -> "ChaosProfile":
+        """
+        Create a chaos profile from settings, e.g.
+            {"latency": "lognormal:0.02:0.5", "error_rate": 0.01, "throttle_rate": 0.02, "token_ttl": 120,
+             "client_rate": 200, "client_burst": 20, "seed": 1}
+
+        Args:
+            settings (dict): ChaosProfile arguments, with latency as a "name:parameter[:parameter]" string
+
+        Raises:
+            ChaosProfileError: unknown or invalid settings
+
+        Returns:
+            ChaosProfile: chaos profile
+        """
+        settings = dict(settings)
+        if settings.get("latency") is not None:
+            settings["latency"] = LatencyDistribution.parse(str(settings["latency"]))
+        try:
+            return cls(**settings)
+        except TypeError as err:
+            raise ChaosProfileError("Invalid chaos settings: {0}".format(err))
+
+    @staticmethod
+    def read_file(chaos_file) -> Dict:
+        """
+        Args:
+            chaos_file (str): JSON file of chaos settings
+
+        Raises:
+            ChaosProfileError: file not found or not a JSON object
+
+        Returns:
+            dict: chaos settings
+        """
+        chaos_file = Path(chaos_file)
+        if not chaos_file.is_file():
+            raise ChaosProfileError("{0} file not found".format(chaos_file))
+        try:
+            settings = json.loads(chaos_file.read_text(encoding="utf-8"))
+        except ValueError:
+            raise ChaosProfileError("{0} file is not valid JSON".format(chaos_file))
+        if not isinstance(settings, dict):
+            raise ChaosProfileError("{0} file is not a JSON object".format(chaos_file))
+        return settings
+
+    @property
+    def token_ttl(self) -> Optional[float]:
+        return self._token_ttl
+
+    def delay(self) -> float:
+        """
+        Returns:
+            float: seconds to wait before handling a request
+        """
+        return self._latency.sample(self._rng) if self._latency is not None else 0.0
+
+    def _is_rate_limited(self, client: str) -> bool:
+        bucket = self._client_buckets.get(client)
+        if bucket is None:
+            with self._lock:
+                bucket = self._client_buckets.setdefault(client, TokenBucket(self._client_rate, self._client_burst,
+                                                                             clock=self._clock))
+        return bucket.try_acquire() > 0
+
+    def injected_status(self, client: str) -> Optional[int]:
+        """
+        Decide whether a request fails
+
+        Args:
+            client (str): client address
+
+        Returns:
+            int: 429 or 5xx status code to answer with, None to handle the request normally
+        """
+        if self._client_rate is not None and self._is_rate_limited(client):
+            return 429
+        if self._error_rate or self._throttle_rate:
+            draw = self._rng.random()
+            if draw < self._error_rate:
+                return self._rng.choice(self._error_status_codes)
+            if draw < self._error_rate + self._throttle_rate:
+                return 429
+        return None
@@ -0,0 +1,153 @@
+"""
+Request metrics of the simulation server
+
+Every request thread records its endpoint, status code and latency in its
+own shard, so the hot path takes no lock. GET /metrics merges the shards of
+all threads into Prometheus text. The threaded development server starts a
+thread per connection, so the shards of finished threads are folded into a
+retired shard when a thread registers or the shards are merged. Under
+gunicorn, each worker process reports its own requests.
+"""
+import threading
+from typing import Dict, Iterable
+
+from ..metrics import Histogram, LocalHistogram, format_labels, format_prometheus_histogram
+
+__all__ = ['ServerMetrics']
+
+# Seconds, from 100 µs to 1 s: request handling is much faster than a client round trip
+DEFAULT_LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+class _ThreadShard:
+    """
+    Request counts and latencies of one thread
+    """
+
+    def __init__(self, thread: threading.Thread = None):
+        self.thread = thread
+        self.latencies = {}
+        self.responses = {}
+
+
+class ServerMetrics:
+    def __init__(self, buckets: Iterable[float] = DEFAULT_LATENCY_BUCKETS):
+        """
+        Per-endpoint request counts, status codes and latency histograms, aggregated per thread
+
+        Args:
+            buckets (iterable): latency histogram bucket upper bounds in seconds
+        """
+        self._buckets = tuple(buckets)
+        self._local = threading.local()
+        self._shards = []
+        # Requests of the threads that ended, updated under the lock only
+        self._retired = _ThreadShard()
+        self._lock = threading.Lock()
+
+    def _shard(self) -> _ThreadShard:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = _ThreadShard(threading.current_thread())
+            with self._lock:
+                self._retire_shards()
+                self._shards.append(shard)
+        return shard
+
+    def _retire_shards(self):
+        """
+        Fold the shards of the threads that ended into the retired shard, called with the lock held
+        """
+        live_shards = []
+        for shard in self._shards:
+            if shard.thread.is_alive():
+                live_shards.append(shard)
+                continue
+            for endpoint, histogram in shard.latencies.items():
+                self._retired.latencies.setdefault(endpoint, Histogram(self._buckets)).merge(histogram)
+            for key, count in shard.responses.items():
+                self._retired.responses[key] = self._retired.responses.get(key, 0) + count
+        self._shards = live_shards
+
+    def observe(self, endpoint: str, status_code: int, latency: float):
+        """
+        Record a request in the shard of the current thread
+
+        Args:
+            endpoint (str): endpoint name
+            status_code (int): response status code
+            latency (float): seconds spent handling the request
+        """
+        shard = self._shard()
+        histogram = shard.latencies.get(endpoint)
+        if histogram is None:
+            histogram = shard.latencies[endpoint] = LocalHistogram(self._buckets)
+        histogram.observe(latency)
+        key = (endpoint, status_code)
+        shard.responses[key] = shard.responses.get(key, 0) + 1
+
+    def _merge(self):
+        """
+        Returns:
+            tuple: latency histogram by endpoint and response count by (endpoint, status code) of all threads
+        """
+        latencies = {}
+        responses = {}
+        with self._lock:
+            self._retire_shards()
+            shards = list(self._shards)
+            # Merged under the lock, as the retired shard changes when threads end
+            self._merge_shard(self._retired, latencies, responses)
+        for shard in shards:
+            self._merge_shard(shard, latencies, responses)
+        return latencies, responses
+
+    def _merge_shard(self, shard: _ThreadShard, latencies: Dict, responses: Dict):
+        """
+        Add the requests of a shard to merged latencies and responses
+
+        Args:
+            shard (_ThreadShard): shard of a thread, or the retired shard
+            latencies (dict): merged latency histogram by endpoint
+            responses (dict): merged response count by (endpoint, status code)
+        """
+        for endpoint, histogram in shard.latencies.copy().items():
+            latencies.setdefault(endpoint, Histogram(self._buckets)).merge(histogram)
+        for key, count in shard.responses.copy().items():
+            responses[key] = responses.get(key, 0) + count
+
+    def snapshot(self) -> Dict:
+        """
+        Returns:
+            dict: request count, response count by status code and latency histogram of every endpoint
+        """
+        latencies, responses = self._merge()
+        with self._lock:
+            threads = len(self._shards)
+        endpoints = {}
+        for endpoint, histogram in sorted(latencies.items()):
+            endpoints[endpoint] = {
+                "requests": histogram.count,
+                "responses": {str(status_code): count for (name, status_code), count in sorted(responses.items())
+                              if name == endpoint},
+                "latency_seconds": histogram.to_dict(),
+            }
+        return {"threads": threads, "endpoints": endpoints}
+
+    def to_prometheus(self) -> str:
+        """
+        Returns:
+            str: every metric in the Prometheus text exposition format
+        """
+        latencies, responses = self._merge()
+        lines = ["# HELP music_player_server_requests_total Requests by endpoint and status code",
+                 "# TYPE music_player_server_requests_total counter"]
+        for (endpoint, status_code), count in sorted(responses.items()):
+            lines.append("music_player_server_requests_total{0} {1}".format(
+                format_labels({"endpoint": endpoint, "status": status_code}), count))
+        lines.extend(["# HELP music_player_server_request_duration_seconds Request handling latency",
+                      "# TYPE music_player_server_request_duration_seconds histogram"])
+        for endpoint, histogram in sorted(latencies.items()):
+            lines.extend(format_prometheus_histogram("music_player_server_request_duration_seconds", histogram,
+                                                     {"endpoint": endpoint}))
+        return "\n".join(lines) + "\n"
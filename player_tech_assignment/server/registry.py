@@ -0,0 +1,111 @@
+"""
+Music player device registry of the simulation server
+
+The .csv file of valid clients is parsed once into a dict indexed by
+normalized MAC address and only parsed again when its mtime changes. With
+the inventory cache, a valid .csv file is loaded from its sidecar inventory
+file instead of being parsed again at every server start.
+"""
+from pathlib import Path
+import threading
+import time
+from typing import Dict, Optional
+
+from ..csv_reader import MusicPlayerCsvReader, MusicPlayerCsvReaderError, MusicPlayerRecord
+from ..inventory import MusicPlayerInventoryCache, MusicPlayerInventoryError
+from ..validation import normalize_mac_address
+
+__all__ = ['MusicPlayerDeviceRegistry']
+
+
+class MusicPlayerDeviceRegistry:
+    def __init__(self, csv_file, inventory_cache: bool = False):
+        """
+        Music player devices known by the update server
+
+        Args:
+            csv_file (str): .csv file of valid clients
+            inventory_cache (bool): load the rows from the sidecar inventory file of csv_file if every
+                MAC address is valid
+
+        Raises:
+            MusicPlayerCsvReaderError: invalid csv file
+        """
+        self._csv_file = Path(csv_file)
+        self._inventory_cache = MusicPlayerInventoryCache(self._csv_file) if inventory_cache else None
+        self._lock = threading.Lock()
+        self._devices = {}
+        self._mtime = None
+        self._load_time = 0.0
+        self._loads = 0
+        self._load(self._csv_file.stat().st_mtime_ns)
+
+    def _load(self, mtime: int):
+        """
+        Parse the .csv file into the MAC address index
+
+        Args:
+            mtime (int): modification time of the file being loaded, in nanoseconds
+        """
+        start = time.perf_counter()
+        devices = None
+        if self._inventory_cache is not None:
+            try:
+                inventory = self._inventory_cache.load()
+                devices = dict(zip(inventory.mac_addresses, inventory.iter_players()))
+            except MusicPlayerInventoryError:
+                # Invalid rows are not cached but still registered as written
+                pass
+        if devices is None:
+            reader = MusicPlayerCsvReader(self._csv_file, preload=False)
+            devices = {}
+            for record in reader.iter_players():
+                devices[normalize_mac_address(record.mac_address) or record.mac_address] = record
+        self._devices = devices
+        self._mtime = mtime
+        self._load_time = time.perf_counter() - start
+        self._loads += 1
+
+    def _refresh(self):
+        """
+        Reload the registry if the .csv file was modified, keeping the current one if the new file is invalid
+        """
+        try:
+            mtime = self._csv_file.stat().st_mtime_ns
+        except OSError:
+            return
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    try:
+                        self._load(mtime)
+                    except (MusicPlayerCsvReaderError, OSError):
+                        self._mtime = mtime
+
+    def __len__(self) -> int:
+        return len(self._devices)
+
+    def get(self, mac_address: str) -> Optional[MusicPlayerRecord]:
+        """
+        Args:
+            mac_address (str): music player MAC address, in any supported format
+
+        Returns:
+            MusicPlayerRecord: device record, None if the device is unknown
+        """
+        self._refresh()
+        return self._devices.get(normalize_mac_address(mac_address) or mac_address)
+
+    def __contains__(self, mac_address: str) -> bool:
+        return self.get(mac_address) is not None
+
+    def stats(self) -> Dict:
+        """
+        Returns:
+            dict: number of devices, duration of the last load in seconds and number of loads
+        """
+        return {
+            "devices": len(self._devices),
+            "load_time": self._load_time,
+            "loads": self._loads,
+        }
@@ -4,19 +4,28 @@ Music player update simulation server
 
 import datetime
 from functools import wraps
-from flask import Flask, render_template, make_response, jsonify, request, session
+from flask import Flask, Response, current_app, g, render_template, make_response, jsonify, request, session
 import jwt
 from pathlib import Path
 import os
 import sys
+import time
 
-from ..csv_reader import MusicPlayerCsvReader
+from .chaos import ChaosProfile
+from .metrics import ServerMetrics
+from .registry import MusicPlayerDeviceRegistry
+from .token_cache import TokenVerificationCache
+from ..defaults import MAX_BATCH_SIZE
+from ..validation import normalize_mac_address
 
 __all__ = ['MusicPlayerUpdateServer', 'SECRET_KEY']
 
 SECRET_KEY = 'playerTechAssignment'
 WORKING_DIR = Path.cwd()
 VALID_CLIENT_CSV_FILE = WORKING_DIR / "tests" / "test_data" / "test_local_data.csv"
+TOKEN_TTL = 3600
+# Endpoints never slowed down or failed by a chaos profile
+CHAOS_EXEMPT_ENDPOINTS = frozenset({"metrics", "stats", "static"})
 
 
 class MusicPlayerUpdateServer:
@@ -24,38 +33,127 @@ class MusicPlayerUpdateServer:
     Music player software update simulated server
     """
 
-    def __init__(self):
+    def __init__(self, csv_file=VALID_CLIENT_CSV_FILE, log_requests: bool = True, chaos: ChaosProfile = None,
+                 inventory_cache: bool = False):
+        """
+        Args:
+            csv_file (str): .csv file of valid clients
+            log_requests (bool): print a line to stdout for every request
+            chaos (ChaosProfile): latency and failures injected into the requests, None to disable
+            inventory_cache (bool): load the valid clients from the sidecar inventory file of csv_file
+        """
+        self._chaos = chaos
+        self._registry = MusicPlayerDeviceRegistry(csv_file, inventory_cache)
+        # Normalized MAC address -> last profile applied, per process
+        self._profiles = {}
+        self._token_cache = TokenVerificationCache()
+        self._metrics = ServerMetrics()
         self._app = Flask(__name__)
+        self._app.extensions['token_cache'] = self._token_cache
+        self._app.extensions['metrics'] = self._metrics
+        self._app.before_request(self._start_timer)
+        self._app.before_request(self._inject_chaos)
+        self._app.after_request(self._record_request)
         self._app.config['SECRET_KEY'] = SECRET_KEY
         self._app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 0
+        self._app.config['LOG_REQUESTS'] = log_requests
         self._app.add_url_rule('/', view_func=self.home)
 
         # Connects a URL rule
         self._app.add_url_rule('/get', endpoint="view", methods=['GET'], view_func=self.view)
         self._app.add_url_rule('/profiles/clientId:<string:macaddress>', endpoint="hook", methods=['PUT'], view_func=self.update)
+        self._app.add_url_rule('/profiles/clientId:<string:macaddress>', endpoint="profile", methods=['GET'],
+                               view_func=self.get_profile)
+        self._app.add_url_rule('/profiles/batch', endpoint="batch", methods=['PUT'], view_func=self.update_batch)
         self._app.add_url_rule('/login', endpoint="login", methods=['POST'], view_func=self.login)
+        self._app.add_url_rule('/stats', endpoint="stats", methods=['GET'], view_func=self.stats)
+        self._app.add_url_rule('/metrics', endpoint="metrics", methods=['GET'], view_func=self.metrics)
 
-    def check_for_token(func):
+    @staticmethod
+    def log_request(message: str):
+        """
+        Print a request log line, unless request logging is disabled
+
+        Args:
+            message (str): log line
+        """
+        if current_app.config['LOG_REQUESTS']:
+            print(message)
+
+    @staticmethod
+    def _start_timer():
+        g.request_start = time.perf_counter()
+
+    def _inject_chaos(self):
+        """
+        Delay the request and answer it with an injected failure according to the chaos profile
+        """
+        if self._chaos is None or request.endpoint in CHAOS_EXEMPT_ENDPOINTS:
+            return None
+        delay = self._chaos.delay()
+        if delay > 0:
+            time.sleep(delay)
+        status_code = self._chaos.injected_status(request.remote_addr)
+        if status_code is None:
+            return None
+        if status_code == 429:
+            return jsonify({"message": "Too many requests"}), 429, {"Retry-After": "1"}
+        return jsonify({"message": "Injected server error"}), status_code
+
+    @staticmethod
+    def _record_request(response):
+        """
+        Record the endpoint, status code and latency of a request in the server metrics
+        """
+        start = g.get('request_start')
+        if start is not None:
+            current_app.extensions['metrics'].observe(request.endpoint or "unmatched", response.status_code,
+                                                      time.perf_counter() - start)
+        return response
+
+    @staticmethod
+    def verify_token(token):
         """
         Verify authentification token
 
         Args:
-            func: Function prototype
+            token (str): authentification token
 
         Returns:
-            func: Function prototype
+            tuple: (error response, status code), None if the token is valid
         """
-        @wraps(func)
-        def wrapped(*args, **kwargs):
-            token = request.args.get('token')
-            if not token:
-                return jsonify({'message': 'Missing token'}), 403
+        if not token:
+            return jsonify({'message': 'Missing token'}), 403
+        token_cache = current_app.extensions['token_cache']
+        if not token_cache.is_verified(token):
             try:
-                jwt.decode(token, SECRET_KEY)
+                payload = jwt.decode(token, SECRET_KEY)
             except jwt.exceptions.ExpiredSignatureError:
                 return jsonify({'message': 'Token expired'}), 403
             except (jwt.exceptions.InvalidSignatureError, jwt.exceptions.DecodeError):
                 return jsonify({'message': 'profile of client {0} does not exist'.format(token)}), 404
+            if 'exp' in payload:
+                token_cache.add(token, payload['exp'])
+        return None
+
+    def check_for_token(func):
+        """
+        Verify authentification token, recording the verification latency as the check_for_token endpoint
+
+        Args:
+            func: Function prototype
+
+        Returns:
+            func: Function prototype
+        """
+        @wraps(func)
+        def wrapped(*args, **kwargs):
+            start = time.perf_counter()
+            error = MusicPlayerUpdateServer.verify_token(request.args.get('token'))
+            current_app.extensions['metrics'].observe('check_for_token', 200 if error is None else error[1],
+                                                      time.perf_counter() - start)
+            if error is not None:
+                return error
             return func(*args, **kwargs)
         return wrapped
 
@@ -72,7 +170,7 @@ class MusicPlayerUpdateServer:
         """
         Home page display
         """
-        print("Home page")
+        MusicPlayerUpdateServer.log_request("Home page")
         if not session.get('logged_in'):
             return render_template('login.html')
         else:
@@ -84,7 +182,7 @@ class MusicPlayerUpdateServer:
         """
         HTTP GET response test
         """
-        print("HTTP GET")
+        MusicPlayerUpdateServer.log_request("HTTP GET")
         return "You got me!"
 
     def login(self):
@@ -93,34 +191,99 @@ class MusicPlayerUpdateServer:
         """
         if request.form['username'] and request.form['password'] == 'password':
             session['logged_in'] = True
+            token_ttl = self._chaos.token_ttl if self._chaos is not None and self._chaos.token_ttl else TOKEN_TTL
             token = jwt.encode({'user': request.form['username'],
-                                'exp': datetime.datetime.utcnow() + datetime.timedelta(minutes=60)},
+                                'exp': datetime.datetime.utcnow() + datetime.timedelta(seconds=token_ttl)},
                                self._app.config['SECRET_KEY'])
             return jsonify({'token': token.decode('UTF-8')})
         else:
             return make_response('Could not verify!', 403, {'WWW-Authenticate': 'Basic realm="Login Required"'})
 
-    @staticmethod
+    def metrics(self):
+        """
+        Per-endpoint request counts, status codes and latency histograms in the Prometheus text format
+        """
+        return Response(self._metrics.to_prometheus(), mimetype="text/plain; version=0.0.4")
+
+    def stats(self):
+        """
+        Device registry and token cache statistics
+        """
+        return jsonify({"registry": self._registry.stats(), "token_cache": self._token_cache.stats()})
+
+    def _store_profile(self, macaddress: str, request_data):
+        """
+        Remember the profile applied to a device
+
+        Args:
+            macaddress (str): music player MAC address, in any supported format
+            request_data (dict): PUT request body
+        """
+        if isinstance(request_data, dict) and "profile" in request_data:
+            self._profiles[normalize_mac_address(macaddress) or macaddress] = request_data["profile"]
+
+    @check_for_token
+    def get_profile(self, macaddress):
+        """
+        Get the last profile applied to a device
+        """
+        self.log_request("Get the software version")
+
+        if macaddress not in self._registry:
+            return jsonify({"message": "invalid clientId or token supplied"}), 401
+        profile = self._profiles.get(normalize_mac_address(macaddress) or macaddress)
+        if profile is None:
+            return jsonify({"message": "no profile applied to clientId"}), 404
+        return jsonify({"profile": profile}), 200
+
     @check_for_token
-    def update(macaddress):
+    def update(self, macaddress):
         """
         Update the software version
         """
-        print("Update the software version")
+        self.log_request("Update the software version")
 
         try:
             request_data = request.get_json()
 
-            csv_reader = MusicPlayerCsvReader(VALID_CLIENT_CSV_FILE)
-            mac_address_list = csv_reader.get_mac_address_list()
-
             # Invalid client ID
-            if macaddress not in mac_address_list:
+            if macaddress not in self._registry:
                 return jsonify({"message": "invalid clientId or token supplied"}), 401
 
+            self._store_profile(macaddress, request_data)
             res = make_response(jsonify(request_data), 200)
             return res
 
         except BaseException:
             res = jsonify({"message": "An internal server error occurred"}), 500
             return res
+
+    @check_for_token
+    def update_batch(self):
+        """
+        Update the software version of several devices
+        {"clientIds": [...], "profile": {...}} -> {"results": [{"clientId": ..., "status": ...}, ...]}
+        """
+        self.log_request("Update the software version of a batch")
+
+        try:
+            request_data = request.get_json(silent=True)
+            client_ids = request_data.get("clientIds") if isinstance(request_data, dict) else None
+            if not isinstance(client_ids, list) or "profile" not in request_data:
+                return jsonify({"message": "clientIds and profile are required"}), 400
+            if len(client_ids) > MAX_BATCH_SIZE:
+                return jsonify({"message": "batch is limited to {0} clientIds".format(MAX_BATCH_SIZE)}), 413
+
+            results = []
+            for macaddress in client_ids:
+                if isinstance(macaddress, str) and macaddress in self._registry:
+                    self._store_profile(macaddress, request_data)
+                    results.append({"clientId": macaddress, "status": 200})
+                else:
+                    results.append({"clientId": macaddress, "status": 401,
+                                    "message": "invalid clientId or token supplied"})
+            return make_response(jsonify({"results": results, "profile": request_data["profile"]}), 200)
+
+        except BaseException:
+            res = jsonify({"message": "An internal server error occurred"}), 500
+            return res
@@ -0,0 +1,79 @@
+"""
+Authentification token verification cache of the simulation server
+
+A token verified once is remembered with its expiry, so a rollout reusing
+the same token costs one dictionary lookup per request instead of a full
+JWT signature verification.
+"""
+from collections import OrderedDict
+import threading
+import time
+from typing import Callable, Dict
+
+__all__ = ['TokenVerificationCache']
+
+DEFAULT_MAX_SIZE = 1024
+
+
+class TokenVerificationCache:
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE, clock: Callable[[], float] = time.time):
+        """
+        Thread-safe LRU cache of verified tokens
+
+        Args:
+            max_size (int): maximum number of cached tokens, least recently used ones are evicted first
+            clock (callable): current time as a UNIX timestamp
+        """
+        self._max_size = max_size
+        self._clock = clock
+        self._tokens = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+    def is_verified(self, token: str) -> bool:
+        """
+        Args:
+            token (str): authentification token
+
+        Returns:
+            bool: True if the token was verified and has not expired yet
+        """
+        with self._lock:
+            expiry = self._tokens.get(token)
+            if expiry is not None:
+                if self._clock() < expiry:
+                    self._tokens.move_to_end(token)
+                    self._hits += 1
+                    return True
+                del self._tokens[token]
+            self._misses += 1
+            return False
+
+    def add(self, token: str, expiry: float):
+        """
+        Remember a verified token until its expiry
+
+        Args:
+            token (str): authentification token
+            expiry (float): token expiry as a UNIX timestamp
+        """
+        with self._lock:
+            self._tokens[token] = expiry
+            self._tokens.move_to_end(token)
+            while len(self._tokens) > self._max_size:
+                self._tokens.popitem(last=False)
+
+    def stats(self) -> Dict:
+        """
+        Returns:
+            dict: number of cached tokens, cache hits and misses
+        """
+        return {
+            "size": len(self._tokens),
+            "hits": self._hits,
+            "misses": self._misses,
+        }
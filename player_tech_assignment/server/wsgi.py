@@ -0,0 +1,76 @@
+"""
+Multi-process serving of the music player update simulation server
+
+The Flask development server handles every request in a single process. For
+capacity tests the same MusicPlayerUpdateServer app is run under gunicorn
+with several worker processes and threads. The app is created in the master
+process before the workers are forked (preload), so the device registry is
+parsed once and shared copy-on-write by every worker.
+"""
+from typing import Dict
+
+from ..defaults import DEFAULT_SERVER_THREADS as DEFAULT_THREADS, DEFAULT_SERVER_WORKERS as DEFAULT_WORKERS
+
+__all__ = ['MusicPlayerWsgiServerError', 'run_wsgi_server']
+
+
+class MusicPlayerWsgiServerError(Exception):
+    """
+    Music Player WSGI Server Error
+    """
+    pass
+
+
+def _gunicorn_application(app, options: Dict):
+    """
+    Wrap a WSGI app into a gunicorn application
+
+    Args:
+        app: WSGI application, already loaded
+        options (dict): gunicorn settings
+
+    Returns:
+        BaseApplication: gunicorn application
+    """
+    # Imported on use, gunicorn takes longer to import than the whole client command
+    from gunicorn.app.base import BaseApplication
+
+    class GunicornApplication(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    return GunicornApplication()
+
+
+def run_wsgi_server(app, host: str, port: int, workers: int = DEFAULT_WORKERS, threads: int = DEFAULT_THREADS):
+    """
+    Serve a WSGI app with gunicorn until interrupted
+
+    Args:
+        app: WSGI application, created before the workers are forked
+        host (str): server ip address
+        port (int): server port
+        workers (int): number of worker processes
+        threads (int): number of threads per worker process
+
+    Raises:
+        MusicPlayerWsgiServerError: gunicorn is not installed or invalid worker or thread count
+    """
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:  # pragma: no cover
+        raise MusicPlayerWsgiServerError("gunicorn is required to run the multi-process simulation server")
+    if workers < 1 or threads < 1:
+        raise MusicPlayerWsgiServerError("workers and threads must be at least 1")
+    _gunicorn_application(app, {
+        "bind": "{0}:{1}".format(host, port),
+        "workers": workers,
+        "threads": threads,
+        "worker_class": "gthread" if threads > 1 else "sync",
+        "preload_app": True,
+        "accesslog": None,
+    }).run()
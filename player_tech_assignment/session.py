@@ -0,0 +1,84 @@
+"""
+Pooled HTTP session of the music player client
+
+All client requests go through one requests.Session so TCP (and TLS)
+connections are kept alive and reused across devices.
+"""
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from .defaults import DEFAULT_CONNECT_TIMEOUT, DEFAULT_POOL_SIZE, DEFAULT_READ_TIMEOUT
+
+__all__ = ['MusicPlayerSession']
+
+
+def _counting_pool_class(pool_class, on_new_connection):
+    """
+    Subclass a urllib3 connection pool to be notified of every opened socket
+    """
+    class CountingConnection(pool_class.ConnectionCls):
+        def connect(self):
+            on_new_connection()
+            return super().connect()
+
+    class CountingConnectionPool(pool_class):
+        ConnectionCls = CountingConnection
+
+    return CountingConnectionPool
+
+
+class _ConnectionCountingAdapter(HTTPAdapter):
+    def __init__(self, on_new_connection, **kwargs):
+        self._on_new_connection = on_new_connection
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _counting_pool_class(HTTPConnectionPool, self._on_new_connection),
+            "https": _counting_pool_class(HTTPSConnectionPool, self._on_new_connection),
+        }
+
+
+class MusicPlayerSession(requests.Session):
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE, keep_alive: bool = True,
+                 connect_timeout: float = DEFAULT_CONNECT_TIMEOUT, read_timeout: float = DEFAULT_READ_TIMEOUT):
+        """
+        HTTP session with a bounded connection pool and default timeouts
+
+        Args:
+            pool_size (int): maximum number of connections kept open per host,
+                should be at least the number of concurrent updates
+            keep_alive (bool): reuse connections between requests
+            connect_timeout (float): seconds to wait for a connection
+            read_timeout (float): seconds to wait for a response
+        """
+        super().__init__()
+        self._timeout = (connect_timeout, read_timeout)
+        self._connections_opened = 0
+        self._lock = threading.Lock()
+
+        adapter = _ConnectionCountingAdapter(self._on_new_connection, pool_connections=1, pool_maxsize=pool_size)
+        self.mount("http://", adapter)
+        self.mount("https://", adapter)
+        if not keep_alive:
+            self.headers["Connection"] = "close"
+
+    @property
+    def connections_opened(self) -> int:
+        """
+        Returns:
+            int: number of TCP connections opened by the session
+        """
+        return self._connections_opened
+
+    def _on_new_connection(self):
+        with self._lock:
+            self._connections_opened += 1
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self._timeout)
+        return super().request(method, url, **kwargs)
@@ -0,0 +1,118 @@
+"""
+Sharded rollout of the music player software update
+
+The devices of the .csv file are split into N shards by a stable hash of
+their normalized MAC address, so every process or host given the same file
+and shard count agrees on the shard of each device and no device is updated
+twice. Each shard runs its own client, with its own token and connection
+pool, and the shard reports are merged back into .csv file order.
+"""
+from typing import Callable, Iterable, List, Optional, Tuple, TypeVar
+import zlib
+
+from .report import MusicPlayerUpdateReport
+from .validation import normalize_mac_address
+
+__all__ = ['device_hash', 'shard_of', 'parse_shard', 'shard_file', 'run_shards', 'merge_shard_reports']
+
+T = TypeVar("T")
+
+
+def device_hash(mac_address: str, salt: str = "") -> int:
+    """
+    Args:
+        mac_address (str): music player MAC address, in any format
+        salt (str): prefix making the hash independent of the ones computed for another purpose
+
+    Returns:
+        int: stable 32-bit hash of the normalized MAC address
+    """
+    key = normalize_mac_address(mac_address) or mac_address
+    return zlib.crc32((salt + key).encode("utf-8"))
+
+
+def shard_of(mac_address: str, shard_count: int) -> int:
+    """
+    Args:
+        mac_address (str): music player MAC address, in any format
+        shard_count (int): number of shards
+
+    Returns:
+        int: shard of the device, from 0 to shard_count - 1
+    """
+    return device_hash(mac_address) % shard_count
+
+
+def parse_shard(shard: str) -> Tuple[int, int]:
+    """
+    Args:
+        shard (str): "i/N" shard specification, i starting at 0
+
+    Raises:
+        ValueError: invalid specification
+
+    Returns:
+        tuple: shard index and shard count
+    """
+    index, separator, count = shard.partition("/")
+    if not separator or not index.strip().isdigit() or not count.strip().isdigit():
+        raise ValueError("shard {0} is not of the form i/N".format(shard))
+    index, count = int(index), int(count)
+    if not 0 <= index < count:
+        raise ValueError("shard index must be between 0 and {0}".format(count - 1))
+    return index, count
+
+
+def shard_file(path: Optional[str], shard: Tuple[int, int]) -> Optional[str]:
+    """
+    Args:
+        path (str): journal or metrics file shared by all the shards, None for none
+        shard (tuple): shard index and shard count
+
+    Returns:
+        str: file of the shard, e.g. update.journal.0of4, None if path is None
+    """
+    if path is None:
+        return None
+    return "{0}.{1}of{2}".format(path, *shard)
+
+
+def run_shards(update_shard: Callable[[Tuple[int, int]], T], shard_count: int) -> List[T]:
+    """
+    Run every shard in its own process
+
+    Args:
+        update_shard (callable): picklable function updating the shard (index, count) given as argument
+        shard_count (int): number of shards and processes
+
+    Returns:
+        list: return values of update_shard, by shard index
+    """
+    # Imported on use, it loads multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    shards = [(index, shard_count) for index in range(shard_count)]
+    with ProcessPoolExecutor(max_workers=shard_count) as executor:
+        return list(executor.map(update_shard, shards))
+
+
+def merge_shard_reports(mac_addresses: Iterable[str], shard_count: int,
+                        reports: List[MusicPlayerUpdateReport]) -> MusicPlayerUpdateReport:
+    """
+    Merge the shard reports into .csv file order
+
+    Each shard report is in .csv file order, so walking the MAC addresses
+    of the file and taking the next result of their shard restores the
+    order without indexing the whole fleet.
+
+    Args:
+        mac_addresses (iterable): MAC addresses of the .csv file, as given to the clients
+        shard_count (int): number of shards
+        reports (list): report of every shard, by shard index
+
+    Returns:
+        MusicPlayerUpdateReport: merged report
+    """
+    shard_results = [iter(report) for report in reports]
+    return MusicPlayerUpdateReport(next(shard_results[shard_of(mac_address, shard_count)])
+                                   for mac_address in mac_addresses)
@@ -0,0 +1,209 @@
+"""
+Music player state cache
+
+Local record of the last profile confirmed on each device, so a rerun only
+sends updates to the devices not already running the target versions. The
+cache file holds two sorted arrays after a 16-byte header:
+    1) MAC addresses as 64-bit little-endian integers, in ascending order
+    2) 64-bit digest of the last profile applied to the device at the same position
+Loading is two array copies, about 10 ms for a million devices, and a
+lookup is a binary search. New outcomes are kept in memory and merged into
+the arrays when the cache is saved.
+"""
+from array import array
+from bisect import bisect_left
+import os
+from pathlib import Path
+import struct
+import sys
+import threading
+from typing import Dict, Optional
+
+from .validation import normalize_mac_address
+
+__all__ = ['MusicPlayerStateCache', 'MusicPlayerStateCacheError']
+
+MAGIC = b"MPSC"
+VERSION = 1
+# Magic, version, number of devices
+HEADER = struct.Struct("<4sIQ")
+ITEM_SIZE = 8
+
+
+class MusicPlayerStateCacheError(Exception):
+    """
+    Music Player State Cache Error
+    """
+    pass
+
+
+class MusicPlayerStateCache:
+    def __init__(self, cache_file):
+        """
+        Last confirmed profile digest of each device, loaded from cache_file if it exists
+
+        Args:
+            cache_file (str): cache file path, created when the cache is saved
+
+        Raises:
+            MusicPlayerStateCacheError: cache file not valid
+        """
+        self._cache_file = Path(cache_file)
+        self._mac_addresses = array("Q")
+        self._digests = array("Q")
+        # MAC address integer -> digest, recorded since the last save
+        self._pending = {}
+        self._lock = threading.Lock()
+        if self._cache_file.is_file():
+            self._load()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _load(self):
+        data = self._cache_file.read_bytes()
+        if len(data) < HEADER.size:
+            raise MusicPlayerStateCacheError("{0} is not a state cache file".format(self._cache_file))
+        magic, version, count = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION or len(data) != HEADER.size + 2 * ITEM_SIZE * count:
+            raise MusicPlayerStateCacheError("{0} is not a state cache file".format(self._cache_file))
+        middle = HEADER.size + ITEM_SIZE * count
+        self._mac_addresses.frombytes(data[HEADER.size:middle])
+        self._digests.frombytes(data[middle:])
+        if sys.byteorder == "big":
+            self._mac_addresses.byteswap()
+            self._digests.byteswap()
+
+    @staticmethod
+    def _key(mac_address: str) -> Optional[int]:
+        """
+        Args:
+            mac_address (str): music player MAC address, in any supported format
+
+        Returns:
+            int: MAC address as a 48-bit integer, None if it is not valid
+        """
+        mac_address = normalize_mac_address(mac_address)
+        return int(mac_address.replace(":", ""), 16) if mac_address is not None else None
+
+    def _find(self, key: int) -> int:
+        """
+        Args:
+            key (int): MAC address integer
+
+        Returns:
+            int: position of the MAC address in the saved arrays, -1 if it is not saved
+        """
+        index = bisect_left(self._mac_addresses, key)
+        return index if index < len(self._mac_addresses) and self._mac_addresses[index] == key else -1
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._mac_addresses) + sum(1 for key in self._pending if self._find(key) < 0)
+
+    def get(self, mac_address: str) -> Optional[int]:
+        """
+        Args:
+            mac_address (str): music player MAC address, in any supported format
+
+        Returns:
+            int: digest of the last profile confirmed on the device, None if it is unknown
+        """
+        key = self._key(mac_address)
+        if key is None:
+            return None
+        digest = self._pending.get(key)
+        if digest is not None:
+            return digest
+        index = self._find(key)
+        return self._digests[index] if index >= 0 else None
+
+    def is_current(self, mac_address: str, digest: int) -> bool:
+        """
+        Args:
+            mac_address (str): music player MAC address, in any supported format
+            digest (int): digest of the target profile
+
+        Returns:
+            bool: True if the device last confirmed the target profile
+        """
+        return self.get(mac_address) == digest
+
+    def record(self, mac_address: str, digest: int):
+        """
+        Record the profile confirmed on a device, ignoring invalid MAC addresses
+
+        Args:
+            mac_address (str): music player MAC address, in any supported format
+            digest (int): digest of the confirmed profile
+        """
+        key = self._key(mac_address)
+        if key is not None:
+            with self._lock:
+                self._pending[key] = digest
+
+    def _merge(self, pending: Dict[int, int]):
+        """
+        Merge recorded digests into the sorted arrays
+
+        Args:
+            pending (dict): MAC address integer -> digest
+        """
+        if not self._mac_addresses:
+            keys = sorted(pending)
+            self._mac_addresses = array("Q", keys)
+            self._digests = array("Q", map(pending.__getitem__, keys))
+            return
+        new_keys = []
+        for key in sorted(pending):
+            index = self._find(key)
+            if index >= 0:
+                self._digests[index] = pending[key]
+            else:
+                new_keys.append(key)
+        if not new_keys:
+            return
+        mac_addresses = array("Q")
+        digests = array("Q")
+        start = 0
+        for key in new_keys:
+            end = bisect_left(self._mac_addresses, key, start)
+            mac_addresses.extend(self._mac_addresses[start:end])
+            digests.extend(self._digests[start:end])
+            mac_addresses.append(key)
+            digests.append(pending[key])
+            start = end
+        mac_addresses.extend(self._mac_addresses[start:])
+        digests.extend(self._digests[start:])
+        self._mac_addresses = mac_addresses
+        self._digests = digests
+
+    def save(self):
+        """
+        Merge the recorded digests and write the cache file, atomically replacing the previous one
+        """
+        with self._lock:
+            if not self._pending and self._cache_file.is_file():
+                return
+            self._merge(self._pending)
+            self._pending = {}
+            mac_addresses, digests = self._mac_addresses, self._digests
+            if sys.byteorder == "big":
+                mac_addresses, digests = array("Q", mac_addresses), array("Q", digests)
+                mac_addresses.byteswap()
+                digests.byteswap()
+            tmp_file = self._cache_file.with_name(self._cache_file.name + ".tmp")
+            with open(tmp_file, "wb") as cache:
+                cache.write(HEADER.pack(MAGIC, VERSION, len(mac_addresses)))
+                cache.write(mac_addresses.tobytes())
+                cache.write(digests.tobytes())
+            os.replace(tmp_file, self._cache_file)
+
+    def close(self):
+        """
+        Save the cache
+        """
+        self.save()
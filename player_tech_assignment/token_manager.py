@@ -0,0 +1,154 @@
+"""
+Music player authentification token manager
+
+Caches the token returned by POST /login and only logs in again when the
+token is about to expire (``exp`` claim) or was rejected by the server.
+The refresh margin is capped at half the token lifetime, so a token living
+less than the margin is still reused for half of its life.
+"""
+import asyncio
+import base64
+import binascii
+import json
+import threading
+import time
+from typing import Awaitable, Callable, Optional
+
+__all__ = ['MusicPlayerTokenManager', 'AsyncMusicPlayerTokenManager', 'get_token_expiry']
+
+# Refresh the token this many seconds before its expiry, at most half its lifetime
+TOKEN_REFRESH_MARGIN = 30
+
+
+def get_token_expiry(token: str) -> Optional[float]:
+    """
+    Read the expiry of a JWT token without verifying its signature
+
+    Args:
+        token (str): JWT token
+
+    Returns:
+        float: expiry as a UNIX timestamp, None if the token has no readable exp claim
+    """
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload.encode("ascii")))
+        return float(claims["exp"])
+    except (IndexError, KeyError, TypeError, ValueError, binascii.Error):
+        return None
+
+
+class MusicPlayerTokenManager:
+    def __init__(self, login: Callable[[], str], refresh_margin: float = TOKEN_REFRESH_MARGIN,
+                 clock: Callable[[], float] = time.time):
+        """
+        Thread-safe authentification token cache
+
+        Args:
+            login (callable): function doing a login and returning a new token
+            refresh_margin (float): seconds before expiry at which the token is refreshed, capped at half the
+                token lifetime
+            clock (callable): current time as a UNIX timestamp
+        """
+        self._login = login
+        self._refresh_margin = refresh_margin
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._token = None
+        # Time at which the token is refreshed, None if the token has no expiry
+        self._refresh_time = None
+        self._login_count = 0
+
+    @property
+    def login_count(self) -> int:
+        """
+        Returns:
+            int: number of logins made by the manager
+        """
+        return self._login_count
+
+    def _is_valid(self) -> bool:
+        if self._token is None:
+            return False
+        if self._refresh_time is None:
+            return True
+        return self._clock() < self._refresh_time
+
+    def _store(self, token: str):
+        self._login_count += 1
+        self._token = token
+        expiry = get_token_expiry(token)
+        if expiry is None:
+            self._refresh_time = None
+            return
+        lifetime = max(0.0, expiry - self._clock())
+        self._refresh_time = expiry - min(self._refresh_margin, lifetime / 2)
+
+    def _discard(self, token: str):
+        if self._token == token:
+            self._token = None
+            self._refresh_time = None
+
+    def get_token(self) -> str:
+        """
+        Get a valid token, logging in only if the cached one is missing or expiring
+
+        Returns:
+            str: token id
+        """
+        with self._lock:
+            if not self._is_valid():
+                self._store(self._login())
+            return self._token
+
+    def invalidate(self, token: str):
+        """
+        Discard a token rejected by the server
+
+        Only the current token is discarded, so concurrent workers reporting the
+        same expired token trigger a single login.
+
+        Args:
+            token (str): rejected token
+        """
+        with self._lock:
+            self._discard(token)
+
+
+class AsyncMusicPlayerTokenManager(MusicPlayerTokenManager):
+    def __init__(self, login: Callable[[], Awaitable[str]], refresh_margin: float = TOKEN_REFRESH_MARGIN,
+                 clock: Callable[[], float] = time.time):
+        """
+        Authentification token cache shared by the tasks of an event loop
+
+        Args:
+            login (coroutine function): coroutine doing a login and returning a new token
+            refresh_margin (float): seconds before expiry at which the token is refreshed, capped at half the
+                token lifetime
+            clock (callable): current time as a UNIX timestamp
+        """
+        super().__init__(login, refresh_margin, clock)
+        self._lock = asyncio.Lock()
+
+    async def get_token(self) -> str:
+        """
+        Get a valid token, logging in only if the cached one is missing or expiring
+
+        Returns:
+            str: token id
+        """
+        async with self._lock:
+            if not self._is_valid():
+                self._store(await self._login())
+            return self._token
+
+    async def invalidate(self, token: str):
+        """
+        Discard a token rejected by the server
+
+        Args:
+            token (str): rejected token
+        """
+        async with self._lock:
+            self._discard(token)
@@ -0,0 +1,68 @@
+"""
+Music player MAC address validation
+
+All MAC addresses of the .csv file are validated and normalized before any
+request is sent, so an invalid or duplicated row is reported up front
+instead of aborting an update halfway through the fleet.
+"""
+import re
+from typing import TYPE_CHECKING, Container, Iterable, List, Optional
+
+if TYPE_CHECKING:
+    # The reader columns import the patterns of this module
+    from .csv_reader import MusicPlayerRecord
+
+__all__ = ['MAC_ADDRESS_PATTERN', 'normalize_mac_address', 'validate_players']
+
+# Six hexadecimal pairs separated by a consistent ':' or '-' or nothing
+MAC_ADDRESS_PATTERN = re.compile("[0-9a-fA-F]{2}([-:]?)[0-9a-fA-F]{2}(\\1[0-9a-fA-F]{2}){4}")
+CANONICAL_MAC_ADDRESS_PATTERN = re.compile("[0-9A-F]{2}(:[0-9A-F]{2}){5}")
+
+
+def normalize_mac_address(mac_address: str) -> Optional[str]:
+    """
+    Normalize a MAC address to upper case, colon separated pairs
+
+    Args:
+        mac_address (str): music player MAC address
+
+    Returns:
+        str: canonical MAC address, None if the format is not valid
+    """
+    # Fast path for addresses already in canonical form
+    if CANONICAL_MAC_ADDRESS_PATTERN.fullmatch(mac_address):
+        return mac_address
+    match = MAC_ADDRESS_PATTERN.fullmatch(mac_address)
+    if match is None:
+        return None
+    digits = mac_address.replace(match.group(1), "").upper() if match.group(1) else mac_address.upper()
+    return ":".join(digits[i:i + 2] for i in range(0, 12, 2))
+
+
+def validate_players(records: Iterable["MusicPlayerRecord"], known: Container[int] = ()) -> List[str]:
+    """
+    Validate the MAC addresses of all music players
+
+    Args:
+        records (iterable): music player rows
+        known (container): MAC addresses as 48-bit integers of rows validated before, e.g. the rows
+            preceding records in the file
+
+    Returns:
+        list: one error per invalid or duplicated row, in .csv file order
+    """
+    errors = []
+    seen = set()
+    for record in records:
+        normalized = normalize_mac_address(record.mac_address)
+        if normalized is None:
+            errors.append("line {0}: MAC address {1} format is not valid".format(record.line_number,
+                                                                                 record.mac_address))
+            continue
+        # 48-bit integers take far less memory than strings for millions of rows
+        value = int(normalized.replace(":", ""), 16)
+        if value in seen or value in known:
+            errors.append("line {0}: MAC address {1} is duplicated".format(record.line_number, record.mac_address))
+        else:
+            seen.add(value)
+    return errors
@@ -0,0 +1,123 @@
+"""
+Tests for the asyncio Music Player Client
+"""
+from pathlib import Path
+import socket
+import time
+import unittest
+
+from player_tech_assignment.async_client import AsyncMusicPlayerClient, run_until_complete
+from player_tech_assignment.client import MusicPlayerClient, MusicPlayerClientError
+from player_tech_assignment.retry import RetryPolicy
+from player_tech_assignment.cli import DEFAULT_BASE_URL
+
+WORKING_DIR = Path.cwd()
+TEST_DATA_DIR = WORKING_DIR / "tests" / "test_data"
+TEST_CSV_FILE = TEST_DATA_DIR / "test_local_data.csv"
+TEST_PARTIAL_FAILURE_CSV_FILE = TEST_DATA_DIR / "test_partial_failure.csv"
+
+
+async def update_players(csv_file, password="password", concurrency=4):
+    """
+    Update music players with a new asyncio client
+
+    Returns:
+        tuple: update report and number of logins
+    """
+    async with AsyncMusicPlayerClient(DEFAULT_BASE_URL, "simon", password, concurrency=concurrency) as client:
+        report = await client.update_players(csv_file)
+        return report, client.login_count
+
+
+class FlakyAsyncMusicPlayerClient(AsyncMusicPlayerClient):
+    """
+    Asyncio client whose first update request of every device fails with 503
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.attempts = {}
+
+    async def _update_player(self, mac_address, token):
+        self.attempts[mac_address] = self.attempts.get(mac_address, 0) + 1
+        if self.attempts[mac_address] == 1:
+            return 503, '{"message": "Service unavailable"}'
+        return await super()._update_player(mac_address, token)
+
+
+class TestAsyncClient(unittest.TestCase):
+    """
+    Test asyncio Music Player Client
+    """
+
+    def test_invalid_client(self):
+        """
+        Test invalid asyncio Music Player Client base URL and concurrency
+        """
+        async def connect():
+            async with AsyncMusicPlayerClient("http://127.0.0.1:5001", "simon", "password"):
+                pass
+
+        with self.assertRaises(MusicPlayerClientError):
+            run_until_complete(connect())
+        with self.assertRaises(MusicPlayerClientError):
+            AsyncMusicPlayerClient(DEFAULT_BASE_URL, "simon", "password", concurrency=0)
+
+    def test_read_timeout(self):
+        """
+        Test asyncio Music Player Client gives up on a server which never responds
+        """
+        async def connect(base_url):
+            async with AsyncMusicPlayerClient(base_url, "simon", "password", read_timeout=0.2):
+                pass
+
+        # The kernel accepts the connection in the backlog but nothing ever answers
+        with socket.socket() as server:
+            server.bind(("127.0.0.1", 0))
+            server.listen(1)
+            start = time.perf_counter()
+            with self.assertRaises(MusicPlayerClientError):
+                run_until_complete(connect("http://127.0.0.1:{}".format(server.getsockname()[1])))
+            self.assertLess(time.perf_counter() - start, 5)
+
+    def test_login(self):
+        """
+        Test asyncio Music Player Client login
+        """
+        with self.assertRaisesRegex(MusicPlayerClientError, "invalid credentials"):
+            run_until_complete(update_players(TEST_CSV_FILE, password="password123"))
+
+    def test_software_update(self):
+        """
+        Test asyncio Music Player Client software update
+        """
+        report, login_count = run_until_complete(update_players(TEST_CSV_FILE))
+        self.assertEqual(len(report.succeeded), 4)
+        self.assertEqual(login_count, 1)
+
+        # Same report as the synchronous client
+        with self.assertRaises(MusicPlayerClientError) as sync_context:
+            MusicPlayerClient(DEFAULT_BASE_URL, "simon", "password").update_players(TEST_PARTIAL_FAILURE_CSV_FILE)
+        for concurrency in (1, 3):
+            with self.assertRaises(MusicPlayerClientError) as context:
+                run_until_complete(update_players(TEST_PARTIAL_FAILURE_CSV_FILE, concurrency=concurrency))
+            self.assertEqual([result[:3] for result in context.exception.report],
+                             [result[:3] for result in sync_context.exception.report])
+
+    def test_retry_update(self):
+        """
+        Test asyncio Music Player Client retries transient update failures
+        """
+        async def update():
+            async with FlakyAsyncMusicPlayerClient(DEFAULT_BASE_URL, "simon", "password", concurrency=2,
+                                                   retry_policy=RetryPolicy(backoff=0.01)) as client:
+                return await client.update_players(TEST_CSV_FILE)
+
+        report = run_until_complete(update())
+        self.assertEqual(len(report.succeeded), 4)
+        self.assertTrue(all(result.attempts == 2 for result in report))
+
+
+# ------------------------- Scripts ---------------------------------#
+if __name__ == '__main__':
+    unittest.main()
@@ -3,14 +3,41 @@ Tests for CLI commands.
 """
 
 from click.testing import CliRunner
+import os
 from pathlib import Path
+import subprocess
+import sys
 import unittest
+from unittest import mock
 
 from player_tech_assignment import cli
 
 WORKING_DIR = Path.cwd()
 TEST_DATA_DIR = WORKING_DIR / "tests" / "test_data"
 TEST_CSV_FILE = TEST_DATA_DIR / "test_local_data.csv"
+# Cumulative import time of the CLI module in microseconds, about 20 ms of which click is half. The budget only
+# catches gross regressions on slow CI machines, HEAVY_MODULES catches the eager imports themselves
+IMPORT_TIME_BUDGET = int(os.environ.get("PTA_IMPORT_TIME_BUDGET", 500000))
+HEAVY_MODULES = ["aiohttp", "flask", "gunicorn", "jwt", "multiprocessing", "requests"]
+
+
+def import_times(module):
+    """
+    Args:
+        module (str): module imported in a new interpreter
+
+    Returns:
+        dict: imported module -> cumulative import time in microseconds, from python -X importtime
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import {0}".format(module)],
+                            cwd=WORKING_DIR, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True,
+                            check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        fields = line.split("|")
+        if line.startswith("import time:") and fields[1].strip().isdigit():
+            times[fields[2].strip()] = int(fields[1])
+    return times
 
 
 class TestCli(unittest.TestCase):
@@ -37,6 +64,15 @@ class TestCli(unittest.TestCase):
         assert help_result.exit_code == 0
         assert "Usage: cli-pta" in help_result.output
 
+    def test_import_time(self):
+        """
+        Test the CLI starts without loading the client or server dependencies, within the import time budget
+        """
+        times = [import_times("player_tech_assignment.cli") for _ in range(3)]
+        self.assertEqual([module for module in HEAVY_MODULES if module in times[0]], [])
+        # Best of three runs, the others may be slowed down by the machine
+        self.assertLess(min(run["player_tech_assignment.cli"] for run in times), IMPORT_TIME_BUDGET)
+
     def test_cli_update_command(self):
         """
         Test update_software command
@@ -72,6 +108,88 @@ class TestCli(unittest.TestCase):
         assert expected_output in output
         assert result.exit_code is 0
 
+        # Asyncio client backend
+        result = self.runner.invoke(cli.cli_pta, ['update-software', '--username', '1234', '--password', 'password', '--input', TEST_CSV_FILE,
+                                                  '--backend', 'async', '--workers', '2'])
+        assert "Music players software update successful!" in result.output
+        assert "Authentification logins: 1" in result.output
+        assert result.exit_code == 0
+
+        # Batched updates
+        result = self.runner.invoke(cli.cli_pta, ['update-software', '--username', '1234', '--password', 'password', '--input', TEST_CSV_FILE,
+                                                  '--batch-size', '3'])
+        assert "4 music players: 4 updated, 0 skipped, 0 failed" in result.output
+        assert result.exit_code == 0
+
+        # Batches over the server limit
+        result = self.runner.invoke(cli.cli_pta, ['update-software', '--username', '1234', '--password', 'password', '--input', TEST_CSV_FILE,
+                                                  '--batch-size', '2000'])
+        assert result.exit_code == 2
+
+        # Sharded updates
+        result = self.runner.invoke(cli.cli_pta, ['update-software', '--username', '1234', '--password', 'password', '--input', TEST_CSV_FILE,
+                                                  '--processes', '2'])
+        assert "4 music players: 4 updated, 0 skipped, 0 failed" in result.output
+        assert "Authentification logins: 2" in result.output
+        assert result.exit_code == 0
+
+        # The rate cap and burst are split between the processes, run in this process to check their options
+        shard_options = []
+
+        def run_shards(update_shard, shard_count):
+            shard_options.append(update_shard.args[0])
+            return [update_shard((index, shard_count)) for index in range(shard_count)]
+
+        with mock.patch("player_tech_assignment.sharding.run_shards", run_shards):
+            result = self.runner.invoke(cli.cli_pta, ['update-software', '--username', '1234', '--password', 'password', '--input', TEST_CSV_FILE,
+                                                      '--processes', '3', '--rate', '300', '--burst', '5'])
+        assert "4 music players: 4 updated, 0 skipped, 0 failed" in result.output
+        assert (shard_options[0]["rate"], shard_options[0]["burst"]) == (100, 1)
+        # Validated once by the parent process
+        assert shard_options[0]["preflight"] is False
+
+        result = self.runner.invoke(cli.cli_pta, ['update-software', '--username', '1234', '--password', 'password', '--input', TEST_CSV_FILE,
+                                                  '--shard', '2/2'])
+        assert result.exit_code != 0
+
+        # Staged canary rollout
+        result = self.runner.invoke(cli.cli_pta, ['update-software', '--username', '1234', '--password', 'password', '--input', TEST_CSV_FILE,
+                                                  '--canary', '0.25', '--target-duration', '1'])
+        assert "Wave 1/3: 1 music players, 0 failed (0.0%)" in result.output
+        assert "4 music players: 4 updated, 0 skipped, 0 failed" in result.output
+        assert result.exit_code == 0
+
+        # State cache
+        with self.runner.isolated_filesystem():
+            for expected_output in ("4 updated, 0 skipped", "0 updated, 4 skipped"):
+                result = self.runner.invoke(cli.cli_pta, ['update-software', '--username', '1234', '--password', 'password',
+                                                          '--input', TEST_CSV_FILE, '--state-cache', 'state.cache'])
+                assert expected_output in result.output
+                assert result.exit_code == 0
+
+        # Inventory cache
+        with self.runner.isolated_filesystem():
+            with open('devices.csv', 'w') as csv_file:
+                csv_file.write(TEST_CSV_FILE.read_text())
+            for _ in range(2):
+                result = self.runner.invoke(cli.cli_pta, ['update-software', '--username', '1234', '--password', 'password',
+                                                          '--input', 'devices.csv', '--inventory-cache'])
+                assert "4 music players: 4 updated, 0 skipped, 0 failed" in result.output
+                assert result.exit_code == 0
+            assert Path('devices.csv.inventory').is_file()
+            result = self.runner.invoke(cli.cli_pta, ['update-software', '--username', '1234', '--password', 'password',
+                                                      '--input', 'devices.csv', '--inventory-cache', '--no-preflight'])
+            assert "--inventory-cache requires --preflight" in result.output
+            assert result.exit_code == 2
+
+        # Metrics export
+        with self.runner.isolated_filesystem():
+            result = self.runner.invoke(cli.cli_pta, ['update-software', '--username', '1234', '--password', 'password', '--input', TEST_CSV_FILE,
+                                                      '--metrics-file', 'metrics.prom'])
+            assert result.exit_code == 0
+            with open('metrics.prom') as metrics_file:
+                assert 'music_player_client_responses_total{kind="update",status="200"} 4' in metrics_file.read()
+
 
 # ------------------------- Scripts ---------------------------------#
 if __name__ == '__main__':
@@ -5,16 +5,21 @@ import jwt
 from pathlib import Path
 import random
 import requests
+import tempfile
 import unittest
 
 from player_tech_assignment.server.server import SECRET_KEY
 from player_tech_assignment.csv_reader import MusicPlayerCsvReaderError
 from player_tech_assignment.client import MusicPlayerClient, MusicPlayerClientError
 from player_tech_assignment.cli import DEFAULT_BASE_URL
+from player_tech_assignment.profile import MusicPlayerProfile
+from player_tech_assignment.state_cache import MusicPlayerStateCache
 
 WORKING_DIR = Path.cwd()
 TEST_DATA_DIR = WORKING_DIR / "tests" / "test_data"
 TEST_CSV_FILE = TEST_DATA_DIR / "test_local_data.csv"
+TEST_PARTIAL_FAILURE_CSV_FILE = TEST_DATA_DIR / "test_partial_failure.csv"
+TEST_INVALID_MAC_ADDRESSES_CSV_FILE = TEST_DATA_DIR / "test_invalid_mac_addresses.csv"
 
 
 class TestClient(unittest.TestCase):
@@ -81,6 +86,12 @@ class TestClient(unittest.TestCase):
         # MAC address and token valid
         self.assertTrue(self.client._update_player("8F:1E:C8:64:8C:02", token).status_code == 200)
 
+        # Configured profile
+        profile = MusicPlayerProfile.from_options(["music_app=v1.5.0"])
+        client = MusicPlayerClient(DEFAULT_BASE_URL, "simon", "password", profile=profile)
+        res = client._update_player("8F:1E:C8:64:8C:02", token)
+        self.assertEqual(res.json(), profile.to_dict())
+
     def test_software_update(self):
         """
         Test Music Player Client software update
@@ -92,6 +103,191 @@ class TestClient(unittest.TestCase):
         # Valid csv file input
         self.client.update_players(TEST_CSV_FILE)
 
+        # One login for the whole run
+        client = MusicPlayerClient(DEFAULT_BASE_URL, "simon", "password")
+        client.update_players(TEST_CSV_FILE)
+        self.assertEqual(client.login_count, 1)
+
+    def test_concurrent_software_update(self):
+        """
+        Test Music Player Client concurrent software update
+        """
+        report = self.client.update_players(TEST_CSV_FILE, workers=4)
+        self.assertEqual([result.mac_address for result in report], ["8F:1E:C8:64:8C:02", "1B:7E:10:62:06:31",
+                                                                     "B5:9D:44:A7:A9:15", "17:A1:C2:44:EE:C9"])
+        self.assertTrue(all(result.success for result in report))
+
+        # Failed devices do not stop the update and are reported the same way for any worker count
+        messages = set()
+        for workers in (1, 2, 8):
+            with self.assertRaises(MusicPlayerClientError) as context:
+                self.client.update_players(TEST_PARTIAL_FAILURE_CSV_FILE, workers=workers)
+            report = context.exception.report
+            self.assertEqual(len(report.succeeded), 4)
+            self.assertEqual([result.mac_address for result in report.failed], ["8F:1E:C8:64:8C:03"])
+            messages.add(str(context.exception))
+        self.assertEqual(len(messages), 1)
+
+        self.assertRaises(MusicPlayerClientError, self.client.update_players, TEST_CSV_FILE, workers=0)
+
+    def test_batch_software_update(self):
+        """
+        Test Music Player Client batched software update
+        """
+        for batch_size in (2, 10):
+            client = MusicPlayerClient(DEFAULT_BASE_URL, "simon", "password")
+            with self.assertRaises(MusicPlayerClientError) as context:
+                client.update_players(TEST_PARTIAL_FAILURE_CSV_FILE, workers=2, batch_size=batch_size)
+            report = context.exception.report
+            self.assertEqual(len(report.succeeded), 4)
+            self.assertEqual([result.mac_address for result in report.failed], ["8F:1E:C8:64:8C:03"])
+            self.assertTrue(client._batch_supported)
+
+        # Servers without the batch endpoint are sent one request per device
+        client = NoBatchMusicPlayerClient(DEFAULT_BASE_URL, "simon", "password")
+        report = client.update_players(TEST_CSV_FILE, batch_size=3)
+        self.assertEqual(len(report.succeeded), 4)
+        self.assertFalse(client._batch_supported)
+
+        # Batches over the server limit are split
+        client = SmallBatchMusicPlayerClient(DEFAULT_BASE_URL, "simon", "password")
+        report = client.update_players(TEST_CSV_FILE, batch_size=4)
+        self.assertEqual(len(report.succeeded), 4)
+        self.assertEqual(client._batch_limit, 2)
+        self.assertEqual(client.batch_sizes, [4, 2, 2])
+
+        # An invalid token is not taken for a missing batch endpoint
+        client = InvalidTokenMusicPlayerClient(DEFAULT_BASE_URL, "simon", "password")
+        with self.assertRaises(MusicPlayerClientError) as context:
+            client.update_players(TEST_CSV_FILE, batch_size=2)
+        self.assertEqual({result.status_code for result in context.exception.report}, {404})
+        self.assertTrue(client._batch_supported)
+
+        self.assertRaises(MusicPlayerClientError, self.client.update_players, TEST_CSV_FILE, batch_size=0)
+
+    def test_sharded_software_update(self):
+        """
+        Test Music Player Client shards update every device once
+        """
+        updated = []
+        for index in range(3):
+            client = MusicPlayerClient(DEFAULT_BASE_URL, "simon", "password")
+            report = client.update_players(TEST_CSV_FILE, shard=(index, 3))
+            updated.extend(result.mac_address for result in report)
+        self.assertEqual(len(updated), 4)
+        self.assertEqual(len(set(updated)), 4)
+
+        self.assertRaises(MusicPlayerClientError, self.client.update_players, TEST_CSV_FILE, shard=(3, 3))
+
+    def test_state_cache_software_update(self):
+        """
+        Test Music Player Client skips the devices already running the profile
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            client = MusicPlayerClient(DEFAULT_BASE_URL, "simon", "password")
+            with MusicPlayerStateCache(Path(tmp_dir) / "state.cache") as state_cache:
+                report = client.update_players(TEST_CSV_FILE, state_cache=state_cache)
+                self.assertEqual(len(report.succeeded) - len(report.skipped), 4)
+                report = client.update_players(TEST_CSV_FILE, state_cache=state_cache)
+                self.assertEqual(len(report.skipped), 4)
+
+                # Another profile is sent again
+                client = MusicPlayerClient(DEFAULT_BASE_URL, "simon", "password",
+                                           profile=MusicPlayerProfile([("music_app", "v2.0.0")]))
+                report = client.update_players(TEST_CSV_FILE, state_cache=state_cache)
+                self.assertEqual(len(report.skipped), 0)
+
+            # An empty cache is refreshed from the profiles on the server
+            with MusicPlayerStateCache(Path(tmp_dir) / "refreshed.cache") as state_cache:
+                report = client.update_players(TEST_CSV_FILE, state_cache=state_cache, refresh_state=True)
+                self.assertEqual(len(report.skipped), 4)
+
+            # Devices running another profile are left unknown
+            client = MusicPlayerClient(DEFAULT_BASE_URL, "simon", "password",
+                                       profile=MusicPlayerProfile([("music_app", "v3.0.0")]))
+            with MusicPlayerStateCache(Path(tmp_dir) / "other.cache") as state_cache:
+                mac_addresses = ["8F:1E:C8:64:8C:02", "1B:7E:10:62:06:31"]
+                self.assertEqual(client.refresh_state(mac_addresses, state_cache), 0)
+                self.assertEqual(len(state_cache), 0)
+
+            self.assertRaises(MusicPlayerClientError, client.update_players, TEST_CSV_FILE, refresh_state=True)
+
+    def test_preflight_validation(self):
+        """
+        Test Music Player Client reports every invalid MAC address before any update
+        """
+        client = MusicPlayerClient(DEFAULT_BASE_URL, "simon", "password")
+        with self.assertRaises(MusicPlayerClientError) as context:
+            client.update_players(TEST_INVALID_MAC_ADDRESSES_CSV_FILE)
+        self.assertEqual(str(context.exception).splitlines(), [
+            "3 invalid MAC addresses:",
+            "line 3: MAC address potato format is not valid",
+            "line 5: MAC address 8f1ec8648c02 is duplicated",
+            "line 6: MAC address B5:9D:44:A7:A9 format is not valid",
+        ])
+        self.assertEqual(client.login_count, 0)
+
+        # Without pre-flight validation, invalid MAC addresses fail individually
+        with self.assertRaises(MusicPlayerClientError) as context:
+            client.update_players(TEST_INVALID_MAC_ADDRESSES_CSV_FILE, preflight=False)
+        self.assertEqual([result.mac_address for result in context.exception.report.failed],
+                         ["potato", "B5:9D:44:A7:A9"])
+
+    def test_resume_software_update(self):
+        """
+        Test Music Player Client software update resumed from a checkpoint journal
+        """
+        self.assertRaises(MusicPlayerClientError, self.client.update_players, TEST_CSV_FILE, resume=True)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            journal_file = Path(tmp_dir) / "update.journal"
+            with self.assertRaises(MusicPlayerClientError):
+                self.client.update_players(TEST_PARTIAL_FAILURE_CSV_FILE, workers=2, journal_file=journal_file)
+
+            # Only the failed devices are sent again
+            with self.assertRaises(MusicPlayerClientError) as context:
+                self.client.update_players(TEST_PARTIAL_FAILURE_CSV_FILE, journal_file=journal_file, resume=True)
+            report = context.exception.report
+            self.assertEqual(len(report.skipped), 4)
+            self.assertEqual([result.mac_address for result in report.failed], ["8F:1E:C8:64:8C:03"])
+
+
+class NoBatchMusicPlayerClient(MusicPlayerClient):
+    """
+    Music player client sending batches to a server route that doesn't exist
+    """
+
+    def _update_players_batch(self, mac_addresses, token):
+        return self._session.put('{0}/profiles/batches?token={1}'.format(self._base_url, token), data=b"{}")
+
+
+class SmallBatchMusicPlayerClient(MusicPlayerClient):
+    """
+    Music player client to a server accepting batches of up to 2 devices
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.batch_sizes = []
+
+    def _update_players_batch(self, mac_addresses, token):
+        self.batch_sizes.append(len(mac_addresses))
+        if len(mac_addresses) <= 2:
+            return super()._update_players_batch(mac_addresses, token)
+        res = requests.Response()
+        res.status_code = 413
+        res._content = b'{"message": "batch is limited to 2 clientIds"}'
+        return res
+
+
+class InvalidTokenMusicPlayerClient(MusicPlayerClient):
+    """
+    Music player client sending batches with an invalid token
+    """
+
+    def _update_players_batch(self, mac_addresses, token):
+        return super()._update_players_batch(mac_addresses, "aleatory")
+
 
         # ------------------------- Scripts ---------------------------------#
 if __name__ == '__main__':
@@ -0,0 +1,51 @@
+"""
+Tests for the compact .csv file column storage
+"""
+import unittest
+
+from player_tech_assignment.columns import MacAddressColumn, StringTableColumn
+
+
+class TestColumns(unittest.TestCase):
+    """
+    Test MAC address and string table columns
+    """
+
+    def test_mac_address_column(self):
+        """
+        Test MAC addresses are packed as 48-bit integers and returned unchanged
+        """
+        mac_addresses = ["8F:1E:C8:64:8C:02", "1B:7E:10:62:06:31"]
+        column = MacAddressColumn(mac_addresses)
+        self.assertEqual(column.nbytes, 12)
+        self.assertEqual(column, mac_addresses)
+        self.assertEqual(column[-1], "1B:7E:10:62:06:31")
+        self.assertEqual(column[:1], ["8F:1E:C8:64:8C:02"])
+        self.assertEqual(column.value(0), 0x8F1EC8648C02)
+        self.assertRaises(IndexError, column.__getitem__, 2)
+
+        # Other formats and invalid values are kept verbatim
+        others = ["8f:1e:c8:64:8c:02", "8F-1E-C8-64-8C-02", "AA:BB:CC:DD:EE", "FF:00:11:22:33:44:55", "potato", ""]
+        column.extend(others)
+        column.append("B5:9D:44:A7:A9:15")
+        self.assertEqual(list(column), mac_addresses + others + ["B5:9D:44:A7:A9:15"])
+        self.assertEqual([column[row] for row in range(len(column))], list(column))
+        self.assertEqual(column.value(2), -1)
+        self.assertNotEqual(column, mac_addresses)
+
+    def test_string_table_column(self):
+        """
+        Test ids are stored once and returned unchanged
+        """
+        column = StringTableColumn(["1,", "2,", "1,"])
+        column.extend(["3", "1,"])
+        self.assertEqual(column, ["1,", "2,", "1,", "3", "1,"])
+        self.assertEqual(column.distinct_values, ["1,", "2,", "3"])
+        self.assertEqual(column[-2], "3")
+        self.assertEqual(column[1:3], ["2,", "1,"])
+        self.assertEqual(column.nbytes, 5 * 4)
+
+
+# ------------------------- Scripts ---------------------------------#
+if __name__ == '__main__':
+    unittest.main()
@@ -2,9 +2,12 @@
 Tests for the Music Player .csv file reader
 """
 from pathlib import Path
+import tempfile
 import unittest
+from unittest import mock
 
-from player_tech_assignment.csv_reader import MusicPlayerCsvReader, MusicPlayerCsvReaderError
+from player_tech_assignment import csv_reader
+from player_tech_assignment.csv_reader import MusicPlayerCsvReader, MusicPlayerCsvReaderError, MusicPlayerRecord
 
 WORKING_DIR = Path.cwd()
 TEST_DATA_DIR = WORKING_DIR / "tests" / "test_data"
@@ -36,7 +39,61 @@ class TestCsv(unittest.TestCase):
             MusicPlayerCsvReader(TEST_DATA_DIR / "test_invalid_input.csv")
 
         # valid .csv file
-        MusicPlayerCsvReader(TEST_DATA_DIR / "test_local_data.csv")
+        reader = MusicPlayerCsvReader(TEST_DATA_DIR / "test_local_data.csv")
+        self.assertEqual(len(reader), 4)
+        self.assertEqual(reader.get_mac_address_list(), ["8F:1E:C8:64:8C:02", "1B:7E:10:62:06:31",
+                                                         "B5:9D:44:A7:A9:15", "17:A1:C2:44:EE:C9"])
+        self.assertEqual(reader.get_id_list(1), ["1,"] * 4)
+        self.assertEqual(reader.get_id_list(3), ["3"] * 4)
+        self.assertRaises(MusicPlayerCsvReaderError, reader.get_id_list, 4)
+
+    def test_iter_players(self):
+        """
+        Test Music Player Reader streaming of .csv file rows
+        """
+        # Header is still validated when the file is not preloaded
+        with self.assertRaisesRegex(MusicPlayerCsvReaderError, "file wrong mac address column name"):
+            MusicPlayerCsvReader(TEST_DATA_DIR / "test_invalid_input.csv", preload=False)
+
+        reader = MusicPlayerCsvReader(TEST_CSV_FILE, preload=False)
+        self.assertEqual(reader.get_mac_address_list(), [])
+
+        players = reader.iter_players()
+        self.assertEqual(next(players), MusicPlayerRecord("8F:1E:C8:64:8C:02", "1,", "2,", "3", 2))
+        self.assertEqual([record.line_number for record in players], [3, 4, 5])
+        self.assertEqual([record.mac_address for record in reader.iter_players()], self.reader.get_mac_address_list())
+
+    def test_fast_path(self):
+        """
+        Test the chunked fast path gives the same records and errors as the csv module
+        """
+        header = "mac_addresses, id1, id2, id3\n"
+        contents = [
+            header + "8F:1E:C8:64:8C:02, 1, 2, 3\n1B:7E:10:62:06:31, 4, 5, 6",
+            header.replace("\n", "\r\n") + "8F:1E:C8:64:8C:02, 1, 2, 3\r\n1B:7E:10:62:06:31, 4, 5, 6\r\n",
+            header + "8F:1E:C8:64:8C:02, 1, 2, 3\n|1B 7E|, |4\n5|, 6, 7\nB5:9D:44:A7:A9:15, 1, 2, 3\n",
+            header + "8F:1E:C8:64:8C:02, 1, 2, 3, 4\n8F,1E,, 1, 2, 3 \n",
+            header + "8F:1E:C8:64:8C:02, 1, 2, 3\n\n1B:7E:10:62:06:31, 4, 5, 6\n",
+            header + "8F:1E:C8:64:8C:02,  1, 2, 3\n",
+        ]
+
+        def parse(csv_file, fast_path):
+            try:
+                return list(MusicPlayerCsvReader(csv_file, preload=False, fast_path=fast_path).iter_players())
+            except MusicPlayerCsvReaderError as err:
+                return str(err)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            csv_file = Path(tmp_dir) / "players.csv"
+            for content in contents:
+                csv_file.write_text(content, newline="")
+                for chunk_size in (1 << 22, 40, 1):
+                    with mock.patch.object(csv_reader, "FAST_PATH_CHUNK_SIZE", chunk_size):
+                        self.assertEqual(parse(csv_file, True), parse(csv_file, False), (content, chunk_size))
+
+        reader = MusicPlayerCsvReader(TEST_CSV_FILE, fast_path=False)
+        self.assertEqual(reader.get_mac_address_list(), self.reader.get_mac_address_list())
+
 
         # ------------------------- Scripts ---------------------------------#
 if __name__ == '__main__':
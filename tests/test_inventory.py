@@ -0,0 +1,153 @@
+"""
+Tests for the parsed inventory cache
+"""
+import os
+from pathlib import Path
+import shutil
+import tempfile
+import unittest
+
+from player_tech_assignment.csv_reader import MusicPlayerCsvReader, MusicPlayerCsvReaderError
+from player_tech_assignment.inventory import MusicPlayerInventoryCache, MusicPlayerInventoryError
+
+WORKING_DIR = Path.cwd()
+TEST_DATA_DIR = WORKING_DIR / "tests" / "test_data"
+TEST_CSV_FILE = TEST_DATA_DIR / "test_local_data.csv"
+TEST_INVALID_MAC_ADDRESSES_CSV_FILE = TEST_DATA_DIR / "test_invalid_mac_addresses.csv"
+
+
+def touch(path: Path, seconds: int):
+    """
+    Move the modification time of a file forward, as file systems may not see two quick writes apart
+    """
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + seconds * 1000000000))
+
+
+class TestInventory(unittest.TestCase):
+    """
+    Test parsed inventory cache
+    """
+
+    def setUp(self):
+        """
+        Copy the .csv file to a temporary directory, with a final newline so rows can be appended
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.csv_file = Path(self.tmp_dir.name) / "devices.csv"
+        self.csv_file.write_text(TEST_CSV_FILE.read_text().rstrip("\n") + "\n")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_inventory_cache(self):
+        """
+        Test the rows are loaded from the sidecar while the .csv file doesn't change
+        """
+        cache = MusicPlayerInventoryCache(self.csv_file)
+        inventory = cache.load()
+        self.assertEqual(cache.last_load, "parsed")
+        self.assertTrue(cache.inventory_file.is_file())
+        self.assertEqual(list(inventory.iter_players()), list(MusicPlayerCsvReader(self.csv_file).iter_players()))
+
+        cache = MusicPlayerInventoryCache(self.csv_file)
+        self.assertEqual(list(cache.load().iter_players()), list(inventory.iter_players()))
+        self.assertEqual(cache.last_load, "cached")
+
+        # Same size rewrite within the file system timestamp resolution
+        stat = self.csv_file.stat()
+        self.csv_file.write_text(self.csv_file.read_text().replace(", 1,", ", 4,"))
+        os.utime(self.csv_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        inventory = cache.load()
+        self.assertEqual(cache.last_load, "parsed")
+        self.assertEqual(inventory.ids[0][0], "4,")
+
+        # Rewritten file
+        self.csv_file.write_text(TEST_CSV_FILE.read_text().replace("8F:1E", "8F:1F") + "\n")
+        touch(self.csv_file, 1)
+        inventory = cache.load()
+        self.assertEqual(cache.last_load, "parsed")
+        self.assertEqual(inventory.mac_addresses[0], "8F:1F:C8:64:8C:02")
+
+    def test_appended_rows(self):
+        """
+        Test only the rows appended to the .csv file are parsed and validated
+        """
+        cache = MusicPlayerInventoryCache(self.csv_file)
+        cache.load()
+        with open(self.csv_file, "a") as csvfile:
+            csvfile.write("8f-1e-c8-64-8c-03, 4, 5, 6\n")
+        touch(self.csv_file, 1)
+        inventory = cache.load()
+        self.assertEqual(cache.last_load, "appended")
+        self.assertEqual(list(inventory.iter_players())[-1], ("8F:1E:C8:64:8C:03", "4,", "5,", "6", 6))
+        self.assertEqual(list(inventory.iter_players()), list(MusicPlayerInventoryCache(
+            self.csv_file, Path(self.tmp_dir.name) / "parsed.inventory").load().iter_players()))
+
+        # Duplicates of cached rows are reported, and the sidecar is left as it was
+        with open(self.csv_file, "a") as csvfile:
+            csvfile.write("1B:7E:10:62:06:31, 1, 2, 3\n")
+        touch(self.csv_file, 2)
+        with self.assertRaises(MusicPlayerInventoryError) as context:
+            cache.load()
+        self.assertEqual(context.exception.errors, ["line 7: MAC address 1B:7E:10:62:06:31 is duplicated"])
+        self.assertEqual(len(MusicPlayerInventoryCache(self.csv_file)._read_inventory()[1].mac_addresses), 5)
+
+    def test_edited_and_appended_rows(self):
+        """
+        Test an edit in the middle of a large .csv file followed by an append parses the whole file again
+        """
+        rows = ["{0}, 1, 2, 3\n".format(":".join("{0:012X}".format(key)[i:i + 2] for i in range(0, 12, 2)))
+                for key in range(10000)]
+        self.csv_file.write_text("mac_addresses, id1, id2, id3\n" + "".join(rows))
+        cache = MusicPlayerInventoryCache(self.csv_file)
+        cache.load()
+        # Beyond the first and last bytes sampled by the hash of an unchanged file
+        content = self.csv_file.read_text()
+        self.assertGreater(len(content), 4 * (1 << 16))
+        middle = content.index(rows[5000])
+        self.csv_file.write_text(content[:middle] + rows[5000].replace(", 1,", ", 4,") +
+                                 content[middle + len(rows[5000]):] + "8F:1E:C8:64:8C:03, 1, 2, 3\n")
+        touch(self.csv_file, 1)
+        inventory = cache.load()
+        self.assertEqual(cache.last_load, "parsed")
+        self.assertEqual(inventory.ids[0][5000], "4,")
+        self.assertEqual(len(inventory.mac_addresses), 10001)
+
+    def test_last_line_without_newline(self):
+        """
+        Test a file whose last line is continued by an append is parsed again
+        """
+        shutil.copy(TEST_CSV_FILE, self.csv_file)
+        cache = MusicPlayerInventoryCache(self.csv_file)
+        cache.load()
+        with open(self.csv_file, "a") as csvfile:
+            csvfile.write("1\n8F:1E:C8:64:8C:03, 1, 2, 3\n")
+        touch(self.csv_file, 1)
+        inventory = cache.load()
+        self.assertEqual(cache.last_load, "parsed")
+        self.assertEqual(inventory.ids[2][3], "31")
+        self.assertEqual(len(inventory.mac_addresses), 5)
+
+    def test_invalid_file(self):
+        """
+        Test invalid files are reported as without the sidecar, and not cached
+        """
+        cache = MusicPlayerInventoryCache(TEST_INVALID_MAC_ADDRESSES_CSV_FILE,
+                                          Path(self.tmp_dir.name) / "invalid.inventory")
+        with self.assertRaises(MusicPlayerInventoryError) as context:
+            cache.load()
+        self.assertEqual(len(context.exception.errors), 3)
+        self.assertFalse(cache.inventory_file.exists())
+        self.assertRaises(MusicPlayerCsvReaderError, MusicPlayerInventoryCache(TEST_DATA_DIR / "mate.csv").load)
+
+        # Not an inventory file
+        cache = MusicPlayerInventoryCache(self.csv_file)
+        cache.inventory_file.write_bytes(b"MPIC")
+        cache.load()
+        self.assertEqual(cache.last_load, "parsed")
+
+
+# ------------------------- Scripts ---------------------------------#
+if __name__ == '__main__':
+    unittest.main()
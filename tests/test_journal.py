@@ -0,0 +1,76 @@
+"""
+Tests for the Music Player software update checkpoint journal
+"""
+from pathlib import Path
+import tempfile
+import time
+import unittest
+
+from player_tech_assignment.journal import MusicPlayerUpdateJournal
+from player_tech_assignment.report import PlayerUpdateResult
+
+
+class TestJournal(unittest.TestCase):
+    """
+    Test Music Player update journal
+    """
+
+    def setUp(self):
+        """
+        Create a temporary journal path
+        """
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.journal_file = Path(self.tmp_dir.name) / "update.journal"
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_replay(self):
+        """
+        Test outcomes are replayed by MAC address, the latest one winning
+        """
+        with MusicPlayerUpdateJournal(self.journal_file, fsync_batch_size=2) as journal:
+            journal.record(PlayerUpdateResult("8F:1E:C8:64:8C:02", 200))
+            journal.record(PlayerUpdateResult("1B:7E:10:62:06:31", None, "Connection reset"))
+            journal.record(PlayerUpdateResult("B5:9D:44:A7:A9:15", 200))
+            journal.record(PlayerUpdateResult("B5:9D:44:A7:A9:15", 500, "Internal server error"))
+
+        with MusicPlayerUpdateJournal(self.journal_file) as journal:
+            self.assertEqual(len(journal), 3)
+            self.assertTrue(journal.is_updated("8F:1E:C8:64:8C:02"))
+            self.assertFalse(journal.is_updated("1B:7E:10:62:06:31"))
+            self.assertFalse(journal.is_updated("B5:9D:44:A7:A9:15"))
+            self.assertFalse(journal.is_updated("17:A1:C2:44:EE:C9"))
+
+    def test_truncated_journal(self):
+        """
+        Test a line partially written by an interrupted run is ignored
+        """
+        self.journal_file.write_text("200\t8F:1E:C8:64:8C:02\n200\t1B:7E:10:6")
+        with MusicPlayerUpdateJournal(self.journal_file) as journal:
+            self.assertEqual(len(journal), 1)
+            journal.record(PlayerUpdateResult("B5:9D:44:A7:A9:15", 200))
+
+        with MusicPlayerUpdateJournal(self.journal_file) as journal:
+            self.assertTrue(journal.is_updated("8F:1E:C8:64:8C:02"))
+            self.assertTrue(journal.is_updated("B5:9D:44:A7:A9:15"))
+            self.assertEqual(len(journal), 3)
+
+    def test_large_journal_replay(self):
+        """
+        Test a million-entry journal is replayed quickly
+        """
+        entries = 1000000
+        self.journal_file.write_text("".join("200\t02:00:{0:02X}:{1:02X}:{2:02X}:00\n".format(
+            i >> 16, (i >> 8) & 0xFF, i & 0xFF) for i in range(entries)))
+        start = time.perf_counter()
+        with MusicPlayerUpdateJournal(self.journal_file) as journal:
+            elapsed = time.perf_counter() - start
+            self.assertEqual(len(journal), entries)
+            self.assertTrue(journal.is_updated("02:00:0F:42:3F:00"))
+        self.assertLess(elapsed, 5)
+
+
+# ------------------------- Scripts ---------------------------------#
+if __name__ == '__main__':
+    unittest.main()
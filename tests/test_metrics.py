@@ -0,0 +1,108 @@
+"""
+Tests for the Music Player client metrics
+"""
+import json
+from pathlib import Path
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from player_tech_assignment.cli import DEFAULT_BASE_URL
+from player_tech_assignment.client import MusicPlayerClient, MusicPlayerClientError, read_mac_addresses
+from player_tech_assignment.csv_reader import MusicPlayerCsvReader
+from player_tech_assignment.metrics import ClientMetrics, Histogram, MetricsExporter
+
+WORKING_DIR = Path.cwd()
+TEST_DATA_DIR = WORKING_DIR / "tests" / "test_data"
+TEST_CSV_FILE = TEST_DATA_DIR / "test_local_data.csv"
+TEST_PARTIAL_FAILURE_CSV_FILE = TEST_DATA_DIR / "test_partial_failure.csv"
+
+
+class TestMetrics(unittest.TestCase):
+    """
+    Test Music Player client metrics
+    """
+
+    def test_histogram(self):
+        """
+        Test histogram buckets, quantiles and merge
+        """
+        histogram = Histogram(buckets=(0.1, 1, 10))
+        for value in (0.05, 0.1, 0.5, 2, 20):
+            histogram.observe(value)
+        self.assertEqual(histogram.count, 5)
+        self.assertAlmostEqual(histogram.sum, 22.65)
+        self.assertEqual(histogram.cumulative_counts(), [(0.1, 2), (1, 3), (10, 4), (float("inf"), 5)])
+        self.assertEqual(histogram.quantile(0.5), 1)
+        self.assertEqual(histogram.quantile(0.99), float("inf"))
+        self.assertEqual(Histogram().quantile(0.5), 0)
+
+        histogram.merge(histogram)
+        self.assertEqual(histogram.cumulative_counts()[-1], (float("inf"), 10))
+        self.assertRaises(ValueError, histogram.merge, Histogram())
+
+    def test_client_metrics(self):
+        """
+        Test a client update records latencies, status codes, bytes sent and phases
+        """
+        metrics = ClientMetrics()
+        client = MusicPlayerClient(DEFAULT_BASE_URL, "simon", "password", metrics=metrics)
+        self.assertIs(client.metrics, metrics)
+        with self.assertRaises(MusicPlayerClientError):
+            client.update_players(TEST_PARTIAL_FAILURE_CSV_FILE, workers=2)
+
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot["responses"], {"login": {"200": 1}, "update": {"200": 4, "401": 1}})
+        self.assertEqual(snapshot["latency_seconds"]["update"]["count"], 5)
+        self.assertEqual(snapshot["bytes_sent"], 5 * len(client._profile.payload) + len("username=simon&password=password"))
+        self.assertEqual(snapshot["in_flight"], 0)
+        self.assertGreaterEqual(snapshot["max_in_flight"], 1)
+        self.assertEqual(snapshot["retries"], 0)
+        self.assertEqual(set(snapshot["phase_seconds"]), {"csv_read", "validation"})
+
+        text = metrics.to_prometheus()
+        self.assertIn('music_player_client_responses_total{kind="update",status="401"} 1', text)
+        self.assertIn('music_player_client_request_duration_seconds_bucket{kind="update",le="+Inf"} 5', text)
+        self.assertIn('music_player_client_request_duration_seconds_count{kind="login"} 1', text)
+
+    def test_phase_durations(self):
+        """
+        Test the .csv file read time is not counted as validation time
+        """
+        iter_players = MusicPlayerCsvReader.iter_players
+
+        def slow_iter_players(reader):
+            for record in iter_players(reader):
+                time.sleep(0.05)
+                yield record
+
+        metrics = ClientMetrics()
+        with mock.patch.object(MusicPlayerCsvReader, "iter_players", slow_iter_players):
+            self.assertEqual(len(list(read_mac_addresses(TEST_CSV_FILE, metrics=metrics))), 4)
+        phases = metrics.snapshot()["phase_seconds"]
+        self.assertGreaterEqual(phases["csv_read"], 0.2)
+        self.assertLess(phases["validation"], 0.1)
+
+    def test_metrics_exporter(self):
+        """
+        Test the exporter writes the metrics when stopped
+        """
+        metrics = ClientMetrics()
+        metrics.add_retry()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            metrics_file = Path(tmp_dir) / "metrics.json"
+            with MetricsExporter(metrics, metrics_file, "json", interval=0.01):
+                pass
+            self.assertEqual(json.loads(metrics_file.read_text())["retries"], 1)
+
+            metrics_file = Path(tmp_dir) / "metrics.prom"
+            with MetricsExporter(metrics, metrics_file, interval=0):
+                pass
+            self.assertIn("music_player_client_retries_total 1\n", metrics_file.read_text())
+        self.assertRaises(ValueError, MetricsExporter, metrics, "metrics.xml", "xml")
+
+
+# ------------------------- Scripts ---------------------------------#
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+"""
+Tests for the Music Player software profile
+"""
+import json
+from pathlib import Path
+import unittest
+
+from player_tech_assignment.profile import MusicPlayerProfile, MusicPlayerProfileError
+
+WORKING_DIR = Path.cwd()
+TEST_DATA_DIR = WORKING_DIR / "tests" / "test_data"
+TEST_PROFILE_FILE = TEST_DATA_DIR / "test_profile.json"
+
+
+class TestProfile(unittest.TestCase):
+    """
+    Test Music Player software profile
+    """
+
+    def test_default_profile(self):
+        """
+        Test the default profile body is serialized once with its length
+        """
+        profile = MusicPlayerProfile()
+        self.assertEqual(json.loads(profile.payload), profile.to_dict())
+        self.assertEqual([application["applicationId"] for application in profile.to_dict()["profile"]["applications"]],
+                         ["music_app", "diagnostic_app", "settings_app"])
+        self.assertEqual(profile.headers["Content-Length"], str(len(profile.payload)))
+        self.assertIs(profile.payload, profile.payload)
+
+    def test_load_profile(self):
+        """
+        Test profiles loaded from a file or options
+        """
+        profile = MusicPlayerProfile.from_file(TEST_PROFILE_FILE)
+        self.assertEqual(profile.applications, (("music_app", "v1.5.0"), ("settings_app", "v1.1.6")))
+        self.assertEqual(MusicPlayerProfile.from_options(["music_app=v1.5.0", "settings_app = v1.1.6"]), profile)
+        self.assertEqual(MusicPlayerProfile.from_dict(profile.to_dict()).digest, profile.digest)
+        self.assertNotEqual(MusicPlayerProfile().digest, profile.digest)
+
+        with self.assertRaisesRegex(MusicPlayerProfileError, "file not found"):
+            MusicPlayerProfile.from_file(TEST_DATA_DIR / "mate.json")
+        with self.assertRaisesRegex(MusicPlayerProfileError, "is not a valid profile"):
+            MusicPlayerProfile.from_file(TEST_DATA_DIR / "test_local_data.csv")
+        with self.assertRaisesRegex(MusicPlayerProfileError, "applicationId=version"):
+            MusicPlayerProfile.from_options(["music_app"])
+        with self.assertRaises(MusicPlayerProfileError):
+            MusicPlayerProfile([])
+        with self.assertRaises(MusicPlayerProfileError):
+            MusicPlayerProfile([("music_app", "")])
+        with self.assertRaises(MusicPlayerProfileError):
+            MusicPlayerProfile.from_dict({"profile": {}})
+
+
+# ------------------------- Scripts ---------------------------------#
+if __name__ == '__main__':
+    unittest.main()
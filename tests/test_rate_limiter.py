@@ -0,0 +1,95 @@
+"""
+Tests for the Music Player client rate and concurrency limiters
+"""
+from pathlib import Path
+import time
+import unittest
+
+from player_tech_assignment.cli import DEFAULT_BASE_URL
+from player_tech_assignment.client import MusicPlayerClient
+from player_tech_assignment.rate_limiter import AdaptiveConcurrencyLimiter, TokenBucket
+
+WORKING_DIR = Path.cwd()
+TEST_DATA_DIR = WORKING_DIR / "tests" / "test_data"
+TEST_CSV_FILE = TEST_DATA_DIR / "test_local_data.csv"
+
+
+class FakeClock:
+    """
+    Manually advanced clock
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestRateLimiter(unittest.TestCase):
+    """
+    Test Music Player client rate and concurrency limiters
+    """
+
+    def test_token_bucket(self):
+        """
+        Test the token bucket caps the request rate after a burst
+        """
+        clock = FakeClock()
+        bucket = TokenBucket(rate=10, burst=2, clock=clock)
+        self.assertEqual(bucket.try_acquire(), 0)
+        self.assertEqual(bucket.try_acquire(), 0)
+        self.assertAlmostEqual(bucket.try_acquire(), 0.1)
+
+        for _ in range(10):
+            bucket.acquire(sleep=clock.sleep)
+        self.assertAlmostEqual(clock.now, 1.0)
+
+        self.assertRaises(ValueError, TokenBucket, rate=0)
+
+    def test_adaptive_concurrency(self):
+        """
+        Test the concurrency limit grows additively and shrinks multiplicatively
+        """
+        limiter = AdaptiveConcurrencyLimiter(maximum=16, initial=4, latency_target=1)
+        for _ in range(6):
+            limiter.on_response(200, 0.1)
+        self.assertEqual(limiter.limit, 5)
+
+        # A burst of overload responses lowers the limit once
+        for status_code in (503, 429, None):
+            limiter.on_response(status_code, 0.1)
+        self.assertEqual(limiter.limit, 2)
+
+        # Slow responses count as overload
+        for _ in range(2):
+            limiter.on_response(200, 0.1)
+        limiter.on_response(200, 2)
+        self.assertEqual(limiter.limit, 1)
+
+        # Limit stays within bounds
+        for _ in range(1000):
+            limiter.on_response(200, 0.1)
+        self.assertEqual(limiter.limit, 16)
+
+        self.assertRaises(ValueError, AdaptiveConcurrencyLimiter, maximum=0)
+        self.assertRaises(ValueError, AdaptiveConcurrencyLimiter, maximum=4, decrease_factor=1)
+
+    def test_rate_limited_update(self):
+        """
+        Test the client update request rate is capped
+        """
+        client = MusicPlayerClient(DEFAULT_BASE_URL, "simon", "password", rate_limiter=TokenBucket(rate=20, burst=1),
+                                   concurrency_limiter=AdaptiveConcurrencyLimiter(maximum=4))
+        start = time.perf_counter()
+        report = client.update_players(TEST_CSV_FILE, workers=4)
+        self.assertGreaterEqual(time.perf_counter() - start, 0.15)
+        self.assertEqual(len(report.succeeded), 4)
+
+
+# ------------------------- Scripts ---------------------------------#
+if __name__ == '__main__':
+    unittest.main()
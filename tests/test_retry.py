@@ -0,0 +1,77 @@
+"""
+Tests for the Music Player client retry policy
+"""
+from pathlib import Path
+import requests
+import unittest
+
+from player_tech_assignment.cli import DEFAULT_BASE_URL
+from player_tech_assignment.client import MusicPlayerClient, MusicPlayerClientError
+from player_tech_assignment.retry import RetryPolicy
+
+WORKING_DIR = Path.cwd()
+TEST_DATA_DIR = WORKING_DIR / "tests" / "test_data"
+TEST_CSV_FILE = TEST_DATA_DIR / "test_local_data.csv"
+
+
+class FlakyMusicPlayerClient(MusicPlayerClient):
+    """
+    Client whose first update requests of every device fail with 503
+    """
+
+    def __init__(self, *args, failures=1, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.failures = failures
+        self.attempts = {}
+
+    def _update_player(self, mac_address, token):
+        self.attempts[mac_address] = self.attempts.get(mac_address, 0) + 1
+        if self.attempts[mac_address] <= self.failures:
+            res = requests.Response()
+            res.status_code = 503
+            res._content = b'{"message": "Service unavailable"}'
+            return res
+        return super()._update_player(mac_address, token)
+
+
+class TestRetry(unittest.TestCase):
+    """
+    Test Music Player client retry policy
+    """
+
+    def test_retry_policy(self):
+        """
+        Test retryable failures and backoff delays
+        """
+        policy = RetryPolicy(attempts=3, backoff=1, max_backoff=3, uniform=lambda low, high: high)
+        self.assertTrue(policy.should_retry(503, 1))
+        self.assertTrue(policy.should_retry(None, 2))
+        self.assertFalse(policy.should_retry(503, 3))
+        self.assertFalse(policy.should_retry(401, 1))
+        self.assertEqual([policy.delay(attempt) for attempt in range(1, 5)], [1, 2, 3, 3])
+
+        self.assertRaises(ValueError, RetryPolicy, attempts=0)
+        self.assertRaises(ValueError, RetryPolicy, backoff=-1)
+
+    def test_retry_update(self):
+        """
+        Test transient update failures are retried
+        """
+        policy = RetryPolicy(attempts=3, backoff=0.01)
+        for workers in (1, 4):
+            client = FlakyMusicPlayerClient(DEFAULT_BASE_URL, "simon", "password", failures=2, retry_policy=policy)
+            report = client.update_players(TEST_CSV_FILE, workers=workers)
+            self.assertEqual(len(report.succeeded), 4)
+            self.assertTrue(all(result.attempts == 3 for result in report))
+
+        # Attempts exhausted
+        client = FlakyMusicPlayerClient(DEFAULT_BASE_URL, "simon", "password", failures=3, retry_policy=policy)
+        with self.assertRaises(MusicPlayerClientError) as context:
+            client.update_players(TEST_CSV_FILE, workers=2)
+        self.assertEqual(len(context.exception.report.failed), 4)
+        self.assertTrue(all(result.status_code == 503 for result in context.exception.report))
+
+
+# ------------------------- Scripts ---------------------------------#
+if __name__ == '__main__':
+    unittest.main()
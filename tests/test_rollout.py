@@ -0,0 +1,102 @@
+"""
+Tests for the staged canary rollout
+"""
+from pathlib import Path
+import unittest
+
+from player_tech_assignment.cli import DEFAULT_BASE_URL
+from player_tech_assignment.client import MusicPlayerClient
+from player_tech_assignment.rate_limiter import TokenBucket
+from player_tech_assignment.rollout import MusicPlayerRolloutError, WaveRollout, plan_waves, wave_sizes
+
+WORKING_DIR = Path.cwd()
+TEST_DATA_DIR = WORKING_DIR / "tests" / "test_data"
+TEST_CSV_FILE = TEST_DATA_DIR / "test_local_data.csv"
+TEST_PARTIAL_FAILURE_CSV_FILE = TEST_DATA_DIR / "test_partial_failure.csv"
+FAILED_MAC_ADDRESS = "8F:1E:C8:64:8C:03"
+
+
+class TestRollout(unittest.TestCase):
+    """
+    Test staged canary rollout
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """
+        Set up the Music Player Client
+        """
+        cls.client = MusicPlayerClient(DEFAULT_BASE_URL, "simon", "password")
+
+    def test_wave_sizes(self):
+        """
+        Test waves start with the canary and grow geometrically
+        """
+        self.assertEqual(wave_sizes(1000, 0.01, 2.0), [10, 20, 40, 80, 160, 320, 370])
+        self.assertEqual(wave_sizes(5, 0.01, 1.5), [1, 2, 2])
+        self.assertEqual(wave_sizes(0), [])
+
+    def test_plan_waves(self):
+        """
+        Test wave composition only depends on the MAC addresses
+        """
+        mac_addresses = ["A2:{0:02X}:3C:{1:02X}:5E:6F".format(i % 256, i // 256) for i in range(1000)]
+        waves = plan_waves(mac_addresses, 0.01, 2.0)
+        self.assertEqual(sorted(index for wave in waves for index in wave), list(range(1000)))
+        # Same devices per wave whatever the .csv file order
+        reordered = list(reversed(mac_addresses))
+        self.assertEqual([sorted(mac_addresses[index] for index in wave) for wave in waves],
+                         [sorted(reordered[index] for index in wave) for wave in plan_waves(reordered, 0.01, 2.0)])
+
+    def test_rollout(self):
+        """
+        Test a rollout updates every device, wave by wave
+        """
+        waves = []
+        rollout = WaveRollout(self.client, canary=0.25, on_wave=lambda number, count, report: waves.append(len(report)))
+        report = rollout.run(TEST_CSV_FILE, workers=2)
+        self.assertEqual(len(report.succeeded), 4)
+        self.assertEqual(waves, [1, 2, 1])
+        self.assertIsNone(self.client.rate_limiter)
+
+    def test_rollout_halt(self):
+        """
+        Test a rollout halts at the first wave above the error threshold
+        """
+        with self.assertRaises(MusicPlayerRolloutError) as context:
+            WaveRollout(self.client, canary=0.2, max_error_rate=0).run(TEST_PARTIAL_FAILURE_CSV_FILE)
+        report = context.exception.report
+        self.assertEqual(len(report), 5)
+        self.assertIn(FAILED_MAC_ADDRESS, [result.mac_address for result in report.failed])
+        not_sent = [result for result in report if result.attempts == 0]
+        self.assertEqual(len(report.failed), len(not_sent) + 1)
+        self.assertTrue(all("rollout halted" in result.message for result in not_sent))
+
+        # Under the threshold, every wave is sent
+        with self.assertRaises(MusicPlayerRolloutError) as context:
+            WaveRollout(self.client, canary=0.2, max_error_rate=1).run(TEST_PARTIAL_FAILURE_CSV_FILE)
+        self.assertEqual([result.mac_address for result in context.exception.report.failed], [FAILED_MAC_ADDRESS])
+
+        self.assertRaises(MusicPlayerRolloutError, WaveRollout, self.client, canary=0)
+        self.assertRaises(MusicPlayerRolloutError, WaveRollout, self.client, growth=1)
+
+    def test_rollout_pacing(self):
+        """
+        Test the request rate spreads the remaining devices over the remaining time
+        """
+        now = [0.0]
+        rollout = WaveRollout(self.client, target_duration=100, clock=lambda: now[0])
+        self.assertEqual(rollout._pace(None, 1000, 0.0, 1).rate, 10)
+        self.assertEqual(rollout._pace(None, 1000, 0.0, 10).rate, 1)
+        now[0] = 50.0
+        self.assertEqual(rollout._pace(None, 1000, 0.0, 1).rate, 20)
+        # Never above the client cap, and at full speed once behind schedule
+        cap = TokenBucket(5)
+        self.assertIs(rollout._pace(cap, 1000, 0.0, 1), cap)
+        now[0] = 150.0
+        self.assertIsNone(rollout._pace(None, 1000, 0.0, 1))
+
+
+# ------------------------- Scripts ---------------------------------#
+if __name__ == '__main__':
+    unittest.main()
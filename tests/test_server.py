@@ -0,0 +1,318 @@
+"""
+Tests for the Music Player update simulation server
+"""
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import io
+import jwt
+import os
+from pathlib import Path
+import random
+import requests
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from werkzeug.serving import make_server
+
+from player_tech_assignment.server.chaos import ChaosProfile, ChaosProfileError, LatencyDistribution
+from player_tech_assignment.server.metrics import ServerMetrics
+from player_tech_assignment.server.registry import MusicPlayerDeviceRegistry
+from player_tech_assignment.server.server import SECRET_KEY, MusicPlayerUpdateServer
+from player_tech_assignment.server.token_cache import TokenVerificationCache
+from player_tech_assignment.server.wsgi import MusicPlayerWsgiServerError, _gunicorn_application, run_wsgi_server
+
+WORKING_DIR = Path.cwd()
+TEST_DATA_DIR = WORKING_DIR / "tests" / "test_data"
+TEST_CSV_FILE = TEST_DATA_DIR / "test_local_data.csv"
+
+
+class TestServer(unittest.TestCase):
+    """
+    Test Music Player update simulation server
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """
+        Set up a Flask test client
+        """
+        cls.server = MusicPlayerUpdateServer(TEST_CSV_FILE)
+        cls.client = cls.server.app.test_client()
+
+    def login(self) -> str:
+        res = self.client.post('/login', data={"username": "simon", "password": "password"})
+        return res.get_json()["token"]
+
+    def test_update(self):
+        """
+        Test update requests are checked against the device registry
+        """
+        token = self.login()
+        profile = {"profile": {"applications": []}}
+        for mac_address in ("8F:1E:C8:64:8C:02", "8f-1e-c8-64-8c-02"):
+            res = self.client.put('/profiles/clientId:{0}?token={1}'.format(mac_address, token), json=profile)
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(res.get_json(), profile)
+        res = self.client.put('/profiles/clientId:8F:1E:C8:64:8C:03?token={0}'.format(token), json=profile)
+        self.assertEqual(res.status_code, 401)
+
+        stats = self.client.get('/stats').get_json()["registry"]
+        self.assertEqual(stats["devices"], 4)
+        self.assertEqual(stats["loads"], 1)
+
+    def test_update_batch(self):
+        """
+        Test batch update requests return one status per device
+        """
+        token = self.login()
+        body = {"clientIds": ["8F:1E:C8:64:8C:02", "8f-1e-c8-64-8c-02", "8F:1E:C8:64:8C:03"],
+                "profile": {"applications": []}}
+        res = self.client.put('/profiles/batch?token={0}'.format(token), json=body)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([result["status"] for result in res.get_json()["results"]], [200, 200, 401])
+        self.assertEqual(res.get_json()["profile"], body["profile"])
+
+        self.assertEqual(self.client.put('/profiles/batch?token={0}'.format(token), json={}).status_code, 400)
+        self.assertEqual(self.client.put('/profiles/batch?token={0}'.format(token),
+                                         json={"clientIds": ["8F:1E:C8:64:8C:02"] * 1001, "profile": {}}).status_code,
+                         413)
+        self.assertEqual(self.client.put('/profiles/batch', json=body).status_code, 403)
+
+    def test_get_profile(self):
+        """
+        Test the last profile applied to a device is returned
+        """
+        server = MusicPlayerUpdateServer(TEST_CSV_FILE, log_requests=False)
+        client = server.app.test_client()
+        token = client.post('/login', data={"username": "simon", "password": "password"}).get_json()["token"]
+        url = '/profiles/clientId:{0}?token={1}'
+        self.assertEqual(client.get(url.format("8F:1E:C8:64:8C:02", token)).status_code, 404)
+        self.assertEqual(client.get(url.format("8F:1E:C8:64:8C:03", token)).status_code, 401)
+        self.assertEqual(client.get('/profiles/clientId:8F:1E:C8:64:8C:02').status_code, 403)
+
+        profile = {"applications": [{"applicationId": "music_app", "version": "v1.4.10"}]}
+        client.put(url.format("8f-1e-c8-64-8c-02", token), json={"profile": profile})
+        res = client.get(url.format("8F:1E:C8:64:8C:02", token))
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json(), {"profile": profile})
+
+        client.put('/profiles/batch?token={0}'.format(token), json={"clientIds": ["8F:1E:C8:64:8C:02"], "profile": {}})
+        self.assertEqual(client.get(url.format("8F:1E:C8:64:8C:02", token)).get_json(), {"profile": {}})
+
+    def test_metrics(self):
+        """
+        Test per-endpoint request counts, status codes and latencies, merged across threads
+        """
+        server = MusicPlayerUpdateServer(TEST_CSV_FILE, log_requests=False)
+        client = server.app.test_client()
+        token = client.post('/login', data={"username": "simon", "password": "password"}).get_json()["token"]
+        client.put('/profiles/clientId:8F:1E:C8:64:8C:02?token={0}'.format(token), json={})
+        client.put('/profiles/clientId:8F:1E:C8:64:8C:03?token={0}'.format(token), json={})
+        client.put('/profiles/clientId:8F:1E:C8:64:8C:02?token=aleatory', json={})
+
+        res = client.get('/metrics')
+        self.assertEqual(res.status_code, 200)
+        text = res.get_data(as_text=True)
+        self.assertIn('music_player_server_requests_total{endpoint="login",status="200"} 1', text)
+        self.assertIn('music_player_server_requests_total{endpoint="hook",status="401"} 1', text)
+        self.assertIn('music_player_server_requests_total{endpoint="check_for_token",status="404"} 1', text)
+        self.assertIn('music_player_server_request_duration_seconds_count{endpoint="hook"} 3', text)
+
+        metrics = ServerMetrics(buckets=(0.1, 1))
+        threads = [threading.Thread(target=metrics.observe, args=("hook", 200, 0.5)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        metrics.observe("hook", 401, 0.05)
+        snapshot = metrics.snapshot()
+        # The shards of the ended threads are retired
+        self.assertEqual(snapshot["threads"], 1)
+        self.assertEqual(len(metrics._shards), 1)
+        self.assertEqual(snapshot["endpoints"]["hook"]["requests"], 5)
+        self.assertEqual(snapshot["endpoints"]["hook"]["responses"], {"200": 4, "401": 1})
+        self.assertEqual(snapshot["endpoints"]["hook"]["latency_seconds"]["buckets"], {"0.1": 1, "1": 5, "+Inf": 5})
+
+        # One thread per connection
+        for _ in range(100):
+            thread = threading.Thread(target=metrics.observe, args=("login", 200, 0.05))
+            thread.start()
+            thread.join()
+        self.assertLessEqual(len(metrics._shards), 2)
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot["endpoints"]["login"]["requests"], 100)
+        self.assertEqual(snapshot["endpoints"]["hook"]["requests"], 5)
+
+    def test_chaos(self):
+        """
+        Test injected failures, token expiry and per-client rate cap
+        """
+        now = [0.0]
+        chaos = ChaosProfile(error_rate=0.2, throttle_rate=0.1, seed=1)
+        statuses = [chaos.injected_status("127.0.0.1") for _ in range(1000)]
+        self.assertAlmostEqual(statuses.count(429) / 1000, 0.1, delta=0.03)
+        self.assertAlmostEqual(sum(status in (500, 502, 503) for status in statuses) / 1000, 0.2, delta=0.04)
+
+        chaos = ChaosProfile(client_rate=1, client_burst=2, clock=lambda: now[0])
+        self.assertEqual([chaos.injected_status("a") for _ in range(3)], [None, None, 429])
+        self.assertIsNone(chaos.injected_status("b"))
+        now[0] = 1
+        self.assertIsNone(chaos.injected_status("a"))
+
+        server = MusicPlayerUpdateServer(TEST_CSV_FILE, log_requests=False,
+                                         chaos=ChaosProfile.from_dict({"error_rate": 1, "error_status_codes": [503],
+                                                                       "token_ttl": 5}))
+        client = server.app.test_client()
+        self.assertEqual(client.post('/login', data={"username": "simon", "password": "password"}).status_code, 503)
+        self.assertEqual(client.get('/metrics').status_code, 200)
+
+        server = MusicPlayerUpdateServer(TEST_CSV_FILE, log_requests=False, chaos=ChaosProfile(token_ttl=5))
+        token = server.app.test_client().post('/login', data={"username": "simon",
+                                                              "password": "password"}).get_json()["token"]
+        payload = jwt.decode(token, SECRET_KEY)
+        self.assertLessEqual(payload["exp"] - time.time(), 5)
+
+        self.assertRaises(ChaosProfileError, ChaosProfile, error_rate=0.8, throttle_rate=0.5)
+        self.assertRaises(ChaosProfileError, ChaosProfile.from_dict, {"latency_ms": 3})
+
+    def test_chaos_latency_does_not_block(self):
+        """
+        Test injected latency only delays the request it is injected into
+        """
+        server = MusicPlayerUpdateServer(TEST_CSV_FILE, log_requests=False,
+                                         chaos=ChaosProfile(latency=LatencyDistribution("fixed", (0.2,))))
+        http_server = make_server("127.0.0.1", 0, server.app, threaded=True)
+        thread = threading.Thread(target=http_server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            url = "http://127.0.0.1:{0}/login".format(http_server.port)
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                statuses = list(executor.map(lambda _: requests.post(url, data={"username": "simon",
+                                                                                "password": "password"}).status_code,
+                                             range(8)))
+            elapsed = time.perf_counter() - start
+        finally:
+            http_server.shutdown()
+            thread.join()
+        self.assertEqual(statuses, [200] * 8)
+        self.assertGreaterEqual(elapsed, 0.2)
+        self.assertLess(elapsed, 0.2 * 4)
+
+    def test_latency_distributions(self):
+        """
+        Test injected latency specifications
+        """
+        rng = random.Random(0)
+        self.assertEqual(LatencyDistribution.parse("fixed:0.01").sample(rng), 0.01)
+        self.assertTrue(0.01 <= LatencyDistribution.parse("uniform:0.01:0.02").sample(rng) <= 0.02)
+        samples = [LatencyDistribution.parse("exponential:0.02").sample(rng) for _ in range(2000)]
+        self.assertAlmostEqual(sum(samples) / len(samples), 0.02, delta=0.003)
+        samples = sorted(LatencyDistribution.parse("lognormal:0.02:0.5").sample(rng) for _ in range(2001))
+        self.assertAlmostEqual(samples[1000], 0.02, delta=0.003)
+        self.assertEqual(str(LatencyDistribution.parse("uniform:0.01:0.05")), "uniform:0.01:0.05")
+        for spec in ("gaussian:1", "fixed", "uniform:0.05:0.01", "fixed:fast"):
+            self.assertRaises(ChaosProfileError, LatencyDistribution.parse, spec)
+
+    def test_request_logging(self):
+        """
+        Test per-request stdout logging can be turned off
+        """
+        for log_requests, expected_output in ((True, "Update the software version\n"), (False, "")):
+            server = MusicPlayerUpdateServer(TEST_CSV_FILE, log_requests=log_requests)
+            client = server.app.test_client()
+            token = client.post('/login', data={"username": "simon", "password": "password"}).get_json()["token"]
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                client.put('/profiles/clientId:8F:1E:C8:64:8C:02?token={0}'.format(token), json={})
+            self.assertEqual(output.getvalue(), expected_output)
+
+    def test_wsgi_server(self):
+        """
+        Test the gunicorn application serves the preloaded app
+        """
+        server = MusicPlayerUpdateServer(TEST_CSV_FILE, log_requests=False)
+        application = _gunicorn_application(server.app, {"bind": "127.0.0.1:0", "workers": 3, "threads": 2,
+                                                         "worker_class": "gthread", "preload_app": True})
+        self.assertEqual(application.cfg.workers, 3)
+        self.assertEqual(application.cfg.threads, 2)
+        self.assertTrue(application.cfg.preload_app)
+        self.assertIs(application.load(), server.app)
+
+        self.assertRaises(MusicPlayerWsgiServerError, run_wsgi_server, server.app, "127.0.0.1", 0, workers=0)
+
+    def test_token_cache(self):
+        """
+        Test a token is fully verified only once until it expires
+        """
+        server = MusicPlayerUpdateServer(TEST_CSV_FILE)
+        client = server.app.test_client()
+        token = client.post('/login', data={"username": "simon", "password": "password"}).get_json()["token"]
+        for _ in range(3):
+            res = client.put('/profiles/clientId:8F:1E:C8:64:8C:02?token={0}'.format(token), json={})
+            self.assertEqual(res.status_code, 200)
+        self.assertEqual(client.put('/profiles/clientId:8F:1E:C8:64:8C:02?token=aleatory', json={}).status_code, 404)
+        self.assertEqual(client.get('/stats').get_json()["token_cache"], {"size": 1, "hits": 2, "misses": 2})
+
+        # Expiry and least recently used eviction
+        now = [0.0]
+        cache = TokenVerificationCache(max_size=2, clock=lambda: now[0])
+        cache.add("a", 10)
+        cache.add("b", 20)
+        self.assertTrue(cache.is_verified("a"))
+        cache.add("c", 20)
+        self.assertFalse(cache.is_verified("b"))
+        now[0] = 10
+        self.assertFalse(cache.is_verified("a"))
+        self.assertTrue(cache.is_verified("c"))
+        self.assertEqual(cache.stats(), {"size": 1, "hits": 2, "misses": 2})
+
+    def test_registry_reload(self):
+        """
+        Test the device registry is only reloaded when the .csv file changes
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            csv_file = Path(tmp_dir) / "devices.csv"
+            shutil.copy(TEST_CSV_FILE, csv_file)
+            registry = MusicPlayerDeviceRegistry(csv_file)
+            self.assertIn("8F:1E:C8:64:8C:02", registry)
+            self.assertNotIn("8F:1E:C8:64:8C:03", registry)
+            self.assertEqual(registry.stats()["loads"], 1)
+
+            with open(csv_file, "a") as csvfile:
+                csvfile.write("\n8F:1E:C8:64:8C:03, 1, 2, 3")
+            stat = csv_file.stat()
+            os.utime(csv_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+            self.assertIn("8F:1E:C8:64:8C:03", registry)
+            self.assertEqual(len(registry), 5)
+            self.assertEqual(registry.stats()["loads"], 2)
+
+            # Invalid file keeps the current registry
+            csv_file.write_text("burger, id1, id2, id3\n")
+            os.utime(csv_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2000000000))
+            self.assertIn("8F:1E:C8:64:8C:03", registry)
+            self.assertEqual(registry.stats()["loads"], 2)
+
+    def test_registry_inventory_cache(self):
+        """
+        Test the device registry is loaded from the inventory file, or parsed if the .csv file is invalid
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            csv_file = Path(tmp_dir) / "devices.csv"
+            shutil.copy(TEST_CSV_FILE, csv_file)
+            for _ in range(2):
+                registry = MusicPlayerDeviceRegistry(csv_file, inventory_cache=True)
+                self.assertIn("8f1ec8648c02", registry)
+                self.assertEqual(len(registry), 4)
+            self.assertTrue((Path(tmp_dir) / "devices.csv.inventory").is_file())
+
+            shutil.copy(TEST_DATA_DIR / "test_invalid_mac_addresses.csv", csv_file)
+            registry = MusicPlayerDeviceRegistry(csv_file, inventory_cache=True)
+            self.assertIn("potato", registry)
+
+
+# ------------------------- Scripts ---------------------------------#
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+"""
+Tests for the Music Player client pooled HTTP session
+"""
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+import threading
+import unittest
+
+from player_tech_assignment.session import MusicPlayerSession
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    """
+    HTTP/1.1 handler keeping connections open
+    """
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b"ok"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    """
+    HTTP server handling each connection in a thread, http.server.ThreadingHTTPServer requires Python 3.7
+    """
+    daemon_threads = True
+
+
+class TestSession(unittest.TestCase):
+    """
+    Test Music Player client session
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """
+        Start a keep-alive HTTP server on an ephemeral port
+        """
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+        cls.url = "http://127.0.0.1:{0}/".format(cls.server.server_address[1])
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_connection_reuse(self):
+        """
+        Test connections are reused only with keep-alive
+        """
+        with MusicPlayerSession() as session:
+            for _ in range(5):
+                self.assertEqual(session.get(self.url).status_code, 200)
+            self.assertEqual(session.connections_opened, 1)
+
+        with MusicPlayerSession(keep_alive=False) as session:
+            for _ in range(5):
+                self.assertEqual(session.get(self.url).status_code, 200)
+            self.assertEqual(session.connections_opened, 5)
+
+
+# ------------------------- Scripts ---------------------------------#
+if __name__ == '__main__':
+    unittest.main()
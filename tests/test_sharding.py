@@ -0,0 +1,51 @@
+"""
+Tests for the sharded rollout
+"""
+import unittest
+
+from player_tech_assignment.report import MusicPlayerUpdateReport, PlayerUpdateResult
+from player_tech_assignment.sharding import merge_shard_reports, parse_shard, shard_file, shard_of
+
+MAC_ADDRESSES = ["A2:{0:02X}:3C:{1:02X}:5E:6F".format(i % 256, i // 256) for i in range(1000)]
+
+
+class TestSharding(unittest.TestCase):
+    """
+    Test sharded rollout helpers
+    """
+
+    def test_shard_of(self):
+        """
+        Test every device belongs to exactly one stable shard
+        """
+        for shard_count in (1, 3, 8):
+            shards = [shard_of(mac_address, shard_count) for mac_address in MAC_ADDRESSES]
+            self.assertTrue(all(0 <= shard < shard_count for shard in shards))
+            self.assertEqual(len(set(shards)), shard_count)
+        self.assertEqual(shard_of("a2:00:3c:00:5e:6f", 8), shard_of("A2-00-3C-00-5E-6F", 8))
+        self.assertEqual(shard_of("A2:00:3C:00:5E:6F", 8), shard_of("A2:00:3C:00:5E:6F", 8))
+
+    def test_parse_shard(self):
+        """
+        Test i/N shard specifications
+        """
+        self.assertEqual(parse_shard("0/4"), (0, 4))
+        self.assertEqual(parse_shard(" 3 / 4 "), (3, 4))
+        for shard in ("4/4", "1", "a/4", "-1/4", "0/0"):
+            self.assertRaises(ValueError, parse_shard, shard)
+        self.assertEqual(shard_file("update.journal", (1, 4)), "update.journal.1of4")
+        self.assertIsNone(shard_file(None, (1, 4)))
+
+    def test_merge_shard_reports(self):
+        """
+        Test shard reports are merged back into .csv file order
+        """
+        reports = [MusicPlayerUpdateReport(PlayerUpdateResult(mac_address, 200) for mac_address in MAC_ADDRESSES
+                                           if shard_of(mac_address, 3) == index) for index in range(3)]
+        report = merge_shard_reports(MAC_ADDRESSES, 3, reports)
+        self.assertEqual([result.mac_address for result in report], MAC_ADDRESSES)
+
+
+# ------------------------- Scripts ---------------------------------#
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+"""
+Tests for the Music Player state cache
+"""
+from pathlib import Path
+import tempfile
+import unittest
+
+from player_tech_assignment.state_cache import MusicPlayerStateCache, MusicPlayerStateCacheError
+
+
+class TestStateCache(unittest.TestCase):
+    """
+    Test Music Player state cache
+    """
+
+    def test_state_cache(self):
+        """
+        Test recorded digests are found before and after a save
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_file = Path(tmp_dir) / "state.cache"
+            with MusicPlayerStateCache(cache_file) as cache:
+                self.assertEqual(len(cache), 0)
+                cache.record("8F:1E:C8:64:8C:02", 1)
+                cache.record("a2-00-3c-00-5e-6f", 2)
+                cache.record("potato", 3)
+                self.assertTrue(cache.is_current("8f1ec8648c02", 1))
+                self.assertEqual(len(cache), 2)
+
+            cache = MusicPlayerStateCache(cache_file)
+            self.assertEqual(cache.get("A2:00:3C:00:5E:6F"), 2)
+            self.assertIsNone(cache.get("potato"))
+            self.assertFalse(cache.is_current("8F:1E:C8:64:8C:02", 2))
+
+            # New devices are merged between the saved ones, known devices updated in place
+            cache.record("00:00:00:00:00:01", 4)
+            cache.record("FF:FF:FF:FF:FF:FF", 5)
+            cache.record("8F:1E:C8:64:8C:02", 6)
+            cache.save()
+            cache = MusicPlayerStateCache(cache_file)
+            self.assertEqual([cache.get(mac_address) for mac_address in (
+                "00:00:00:00:00:01", "8F:1E:C8:64:8C:02", "A2:00:3C:00:5E:6F", "FF:FF:FF:FF:FF:FF")], [4, 6, 2, 5])
+            self.assertEqual(list(cache._mac_addresses), sorted(cache._mac_addresses))
+            self.assertEqual(len(cache), 4)
+
+    def test_invalid_state_cache(self):
+        """
+        Test files that are not state caches are rejected
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_file = Path(tmp_dir) / "state.cache"
+            cache_file.write_bytes(b"MPSC")
+            self.assertRaises(MusicPlayerStateCacheError, MusicPlayerStateCache, cache_file)
+            cache_file.write_bytes(b"MPSC\x01\x00\x00\x00\x02\x00\x00\x00\x00\x00\x00\x00")
+            self.assertRaises(MusicPlayerStateCacheError, MusicPlayerStateCache, cache_file)
+
+
+# ------------------------- Scripts ---------------------------------#
+if __name__ == '__main__':
+    unittest.main()
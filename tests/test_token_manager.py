@@ -0,0 +1,98 @@
+"""
+Tests for the Music Player authentification token manager
+"""
+import datetime
+import jwt
+import time
+import unittest
+
+from player_tech_assignment.server.server import SECRET_KEY
+from player_tech_assignment.token_manager import MusicPlayerTokenManager, get_token_expiry
+
+
+def make_token(lifetime: int) -> str:
+    """
+    Create a signed token expiring in lifetime seconds
+    """
+    exp = datetime.datetime.utcnow() + datetime.timedelta(seconds=lifetime)
+    token = jwt.encode({'user': 'simon', 'exp': exp}, SECRET_KEY)
+    return token.decode('UTF-8') if isinstance(token, bytes) else token
+
+
+class TestTokenManager(unittest.TestCase):
+    """
+    Test Music Player token manager
+    """
+
+    def setUp(self):
+        """
+        Set up a login counter
+        """
+        self.lifetime = 3600
+        self.logins = 0
+
+    def login(self) -> str:
+        self.logins += 1
+        return make_token(self.lifetime)
+
+    def test_token_expiry(self):
+        """
+        Test reading the token exp claim
+        """
+        self.assertAlmostEqual(get_token_expiry(make_token(60)), jwt.decode(make_token(60), SECRET_KEY)['exp'], delta=1)
+        self.assertIsNone(get_token_expiry("aleatory"))
+        self.assertIsNone(get_token_expiry("a.b.c"))
+
+    def test_token_reuse(self):
+        """
+        Test a valid token is reused
+        """
+        manager = MusicPlayerTokenManager(self.login)
+        token = manager.get_token()
+        for _ in range(10):
+            self.assertEqual(manager.get_token(), token)
+        self.assertEqual(manager.login_count, 1)
+        self.assertEqual(self.logins, 1)
+
+    def test_short_lived_token(self):
+        """
+        Test a token living less than the refresh margin is reused for half its lifetime
+        """
+        self.lifetime = 20
+        now = [time.time()]
+        manager = MusicPlayerTokenManager(self.login, refresh_margin=30, clock=lambda: now[0])
+        token = manager.get_token()
+        for _ in range(200):
+            self.assertEqual(manager.get_token(), token)
+        self.assertEqual(manager.login_count, 1)
+
+        now[0] += 11
+        manager.get_token()
+        self.assertEqual(manager.login_count, 2)
+
+    def test_token_refresh(self):
+        """
+        Test an expiring or rejected token is refreshed
+        """
+        # Token expires within the refresh margin
+        now = [time.time()]
+        manager = MusicPlayerTokenManager(self.login, refresh_margin=30, clock=lambda: now[0])
+        manager.get_token()
+        now[0] += 3600 - 29
+        manager.get_token()
+        self.assertEqual(manager.login_count, 2)
+
+        # Rejected token
+        self.lifetime = 3600
+        manager = MusicPlayerTokenManager(self.login)
+        token = manager.get_token()
+        manager.invalidate("another token")
+        self.assertEqual(manager.get_token(), token)
+        manager.invalidate(token)
+        manager.get_token()
+        self.assertEqual(manager.login_count, 2)
+
+
+# ------------------------- Scripts ---------------------------------#
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+"""
+Tests for the Music Player MAC address validation
+"""
+import unittest
+
+from player_tech_assignment.csv_reader import MusicPlayerRecord
+from player_tech_assignment.validation import normalize_mac_address, validate_players
+
+
+class TestValidation(unittest.TestCase):
+    """
+    Test Music Player MAC address validation
+    """
+
+    def test_normalize_mac_address(self):
+        """
+        Test MAC addresses are normalized to upper case, colon separated pairs
+        """
+        for mac_address in ("8F:1E:C8:64:8C:02", "8f:1e:c8:64:8c:02", "8F-1E-C8-64-8C-02", "8f1ec8648c02"):
+            self.assertEqual(normalize_mac_address(mac_address), "8F:1E:C8:64:8C:02")
+        for mac_address in ("potato", "8F:1E:C8:64:8C", "8F:1E-C8:64:8C:02", "8F:1E:C8:64:8C:02\n", "8G:1E:C8:64:8C:02"):
+            self.assertIsNone(normalize_mac_address(mac_address))
+
+    def test_validate_players(self):
+        """
+        Test every invalid or duplicated row is reported with its line number
+        """
+        records = [MusicPlayerRecord(mac_address, "1,", "2,", "3", line_number) for line_number, mac_address in
+                   enumerate(["8F:1E:C8:64:8C:02", "potato", "8f-1e-c8-64-8c-02", "1B:7E:10:62:06:31"], start=2)]
+        self.assertEqual(validate_players(records), ["line 3: MAC address potato format is not valid",
+                                                     "line 4: MAC address 8f-1e-c8-64-8c-02 is duplicated"])
+        self.assertEqual(validate_players(records[3:]), [])
+
+
+# ------------------------- Scripts ---------------------------------#
+if __name__ == '__main__':
+    unittest.main()